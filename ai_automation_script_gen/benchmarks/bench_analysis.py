@@ -0,0 +1,233 @@
+"""
+Analysis pipeline benchmark over the synthetic corpus (benchmarks/corpus.py).
+
+Measures, per corpus file, StaticAnalyzer.analyze() time, flag-scan
+throughput in MB/s of bytes actually scanned and peak RSS (each in a fresh
+process, best of --repeat) and end-to-end `main.py <file>` latency; plus the
+ScriptGenerator.generate_script() rate. Every analysis is checked for the
+framework and planted flags the corpus file should yield.
+Results are written as JSON and, with --baseline, compared against an
+earlier run: the exit code is 1 if any check failed or any metric regressed
+past its threshold.
+
+    python benchmarks/bench_analysis.py [--sizes 1,16,128 | --full] [--kinds nsis,msi]
+        [--corpus DIR] [--repeat 3] [--output results.json]
+        [--baseline baseline.json] [--save-baseline baseline.json]
+
+Runs offline on Linux; the corpus is generated once and reused.
+"""
+import json
+import os
+import platform
+import resource
+import subprocess
+import sys
+import tempfile
+import time
+
+ROOT = os.path.join(os.path.dirname(os.path.abspath(__file__)), "..")
+sys.path.insert(0, ROOT)
+
+from benchmarks.corpus import (DEFAULT_SEED, DEFAULT_SIZES_MB, FULL_SIZES_MB, HEADER_FLAGS, KINDS, MB, MIDDLE_FLAGS,
+                               TAIL_FLAGS, TAIL_TEXT, generate_corpus)
+
+DEFAULT_CORPUS_DIR = os.path.join(tempfile.gettempdir(), "ai_script_gen_corpus")
+DEFAULT_REPEAT = 3
+SCRIPT_ROUNDS = 2000
+
+# metric: (direction, relative threshold, absolute slack). A metric regresses
+# when it is worse than the baseline by more than both, so tiny timings and
+# allocator noise do not trip the check.
+THRESHOLDS = {
+    "analyze_s": ("lower", 0.25, 0.005),
+    "scan_mb_per_s": ("higher", 0.20, 0.0),
+    "peak_rss_mb": ("lower", 0.25, 16.0),
+    "e2e_s": ("lower", 0.25, 0.05),
+    "scripts_per_s": ("higher", 0.20, 0.0),
+}
+
+
+EXPECTED_FRAMEWORKS = {"nsis": "nsis", "inno": "inno", "burn": "wix_burn", "generic": "unknown", "msi": "msi"}
+# The ASCII flags corpus.py plants in the code section, mid-overlay and in
+# the trailing string table; only files without a known framework are scanned
+PLANTED_FLAGS = [("header", HEADER_FLAGS[0].decode("ascii")), ("middle", MIDDLE_FLAGS[0].decode("ascii")),
+                 ("tail", TAIL_FLAGS[0].decode("ascii"))]
+
+
+def check_analysis(kind, size, analysis):
+    """
+    Lists what the analysis of a corpus file of `kind` and `size` bytes got
+    wrong: its framework, or a planted flag missing from where it was put.
+    """
+    problems = []
+    framework = analysis.get("framework", {}).get("name", analysis.get("type"))
+    if framework != EXPECTED_FRAMEWORKS[kind]:
+        problems.append(f"framework {framework}, expected {EXPECTED_FRAMEWORKS[kind]}")
+    if framework != "unknown":
+        return problems
+    windows = {"header": (0, 128 * 1024), "middle": (size // 4, size - TAIL_TEXT), "tail": (size - TAIL_TEXT, size)}
+    for region, flag in PLANTED_FLAGS:
+        low, high = windows[region]
+        offsets = [hit["offset"] for hit in analysis.get("flag_offsets", {}).get(flag, [])]
+        if not any(low <= offset < high for offset in offsets):
+            problems.append(f"{region} flag {flag} not found in [{low}, {high})")
+    return problems
+
+
+def measure_child(path):
+    """
+    Runs in the child process: one analysis, no cache, then its own figures.
+    """
+    from lib.introspect import StaticAnalyzer
+    started = time.perf_counter()
+    result = StaticAnalyzer(path).analyze()
+    elapsed = time.perf_counter() - started
+    print(json.dumps({
+        "elapsed_s": elapsed,
+        # Linux reports kilobytes
+        "peak_rss_mb": resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / 1024,
+        "error": result.get("error"),
+        "analysis": result,
+    }))
+
+
+def analyze_in_child(path):
+    proc = subprocess.run([sys.executable, os.path.abspath(__file__), "--measure", path],
+                          capture_output=True, text=True, cwd=ROOT)
+    if proc.returncode != 0:
+        raise RuntimeError(f"Analysis of {path} failed:\n{proc.stderr}")
+    return json.loads(proc.stdout.strip().splitlines()[-1])
+
+
+def bench_file(entry, repeat):
+    size_mb = os.path.getsize(entry["path"]) / MB
+    runs = [analyze_in_child(entry["path"]) for _ in range(repeat)]
+    best = min(run["elapsed_s"] for run in runs)
+
+    # End to end: interpreter start, imports, analysis, script written
+    with tempfile.TemporaryDirectory() as cwd:
+        e2e = []
+        for _ in range(repeat):
+            started = time.perf_counter()
+            subprocess.run([sys.executable, os.path.join(ROOT, "main.py"), entry["path"], "--no-cache",
+                            "--no-telemetry"], cwd=cwd, stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL,
+                           check=True)
+            e2e.append(time.perf_counter() - started)
+
+    analysis = runs[0]["analysis"]
+    # Files with a recognized framework are identified from their headers and
+    # never scanned; throughput over their whole size would be meaningless
+    scanned_mb = (analysis.get("scan_stats", {}).get("bytes_scanned") or 0) / MB
+    return {
+        "kind": entry["kind"],
+        "size_mb": round(size_mb, 2),
+        "analyze_s": round(best, 6),
+        "scanned_mb": round(scanned_mb, 2),
+        "scan_mb_per_s": round(scanned_mb / best, 1) if scanned_mb and best else None,
+        "peak_rss_mb": round(min(run["peak_rss_mb"] for run in runs), 1),
+        "e2e_s": round(min(e2e), 4),
+        "framework": analysis.get("framework", {}).get("name", analysis.get("type")),
+        "skipped_fraction": analysis.get("scan_stats", {}).get("skipped_fraction"),
+        "problems": check_analysis(entry["kind"], os.path.getsize(entry["path"]), analysis),
+    }, analysis
+
+
+def bench_generate_script(analyses, rounds=SCRIPT_ROUNDS):
+    from lib.generator import ScriptGenerator
+    generators = [ScriptGenerator(analysis) for analysis in analyses]
+    started = time.perf_counter()
+    for i in range(rounds):
+        generators[i % len(generators)].generate_script()
+    elapsed = time.perf_counter() - started
+    return {"rounds": rounds, "scripts_per_s": round(rounds / elapsed, 1)}
+
+
+def compare(results, baseline):
+    """
+    Lists every metric that got worse than the baseline by more than its
+    threshold, as (case, metric, baseline, current, change).
+    """
+    regressions = []
+
+    def check(case, current, previous):
+        for metric, (direction, relative, slack) in THRESHOLDS.items():
+            new, old = current.get(metric), previous.get(metric)
+            if new is None or not old:
+                continue
+            worse = old - new if direction == "higher" else new - old
+            if worse > old * relative and worse > slack:
+                regressions.append((case, metric, old, new, round((new - old) / old, 3)))
+
+    for case, current in results["cases"].items():
+        if case in baseline.get("cases", {}):
+            check(case, current, baseline["cases"][case])
+    check("generate_script", results["generate_script"], baseline.get("generate_script", {}))
+    return regressions
+
+
+def main(argv):
+    if "--measure" in argv:
+        measure_child(argv[argv.index("--measure") + 1])
+        return 0
+
+    def option(name, default=None):
+        if name in argv:
+            idx = argv.index(name)
+            if idx + 1 < len(argv):
+                return argv[idx + 1]
+        return default
+
+    sizes = FULL_SIZES_MB if "--full" in argv else \
+        [int(s) for s in option("--sizes", ",".join(map(str, DEFAULT_SIZES_MB))).split(",")]
+    kinds = option("--kinds", ",".join(KINDS)).split(",")
+    seed = int(option("--seed", DEFAULT_SEED))
+    repeat = int(option("--repeat", DEFAULT_REPEAT))
+    corpus = generate_corpus(option("--corpus", DEFAULT_CORPUS_DIR), kinds, sizes, seed,
+                             log=lambda message: print(message, file=sys.stderr))
+
+    results = {
+        "version": 1,
+        "python": platform.python_version(),
+        "platform": platform.platform(),
+        "seed": seed,
+        "repeat": repeat,
+        "cases": {},
+    }
+    analyses = []
+    print(f"{'case':<18} {'MB':>7} {'scanned':>8} {'scan MB/s':>10} {'ms':>8} {'RSS MB':>8} {'e2e s':>7}  framework")
+    failed_checks = 0
+    for entry in corpus:
+        case = f"{entry['kind']}-{entry['size_mb']}mb"
+        row, analysis = bench_file(entry, repeat)
+        results["cases"][case] = row
+        analyses.append(analysis)
+        print(f"{case:<18} {row['size_mb']:>7} {row['scanned_mb']:>8} {row['scan_mb_per_s'] or '-':>10} "
+              f"{row['analyze_s'] * 1000:>8.2f} {row['peak_rss_mb']:>8} {row['e2e_s']:>7}  {row['framework']}")
+        for problem in row["problems"]:
+            print(f"CHECK FAILED {case}: {problem}")
+        failed_checks += len(row["problems"])
+
+    results["generate_script"] = bench_generate_script(analyses)
+    print(f"generate_script: {results['generate_script']['scripts_per_s']} scripts/s")
+
+    output = option("--output", "bench_analysis_results.json")
+    with open(output, "w") as f:
+        json.dump(results, f, indent=2)
+    if option("--save-baseline"):
+        with open(option("--save-baseline"), "w") as f:
+            json.dump(results, f, indent=2)
+
+    baseline_path = option("--baseline")
+    if baseline_path:
+        with open(baseline_path, "r") as f:
+            regressions = compare(results, json.load(f))
+        for case, metric, old, new, change in regressions:
+            print(f"REGRESSION {case} {metric}: {old} -> {new} ({change:+.1%})")
+        if regressions:
+            return 1
+        print(f"No regressions against {baseline_path}")
+    return 1 if failed_checks else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main(sys.argv[1:]))
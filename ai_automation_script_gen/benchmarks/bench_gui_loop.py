@@ -0,0 +1,168 @@
+"""
+Throughput of the GUI decision loop (lib/agent_loop.py) against simulated
+installer wizards (lib/wizard_sim.py), by number of concurrent sessions.
+
+Reports steps per second, decisions per screen and end-to-end time to
+"installed" per concurrency level. Sessions run on threads, spread over
+--processes worker processes so the loop can use more than one core.
+
+    python benchmarks/bench_gui_loop.py [--sessions 256] [--concurrency 1,16,64,256] [--processes 4]
+        [--time-scale 0.02] [--popup-rate 0.1] [--poll 0.005] [--wizard wizard.json] [--output results.json]
+
+--time-scale shrinks the wizard's delays (1.0 = real time: pages take
+50-300 ms to draw, installing takes 1-3 s); 0 measures the bare loop.
+"""
+import contextlib
+import json
+import math
+import os
+import platform
+import sys
+import time
+from concurrent.futures import ProcessPoolExecutor, ThreadPoolExecutor
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), ".."))
+
+from lib.agent_loop import AgentLoop
+from lib.llm_client import LLMClient
+from lib.telemetry import percentile
+from lib.wizard_sim import DEFAULT_WIZARD, WizardSimulator, load_wizard
+
+DEFAULT_SESSIONS = 256
+CONCURRENCY = [1, 16, 64, 256]
+DEFAULT_TIME_SCALE = 0.02
+DEFAULT_POPUP_RATE = 0.1
+DEFAULT_POLL = 0.005
+DEFAULT_SEED = 1
+
+_llm = None
+
+
+def run_session(index, options):
+    path = f"C:\\Setups\\SimApp{index}.exe"
+    simulator = WizardSimulator(path, wizard=options["wizard"], seed=options["seed"] * 100003 + index,
+                                popup_rate=options["popup_rate"], time_scale=options["time_scale"])
+    loop = AgentLoop(simulator, _llm, analysis={"path": path, "type": "exe"}, poll_interval=options["poll"],
+                     max_poll_interval=max(options["poll"] * 8, 0.001), stall_timeout=options["stall_timeout"])
+    result = loop.run()
+    return {
+        "installed": simulator.installed,
+        "status": result["status"],
+        "steps": result["steps"],
+        "decisions": result["decisions"],
+        "screens": result["screens"],
+        "elapsed_s": result["elapsed_s"],
+    }
+
+
+def run_sessions(indices, threads, options):
+    """
+    Runs in a worker process: `indices` sessions, `threads` at a time, all
+    sharing one LLMClient (and so one decision cache).
+    """
+    global _llm
+    _llm = LLMClient()
+    # decide_next_action narrates every call; keep the benchmark output readable
+    with open(os.devnull, "w") as devnull, contextlib.redirect_stdout(devnull):
+        with ThreadPoolExecutor(max_workers=threads) as pool:
+            results = list(pool.map(lambda index: run_session(index, options), indices))
+    return results, _llm.decision_stats()
+
+
+def _warm():
+    return os.getpid()
+
+
+def bench_level(executor, processes, sessions, concurrency, options):
+    per_process = math.ceil(concurrency / processes)
+    shares = [list(range(p, sessions, processes)) for p in range(processes)]
+    started = time.perf_counter()
+    futures = [executor.submit(run_sessions, share, per_process, options) for share in shares if share]
+    results, hits, lookups = [], 0, 0
+    for future in futures:
+        rows, stats = future.result()
+        results.extend(rows)
+        hits += stats["hits"]
+        lookups += stats["hits"] + stats["misses"]
+    wall = time.perf_counter() - started
+
+    installed = sorted(row["elapsed_s"] for row in results if row["installed"])
+    steps = sum(row["steps"] for row in results)
+    decisions = sum(row["decisions"] for row in results)
+    screens = sum(row["screens"] for row in results)
+    return {
+        "concurrency": concurrency,
+        "sessions": len(results),
+        "installed": len(installed),
+        "failed": len(results) - len(installed),
+        "wall_s": round(wall, 3),
+        "sessions_per_s": round(len(results) / wall, 1),
+        "steps_per_s": round(steps / wall, 1),
+        "decisions_per_s": round(decisions / wall, 1),
+        "decisions_per_screen": round(decisions / screens, 3) if screens else None,
+        "steps_per_session": round(steps / len(results), 2) if results else None,
+        "e2e_p50_s": round(percentile(installed, 50), 4) if installed else None,
+        "e2e_p95_s": round(percentile(installed, 95), 4) if installed else None,
+        "decision_cache_hit_rate": round(hits / lookups, 4) if lookups else 0.0,
+    }
+
+
+def main(argv):
+    if "-h" in argv or "--help" in argv:
+        print(__doc__.strip())
+        return 0
+
+    def option(name, default=None):
+        if name in argv:
+            idx = argv.index(name)
+            if idx + 1 < len(argv):
+                return argv[idx + 1]
+        return default
+
+    sessions = int(option("--sessions", DEFAULT_SESSIONS))
+    levels = [int(c) for c in option("--concurrency", ",".join(map(str, CONCURRENCY))).split(",")]
+    processes = int(option("--processes", 1))
+    wizard_path = option("--wizard")
+    options = {
+        "wizard": load_wizard(wizard_path) if wizard_path else DEFAULT_WIZARD,
+        "seed": int(option("--seed", DEFAULT_SEED)),
+        "popup_rate": float(option("--popup-rate", DEFAULT_POPUP_RATE)),
+        "time_scale": float(option("--time-scale", DEFAULT_TIME_SCALE)),
+        "poll": float(option("--poll", DEFAULT_POLL)),
+        "stall_timeout": float(option("--stall-timeout", 60)),
+    }
+
+    results = {
+        "version": 1,
+        "python": platform.python_version(),
+        "platform": platform.platform(),
+        "cpus": os.cpu_count(),
+        "processes": processes,
+        "options": {key: value for key, value in options.items() if key != "wizard"},
+        "wizard": wizard_path or "default",
+        "levels": [],
+    }
+    print(f"{'concurrency':>11} {'sessions/s':>11} {'steps/s':>10} {'dec/screen':>11} {'e2e p50 s':>10} "
+          f"{'e2e p95 s':>10} {'installed':>10}")
+    with ProcessPoolExecutor(max_workers=processes) as executor:
+        for future in [executor.submit(_warm) for _ in range(processes)]:
+            future.result()
+        for concurrency in levels:
+            row = bench_level(executor, processes, sessions, concurrency, options)
+            results["levels"].append(row)
+            print(f"{concurrency:>11} {row['sessions_per_s']:>11} {row['steps_per_s']:>10} "
+                  f"{row['decisions_per_screen']:>11} {row['e2e_p50_s']:>10} {row['e2e_p95_s']:>10} "
+                  f"{row['installed']:>6}/{row['sessions']}")
+
+    output = option("--output", "bench_gui_loop_results.json")
+    with open(output, "w") as f:
+        json.dump(results, f, indent=2)
+    failed = sum(row["failed"] for row in results["levels"])
+    if failed:
+        print(f"{failed} sessions did not reach 'installed'")
+        return 1
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main(sys.argv[1:]))
@@ -0,0 +1,66 @@
+"""
+Throughput of the model backend against the local stub server, by number
+of concurrent callers, with and without batching. Connections are capped as
+a real endpoint's rate limits would.
+
+    python benchmarks/bench_llm_backend.py [--requests 512] [--latency 0.05] [--connections 8]
+"""
+import asyncio
+import os
+import sys
+import time
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), ".."))
+
+from lib.llm_backend import HTTPBackend, ResponseCache
+from lib.llm_stub_server import StubModelServer
+
+CONCURRENCY = [1, 4, 16, 64]
+
+
+def screen(i):
+    # Distinct screens so the response cache doesn't flatter the numbers
+    return [
+        {"title": f"Step {i}", "control_type": "Text"},
+        {"title": "Next", "control_type": "Button"},
+        {"title": "Cancel", "control_type": "Button"},
+    ]
+
+
+async def run(url, requests, concurrency, connections, batch_size):
+    backend = HTTPBackend(url, max_connections=connections, batch_size=batch_size,
+                          cache=ResponseCache(max_entries=0))
+    queue = list(range(requests))
+
+    async def worker():
+        while queue:
+            i = queue.pop()
+            await backend.complete("decide_next_action", {"ui_context": screen(i), "history": []})
+
+    start = time.perf_counter()
+    await asyncio.gather(*(worker() for _ in range(concurrency)))
+    elapsed = time.perf_counter() - start
+    await backend.close()
+    return elapsed, backend.stats()
+
+
+def main(argv):
+    def option(name, default):
+        return type(default)(argv[argv.index(name) + 1]) if name in argv else default
+
+    requests = option("--requests", 512)
+    latency = option("--latency", 0.05)
+    connections = option("--connections", 8)
+    with StubModelServer(latency=latency) as server:
+        print(f"{requests} requests, {latency * 1000:.0f} ms model latency, {connections} connections")
+        print(f"{'concurrency':>11} {'batching':>9} {'req/s':>9} {'http calls':>11} {'connections':>12}")
+        for concurrency in CONCURRENCY:
+            for batch_size in (1, 16):
+                elapsed, stats = asyncio.run(run(server.url, requests, concurrency, connections, batch_size))
+                print(f"{concurrency:>11} {'on' if batch_size > 1 else 'off':>9} {requests / elapsed:>9.1f} "
+                      f"{stats['http_calls']:>11} {stats['connections_opened']:>12}")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main(sys.argv[1:]))
@@ -0,0 +1,67 @@
+"""
+Scripts verified per second: cold one-at-a-time verify_script versus the
+pre-started worker pool at several worker counts.
+
+    python benchmarks/bench_verify_pool.py [--scripts 200] [--work 0.05]
+"""
+import os
+import sys
+import tempfile
+import time
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), ".."))
+
+from lib.verifier import verify_script
+from lib.verify_pool import VerifyPool
+
+WORKERS = [1, 2, 4, 8]
+
+# Shaped like a generated install script: a few imports, a child process
+# stand-in (sleep) and a PASS line
+SCRIPT = """import json
+import logging
+import subprocess
+import sys
+import time
+
+time.sleep({work})
+print("PASS: Install done.")
+"""
+
+
+def main(argv):
+    def option(name, default):
+        return type(default)(argv[argv.index(name) + 1]) if name in argv else default
+
+    count = option("--scripts", 200)
+    work = option("--work", 0.05)
+    with tempfile.TemporaryDirectory() as tmp:
+        paths = []
+        for i in range(count):
+            path = os.path.join(tmp, f"install_{i}.py")
+            with open(path, "w") as f:
+                f.write(SCRIPT.format(work=work))
+            paths.append(path)
+
+        print(f"{count} scripts, {work * 1000:.0f} ms of work each, {os.cpu_count()} CPUs")
+        print(f"{'mode':>14} {'scripts/s':>10} {'elapsed s':>10}")
+        # The cold baseline is slow; a sample is enough
+        sample = paths[:max(1, count // 10)]
+        start = time.perf_counter()
+        for path in sample:
+            verify_script(path)
+        elapsed = time.perf_counter() - start
+        print(f"{'cold serial':>14} {len(sample) / elapsed:>10.1f} {elapsed * count / len(sample):>10.2f}")
+
+        for workers in WORKERS:
+            with VerifyPool(workers) as pool:
+                start = time.perf_counter()
+                results = list(pool.verify_many(paths))
+                elapsed = time.perf_counter() - start
+            assert all(r["success"] for r in results)
+            print(f"{f'pool x{workers}':>14} {count / elapsed:>10.1f} {elapsed:>10.2f}")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main(sys.argv[1:]))
@@ -0,0 +1,436 @@
+"""
+Deterministic synthetic installer corpus for the analysis benchmarks.
+
+Writes NSIS-like, Inno-like, WiX Burn-like and framework-less PE files and
+MSI compound files of any size, streaming so 2 GB files need no memory.
+Overlays mix incompressible blocks (like LZMA/CAB payload) with string
+tables. Silent flags sit in the header, the middle and the end of the
+file, ASCII and UTF-16LE. The same seed always gives the same bytes.
+
+    python benchmarks/corpus.py <dir> [--sizes 1,16,256] [--kinds nsis,msi] [--seed 1]
+"""
+import array
+import os
+import random
+import struct
+import sys
+import uuid
+
+# Bump when the generated bytes change, so cached corpora are rebuilt
+CORPUS_VERSION = 1
+KINDS = ("nsis", "inno", "burn", "generic", "msi")
+DEFAULT_SIZES_MB = (1, 16, 128)
+FULL_SIZES_MB = (1, 16, 256, 1024, 2048)
+DEFAULT_SEED = 1
+
+MB = 1024 * 1024
+CHUNK = MB
+# Each overlay chunk: this much random payload, then a string table
+PAYLOAD_FRACTION = 0.75
+# The last bytes of an overlay are always readable (trailing flag tables)
+TAIL_TEXT = 64 * 1024
+
+HEADER_FLAGS = [b"/S", "/VERYSILENT".encode("utf-16le")]
+MIDDLE_FLAGS = [b"/quiet", "/SUPPRESSMSGBOXES".encode("utf-16le")]
+TAIL_FLAGS = [b"--silent", "/qn".encode("utf-16le")]
+
+VERSION_STRINGS = {
+    "nsis": {"ProductName": "Bench NSIS App", "CompanyName": "Bench", "Comments": "Nullsoft Install System"},
+    "inno": {"ProductName": "Bench Inno App", "CompanyName": "Bench",
+             "Comments": "This installation was built with Inno Setup."},
+    "burn": {"ProductName": "Bench Burn Bundle", "CompanyName": "Bench"},
+    "generic": {"ProductName": "Bench Generic App", "CompanyName": "Bench"},
+}
+SECTIONS = {
+    "nsis": [b".text", b".rdata", b".data", b".ndata"],
+    "inno": [b".text", b".itext", b".data", b".idata"],
+    "burn": [b".text", b".rdata", b".data", b".wixburn"],
+    "generic": [b".text", b".rdata", b".data"],
+}
+OVERLAY_HEADERS = {
+    "nsis": b"\x00\x00\x00\x00\xef\xbe\xad\xdeNullsoftInst",
+    "inno": b"zlb\x1a",
+    "burn": b"MSCF\x00\x00\x00\x00",
+    "generic": b"",
+}
+
+FILE_ALIGN = 0x200
+SECTION_ALIGN = 0x1000
+PE_HEADERS_SIZE = 0x400
+
+
+# --- Overlay content ---
+
+class Filler:
+    """
+    Produces the mixed payload/string-table bytes of an overlay or stream,
+    chunk by chunk, with marker strings patched in at given offsets.
+    """
+    def __init__(self, seed):
+        rng = random.Random(seed)
+        self.payload = rng.randbytes(CHUNK)
+        words = [b"Setup", b"Install", b"Program Files", b"Uninstall", b"License", b"Next", b"Cancel",
+                 b"Software\\Microsoft\\Windows\\CurrentVersion", b"%s", b"Error", b"Finish"]
+        text = bytearray()
+        while len(text) < CHUNK:
+            text += rng.choice(words) + b"\x00"
+        self.text = bytes(text[:CHUNK])
+
+    def text_offsets(self, size):
+        """
+        Offsets in [0, size) where marker strings land in readable text.
+        """
+        middle = (size // 2) - (size // 2) % CHUNK + int(CHUNK * PAYLOAD_FRACTION) + 64
+        if middle >= size - TAIL_TEXT:
+            middle = max(0, size - TAIL_TEXT) + 64
+        return middle, max(0, size - 256)
+
+    def write(self, f, size, marks=()):
+        split = int(CHUNK * PAYLOAD_FRACTION)
+        marks = sorted(marks)
+        written = 0
+        while written < size:
+            n = min(CHUNK, size - written)
+            # Rotate the payload so blocks differ across chunks
+            shift = (written // CHUNK * 4099) % split
+            chunk = bytearray(self.payload[shift:split] + self.payload[:shift] + self.text[:CHUNK - split])[:n]
+            tail_start = size - TAIL_TEXT - written
+            if tail_start < n:
+                start = max(0, tail_start)
+                chunk[start:n] = self.text[:n - start]
+            for offset, data in marks:
+                if written <= offset < written + n:
+                    at = offset - written
+                    chunk[at:at + len(data)] = data[:n - at]
+            f.write(chunk)
+            written += n
+
+
+def _marks(offset, flags):
+    marks = []
+    for flag in flags:
+        marks.append((offset, flag + b"\x00\x00"))
+        offset += len(flag) + 16
+    return marks
+
+
+# --- PE ---
+
+def _pad4(data):
+    return data + b"\0" * (-len(data) % 4)
+
+
+def _version_block(key, value=b"", value_type=0, children=()):
+    body = struct.pack("<HHH", 0, 0, value_type) + (key + "\0").encode("utf-16le")
+    body = _pad4(body) + value
+    for child in children:
+        body = _pad4(body) + child
+    value_len = len(value) // 2 if value_type == 1 else len(value)
+    return struct.pack("<HHH", len(body), value_len, value_type) + body[6:]
+
+
+def version_info(strings, version=(1, 0, 0, 0)):
+    ms = (version[0] << 16) | version[1]
+    ls = (version[2] << 16) | version[3]
+    fixed = struct.pack("<13I", 0xFEEF04BD, 0x10000, ms, ls, ms, ls, 0x3F, 0, 4, 1, 0, 0, 0)
+    table = [_version_block(k, (v + "\0").encode("utf-16le"), 1) for k, v in strings.items()]
+    string_info = _version_block("StringFileInfo", value_type=1,
+                                 children=[_version_block("040904b0", value_type=1, children=table)])
+    return _version_block("VS_VERSION_INFO", fixed, 0, children=[string_info])
+
+
+def resource_section(va, data, resource_type=16):
+    # root -> type -> id 1 -> language 0x409 -> data entry. A str type is a
+    # named entry whose length-prefixed UTF-16 name follows the data entry.
+    def directory(entry_id, target, named=False):
+        return struct.pack("<IIHHHH", 0, 0, 0, 0, int(named), int(not named)) + struct.pack("<II", entry_id, target)
+    named = isinstance(resource_type, str)
+    name = struct.pack("<H", len(resource_type)) + resource_type.encode("utf-16-le") if named else b""
+    name += b"\0" * (-len(name) % 4)
+    type_entry = directory(0x80000000 | 88 if named else resource_type, 0x80000000 | 24, named)
+    entries = type_entry + directory(1, 0x80000000 | 48) + directory(0x409, 72)
+    return entries + struct.pack("<IIII", va + 88 + len(name), len(data), 0, 0) + name + data
+
+
+def build_pe_stub(sections, version=None, dos_stamp=b"", resource=None):
+    """
+    A minimal 32-bit PE: `sections` is a list of (name, data); a .rsrc
+    section is added holding a version resource when `version` is given, or
+    else the (type, data) pair `resource`.
+    Returns the bytes up to where the overlay starts.
+    """
+    sections = [list(s) for s in sections]
+    if version is not None:
+        resource = (16, version_info(version))
+    if resource is not None:
+        sections.append([b".rsrc", None])
+    raw, va = PE_HEADERS_SIZE, SECTION_ALIGN
+    table, blobs = b"", b""
+    resource_dir = None
+    for section in sections:
+        if section[1] is None:
+            section[1] = resource_section(va, resource[1], resource[0])
+            resource_dir = (va, len(section[1]))
+        data = section[1] + b"\0" * (-len(section[1]) % FILE_ALIGN)
+        table += struct.pack("<8sIIIIIIHHI", section[0], len(section[1]), va, len(data), raw, 0, 0, 0, 0, 0x40000040)
+        raw += len(data)
+        va += (len(section[1]) + SECTION_ALIGN - 1) & ~(SECTION_ALIGN - 1)
+        blobs += data
+
+    dos = bytearray(0x80)
+    dos[0:2] = b"MZ"
+    dos[0x30:0x30 + len(dos_stamp)] = dos_stamp
+    struct.pack_into("<I", dos, 0x3C, 0x80)
+    coff = struct.pack("<HHIIIHH", 0x14C, len(sections), 0, 0, 0, 224, 0x102)
+    optional = bytearray(224)
+    struct.pack_into("<H", optional, 0, 0x10B)
+    struct.pack_into("<I", optional, 60, PE_HEADERS_SIZE)
+    struct.pack_into("<I", optional, 92, 16)
+    if resource_dir:
+        struct.pack_into("<II", optional, 96 + 2 * 8, *resource_dir)
+    header = bytes(dos) + b"PE\0\0" + coff + bytes(optional) + table
+    return header.ljust(PE_HEADERS_SIZE, b"\0") + blobs
+
+
+def _code_section(rng):
+    # Machine-code-like bytes with the header flags in a string table
+    code = bytearray(rng.randbytes(48 * 1024))
+    strings = b"\x00".join(HEADER_FLAGS) + b"\x00\x00"
+    code[-len(strings) - 512:-512] = strings
+    return bytes(code)
+
+
+def write_pe(path, kind, size, seed=DEFAULT_SEED):
+    rng = random.Random(f"{kind}:{seed}")
+    data = {name: _code_section(rng) if name == b".text" else rng.randbytes(8 * 1024) for name in SECTIONS[kind]}
+
+    def sections(burn):
+        return [(name, burn if name == b".wixburn" else data[name]) for name in SECTIONS[kind]]
+
+    stub = build_pe_stub(sections(b"\0" * 56), VERSION_STRINGS[kind], b"Inno" if kind == "inno" else b"")
+    overlay_size = max(0, size - len(stub))
+    if kind == "burn":
+        # Header of the .wixburn section: bundle id, stub size, UX + attached container sizes
+        ux = min(overlay_size, 256 * 1024)
+        bundle = uuid.UUID(int=rng.getrandbits(128))
+        burn = struct.pack("<II", 0x00F14300, 2) + bundle.bytes_le + \
+            struct.pack("<IIIIIIII", len(stub), 0, 0, 0, 0, 2, ux, overlay_size - ux)
+        stub = build_pe_stub(sections(burn), VERSION_STRINGS[kind])
+
+    filler = Filler(f"{kind}:{seed}:overlay")
+    middle, end = filler.text_offsets(overlay_size)
+    marks = [(0, OVERLAY_HEADERS[kind])] + _marks(middle, MIDDLE_FLAGS) + _marks(end - 64, TAIL_FLAGS)
+    with open(path, "wb") as f:
+        f.write(stub)
+        filler.write(f, overlay_size, [m for m in marks if m[1]])
+
+
+# --- MSI (compound file) ---
+
+SECTOR = 512
+MINI_SECTOR = 64
+MINI_CUTOFF = 4096
+END_OF_CHAIN = 0xFFFFFFFE
+FREE_SECT = 0xFFFFFFFF
+FAT_SECT = 0xFFFFFFFD
+DIFAT_SECT = 0xFFFFFFFC
+CFB_MAGIC = b"\xd0\xcf\x11\xe0\xa1\xb1\x1a\xe1"
+
+
+def _mime(c):
+    if "0" <= c <= "9":
+        return ord(c) - 48
+    if "A" <= c <= "Z":
+        return ord(c) - 55
+    if "a" <= c <= "z":
+        return ord(c) - 61
+    return {".": 62, "_": 63}.get(c, -1)
+
+
+def msi_stream_name(name, table=True):
+    """
+    Encodes a stream name the way Windows Installer stores it.
+    """
+    out = [chr(0x4840)] if table else []
+    i = 0
+    while i < len(name):
+        a = _mime(name[i])
+        if a < 0:
+            out.append(name[i])
+            i += 1
+        elif i + 1 < len(name) and _mime(name[i + 1]) >= 0:
+            out.append(chr(0x3800 + a + (_mime(name[i + 1]) << 6)))
+            i += 2
+        else:
+            out.append(chr(0x4800 + a))
+            i += 1
+    return "".join(out)
+
+
+def property_streams(properties):
+    strings, index = [], {}
+
+    def string_id(s):
+        if s not in index:
+            strings.append(s)
+            index[s] = len(strings)
+        return index[s]
+
+    rows = sorted(properties.items())
+    keys = [string_id(k) for k, _ in rows]
+    values = [string_id(v) for _, v in rows]
+    pool = struct.pack("<I", 1252) + b"".join(struct.pack("<HH", len(s.encode("cp1252")), 1) for s in strings)
+    data = b"".join(s.encode("cp1252") for s in strings)
+    table = b"".join(k.to_bytes(2, "little") for k in keys) + b"".join(v.to_bytes(2, "little") for v in values)
+    return [(msi_stream_name("_StringPool"), pool), (msi_stream_name("_StringData"), data),
+            (msi_stream_name("Property"), table)]
+
+
+def write_msi(path, size, seed=DEFAULT_SEED):
+    """
+    A compound file holding a Property table (in the mini stream) and one
+    large Binary stream that brings the file up to `size` bytes.
+    """
+    properties = {"ProductName": "Bench MSI App", "ProductVersion": "1.0.0",
+                  "ProductCode": "{" + str(uuid.UUID(int=random.Random(seed).getrandbits(128))).upper() + "}",
+                  "Manufacturer": "Bench"}
+    small = property_streams(properties)
+    mini, mini_starts, minifat = b"", [], array.array("I")
+    for _, data in small:
+        count = -(-len(data) // MINI_SECTOR)
+        mini_starts.append(len(mini) // MINI_SECTOR)
+        for k in range(count):
+            minifat.append(len(mini) // MINI_SECTOR + 1 if k < count - 1 else END_OF_CHAIN)
+            mini += data[k * MINI_SECTOR:(k + 1) * MINI_SECTOR].ljust(MINI_SECTOR, b"\0")
+    entries = [("Root Entry", 5)] + [(name, 2) for name, _ in small] + [(msi_stream_name("Binary.Payload", False), 2)]
+
+    def sectors(n):
+        return -(-n // SECTOR)
+
+    dir_secs, minifat_secs, mini_secs = sectors(len(entries) * 128), sectors(len(minifat) * 4), sectors(len(mini))
+    fixed = dir_secs + minifat_secs + mini_secs
+    # Size everything but the payload stream, then give it the rest
+    fat_secs = difat_secs = 1
+    payload_secs = 0
+    for _ in range(4):
+        payload_secs = max(1, (size - SECTOR) // SECTOR - fixed - fat_secs - difat_secs)
+        body = fixed + payload_secs
+        fat_secs = 1
+        while fat_secs * 128 < body + fat_secs + difat_secs:
+            fat_secs += 1
+        difat_secs = -(-max(0, fat_secs - 109) // 127)
+    payload_size = payload_secs * SECTOR
+
+    fat = array.array("I", [FAT_SECT] * fat_secs + [DIFAT_SECT] * difat_secs)
+
+    def chain(n):
+        start = len(fat)
+        fat.extend(range(start + 1, start + n))
+        fat.append(END_OF_CHAIN)
+        return start
+
+    dir_start = chain(dir_secs)
+    minifat_start = chain(minifat_secs)
+    mini_start = chain(mini_secs)
+    payload_start = chain(payload_secs)
+    fat.extend([FREE_SECT] * (fat_secs * 128 - len(fat)))
+
+    def dirent(name, kind, start, length, child=FREE_SECT, right=FREE_SECT):
+        encoded = (name + "\0").encode("utf-16le")
+        return (encoded.ljust(64, b"\0") + struct.pack("<HBB", len(encoded), kind, 1) +
+                struct.pack("<III", FREE_SECT, right, child) + b"\0" * 36 + struct.pack("<IQ", start, length))
+
+    starts = [mini_start] + mini_starts + [payload_start]
+    lengths = [len(mini)] + [len(data) for _, data in small] + [payload_size]
+    directory = b""
+    for i, (name, kind) in enumerate(entries):
+        if i == 0:
+            directory += dirent(name, kind, starts[0], lengths[0], child=1)
+        else:
+            directory += dirent(name, kind, starts[i], lengths[i], right=i + 1 if i + 1 < len(entries) else FREE_SECT)
+
+    header = bytearray(SECTOR)
+    header[:8] = CFB_MAGIC
+    struct.pack_into("<HHHHH", header, 0x18, 0x3E, 3, 0xFFFE, 9, 6)
+    struct.pack_into("<IIIIIIIII", header, 0x28, 0, fat_secs, dir_start, 0, MINI_CUTOFF, minifat_start,
+                     minifat_secs, fat_secs if difat_secs else END_OF_CHAIN, difat_secs)
+    first = list(range(min(fat_secs, 109)))
+    struct.pack_into("<109I", header, 0x4C, *(first + [FREE_SECT] * (109 - len(first))))
+    rest = list(range(109, fat_secs))
+    difat = array.array("I")
+    for k in range(difat_secs):
+        chunk = rest[k * 127:(k + 1) * 127]
+        difat.extend(chunk + [FREE_SECT] * (127 - len(chunk)))
+        difat.append(fat_secs + k + 1 if k < difat_secs - 1 else END_OF_CHAIN)
+
+    filler = Filler(f"msi:{seed}:payload")
+    middle, end = filler.text_offsets(payload_size)
+    with open(path, "wb") as f:
+        f.write(header)
+        f.write(fat.tobytes())
+        f.write(difat.tobytes())
+        f.write(directory.ljust(dir_secs * SECTOR, b"\0"))
+        f.write(minifat.tobytes().ljust(minifat_secs * SECTOR, b"\0"))
+        f.write(mini.ljust(mini_secs * SECTOR, b"\0"))
+        filler.write(f, payload_size, _marks(middle, MIDDLE_FLAGS) + _marks(end - 64, TAIL_FLAGS))
+
+
+# --- Corpus ---
+
+def corpus_name(kind, size_mb, seed=DEFAULT_SEED):
+    extension = "msi" if kind == "msi" else "exe"
+    return f"{kind}-{size_mb}mb-v{CORPUS_VERSION}-s{seed}.{extension}"
+
+
+def write_installer(path, kind, size, seed=DEFAULT_SEED):
+    if kind == "msi":
+        write_msi(path, size, seed)
+    elif kind in SECTIONS:
+        write_pe(path, kind, size, seed)
+    else:
+        raise ValueError(f"Unknown corpus kind '{kind}'")
+
+
+def generate_corpus(directory, kinds=KINDS, sizes_mb=DEFAULT_SIZES_MB, seed=DEFAULT_SEED, log=None):
+    """
+    Makes sure `directory` holds every (kind, size) file and returns
+    [{"kind", "size_mb", "path"}]. Files already there are reused: names
+    carry the seed and CORPUS_VERSION, and the bytes are deterministic.
+    """
+    os.makedirs(directory, exist_ok=True)
+    corpus = []
+    for size_mb in sizes_mb:
+        for kind in kinds:
+            path = os.path.join(directory, corpus_name(kind, size_mb, seed))
+            # MSIs are whole sectors, so allow a little slack
+            if not os.path.exists(path) or abs(os.path.getsize(path) - size_mb * MB) > 4 * SECTOR:
+                if log:
+                    log(f"Generating {os.path.basename(path)}")
+                partial = path + ".partial"
+                write_installer(partial, kind, size_mb * MB, seed)
+                os.replace(partial, path)
+            corpus.append({"kind": kind, "size_mb": size_mb, "path": path})
+    return corpus
+
+
+def main(argv):
+    if not argv or argv[0].startswith("--"):
+        print(__doc__.strip().splitlines()[-1].strip())
+        return 1
+
+    def option(name, default=None):
+        if name in argv:
+            idx = argv.index(name)
+            if idx + 1 < len(argv):
+                return argv[idx + 1]
+        return default
+
+    sizes = [int(s) for s in option("--sizes", ",".join(map(str, DEFAULT_SIZES_MB))).split(",")]
+    kinds = option("--kinds", ",".join(KINDS)).split(",")
+    for entry in generate_corpus(argv[0], kinds, sizes, int(option("--seed", DEFAULT_SEED)), log=print):
+        print(f"{entry['path']}  {os.path.getsize(entry['path'])} bytes")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main(sys.argv[1:]))
@@ -1,6 +1,8 @@
 import os
+import sys
 import time
 from lib.healer import SelfHealer
+from lib.fix_store import FixStore
 from lib.llm_client import LLMClient
 
 # 1. Create a "Bad" Script that times out
@@ -39,7 +41,10 @@ print(f"Created {bad_script_name} with intentional timeout bug.")
 # 2. Run Healer
 print("\n--- Starting Healer Demo ---")
 llm = LLMClient()
-healer = SelfHealer(llm)
+# --speculative verifies several candidate fixes at once;
+# --fix-store reuses fixes that healed the same failure before
+healer = SelfHealer(llm, speculative="--speculative" in sys.argv,
+                    fix_store=FixStore() if "--fix-store" in sys.argv else None)
 
 success, fixed_script = healer.attempt_heal(bad_script_name)
 
@@ -0,0 +1,108 @@
+"""
+Drives a GUI installer to completion: read the screen, decide, act, repeat.
+
+    loop = AgentLoop(GuiAutomator(path), LLMClient(), analysis=analysis)
+    result = loop.run()          # {"status", "steps", "decisions", "screens", ..., "script"}
+
+The automator is anything with GuiAutomator's launch / get_ui_hierarchy /
+perform_action / close (e.g. lib/wizard_sim.WizardSimulator). Successful
+clicks are recorded as events and, given the installer's analysis, turned
+into a replayable script with ScriptGenerator.generate_gui_script().
+"""
+import time
+from lib.decisions import screen_fingerprint
+from lib.generator import ScriptGenerator
+from lib.llm_client import LLMClient
+from lib.profiling import count, span
+
+DEFAULT_MAX_STEPS = 50
+# Re-read a screen that could not be acted on after this long, doubling up to the max
+DEFAULT_POLL_INTERVAL = 0.1
+DEFAULT_MAX_POLL_INTERVAL = 1.0
+# Give up when nothing could be clicked for this long (e.g. a stuck progress page)
+DEFAULT_STALL_TIMEOUT = 120.0
+
+
+class AgentLoop:
+    def __init__(self, automator, llm=None, analysis=None, telemetry=None, max_steps=DEFAULT_MAX_STEPS,
+                 poll_interval=DEFAULT_POLL_INTERVAL, max_poll_interval=DEFAULT_MAX_POLL_INTERVAL,
+                 stall_timeout=DEFAULT_STALL_TIMEOUT, sleep=time.sleep, clock=time.monotonic):
+        self.automator = automator
+        self.llm = llm or LLMClient()
+        self.analysis = analysis
+        self.telemetry = telemetry
+        self.max_steps = max_steps
+        self.poll_interval = poll_interval
+        self.max_poll_interval = max_poll_interval
+        self.stall_timeout = stall_timeout
+        self.sleep = sleep
+        self.clock = clock
+
+    def run(self):
+        """
+        Returns {"status", "steps", "decisions", "screens", "failed_actions",
+        "elapsed_s", "events", "step_code"} plus "script" when an analysis was
+        given. Status is "finished" (window closed), "stalled" or "max_steps".
+        """
+        started = self.clock()
+        # Successful clicks so far: the model's history and the script's events
+        events, step_code = [], []
+        decisions = failed = screens = 0
+        last_screen = None
+        status = "max_steps"
+        wait = self.poll_interval
+        last_progress = started
+
+        with span("agent.run"):
+            self.automator.launch()
+            try:
+                while len(events) < self.max_steps:
+                    with span("agent.observe"):
+                        ui_context = self.automator.get_ui_hierarchy()
+                    if not ui_context:
+                        status = "finished"
+                        break
+                    fingerprint = screen_fingerprint(ui_context)
+                    if fingerprint != last_screen:
+                        screens += 1
+                        last_screen = fingerprint
+
+                    decision = self.llm.decide_next_action(ui_context, events)
+                    decisions += 1
+                    acted = False
+                    if decision:
+                        with span("agent.act", title=decision["selector"]["title"]):
+                            acted = self.automator.perform_action(decision["action"], decision["selector"])
+
+                    if acted:
+                        events.append(decision)
+                        step_code.append(self.llm.generate_step_code(decision))
+                        last_progress = self.clock()
+                        wait = self.poll_interval
+                        continue
+
+                    # Nothing to do yet (busy page, disabled button, window still drawing)
+                    failed += 1
+                    count("agent.waits")
+                    if self.clock() - last_progress > self.stall_timeout:
+                        status = "stalled"
+                        break
+                    self.sleep(wait)
+                    wait = min(wait * 2, self.max_poll_interval)
+            finally:
+                self.automator.close()
+
+        result = {
+            "status": status,
+            "steps": len(events),
+            "decisions": decisions,
+            "screens": screens,
+            "failed_actions": failed,
+            "elapsed_s": round(self.clock() - started, 6),
+            "events": events,
+            "step_code": step_code,
+        }
+        if self.analysis is not None:
+            generator = ScriptGenerator(self.analysis, telemetry=self.telemetry)
+            result["script"] = generator.generate_gui_script(events)
+        return result
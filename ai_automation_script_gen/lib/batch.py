@@ -0,0 +1,139 @@
+import json
+import logging
+import os
+import sys
+import time
+from concurrent.futures import ProcessPoolExecutor, FIRST_COMPLETED, wait
+from concurrent.futures.process import BrokenProcessPool
+from lib.introspect import StaticAnalyzer, DEFAULT_SCAN_WINDOW
+from lib.generator import ScriptGenerator
+from lib.cache import open_cache
+from lib.profiling import count, profiled
+
+INSTALLER_EXTENSIONS = ('.exe', '.msi')
+
+# Tasks queued per worker. Keeps every core busy without materializing
+# the whole directory as futures.
+IN_FLIGHT_PER_WORKER = 2
+
+
+def iter_installers(setups_dir):
+    """
+    Yields installer paths lazily so large shares are never listed in memory.
+    """
+    with os.scandir(setups_dir) as entries:
+        for entry in entries:
+            if entry.is_file() and entry.name.lower().endswith(INSTALLER_EXTENSIONS):
+                yield entry.path
+
+
+def process_installer(file_path, output_dir, scan_window=DEFAULT_SCAN_WINDOW, cache_path=None):
+    """
+    Analyzes one installer and writes its script. Runs inside a pool worker.
+    Never raises: failures are reported in the returned record.
+    `cache_path` of None disables the analysis cache.
+    """
+    record = {"installer": file_path}
+    start = time.perf_counter()
+    try:
+        cache = open_cache(cache_path) if cache_path else None
+        analysis = StaticAnalyzer(file_path, scan_window=scan_window, cache=cache).analyze()
+        script_code = ScriptGenerator(analysis).generate_script()
+
+        output_path = os.path.join(output_dir, f"install_{os.path.basename(file_path)}.ps1")
+        with open(output_path, "w") as f:
+            f.write(script_code)
+
+        record.update({"status": "ok", "analysis": analysis, "script_path": output_path})
+    except Exception as e:
+        record.update({"status": "error", "error": f"{type(e).__name__}: {e}"})
+    record["elapsed_s"] = round(time.perf_counter() - start, 4)
+    return record
+
+
+@profiled("batch")
+def run_batch(setups_dir, output_path="-", workers=None, output_dir=None,
+              scan_window=DEFAULT_SCAN_WINDOW, cache_path=None):
+    """
+    Runs analysis and script generation over every installer in `setups_dir`
+    using a process pool, streaming one JSONL record per installer as it finishes.
+
+    Returns a summary dict with totals.
+    """
+    workers = workers or os.cpu_count() or 1
+    output_dir = os.path.abspath(output_dir or os.getcwd())
+    os.makedirs(output_dir, exist_ok=True)
+    max_in_flight = workers * IN_FLIGHT_PER_WORKER
+
+    summary = {"total": 0, "ok": 0, "errors": 0}
+    start = time.perf_counter()
+
+    out = sys.stdout if output_path == "-" else open(output_path, "w")
+    try:
+        def emit(record):
+            out.write(json.dumps(record) + "\n")
+            out.flush()
+            summary["total"] += 1
+            summary["ok" if record["status"] == "ok" else "errors"] += 1
+            # Pool workers are not profiled; their time shows up here. Records
+            # of installers that crashed their worker have no elapsed_s.
+            count("batch.worker_s", record.get("elapsed_s", 0))
+
+        installers = iter_installers(setups_dir)
+        executor = ProcessPoolExecutor(max_workers=workers)
+        pending = {}
+        # Installers caught in a pool crash get one more try in a fresh pool
+        retry, retried = [], set()
+        try:
+            exhausted = False
+            while pending or retry or not exhausted:
+                # Top up the queue; bounded so memory does not grow with the share
+                while len(pending) < max_in_flight:
+                    if retry:
+                        file_path = retry.pop()
+                    else:
+                        file_path = None if exhausted else next(installers, None)
+                        if file_path is None:
+                            exhausted = True
+                            break
+                    future = executor.submit(process_installer, file_path, output_dir, scan_window, cache_path)
+                    pending[future] = file_path
+
+                if not pending:
+                    break
+
+                done, _ = wait(pending, return_when=FIRST_COMPLETED)
+                broken = False
+                for future in done:
+                    file_path = pending.pop(future)
+                    try:
+                        emit(future.result())
+                    except BrokenProcessPool as e:
+                        # A worker died hard (e.g. crashed in native code)
+                        broken = True
+                        if file_path in retried:
+                            logging.error(f"Worker crashed on {file_path}: {e}")
+                            emit({"installer": file_path, "status": "error", "error": f"worker crashed: {e}"})
+                        else:
+                            retried.add(file_path)
+                            retry.append(file_path)
+
+                if broken:
+                    for file_path in pending.values():
+                        if file_path not in retried:
+                            retried.add(file_path)
+                            retry.append(file_path)
+                        else:
+                            emit({"installer": file_path, "status": "error", "error": "worker crashed"})
+                    pending.clear()
+                    executor.shutdown(wait=False, cancel_futures=True)
+                    executor = ProcessPoolExecutor(max_workers=workers)
+        finally:
+            executor.shutdown(wait=True, cancel_futures=True)
+    finally:
+        if out is not sys.stdout:
+            out.close()
+
+    summary["elapsed_s"] = round(time.perf_counter() - start, 3)
+    summary["workers"] = workers
+    return summary
@@ -0,0 +1,217 @@
+import hashlib
+import json
+import logging
+import os
+import sqlite3
+import time
+from lib.profiling import count, span
+
+DEFAULT_CACHE_DIR = os.environ.get(
+    "AI_SCRIPT_GEN_CACHE_DIR",
+    os.path.join(os.path.expanduser("~"), ".cache", "ai_automation_script_gen")
+)
+DEFAULT_CACHE_FILE = "analysis_cache.sqlite"
+DEFAULT_MAX_BYTES = 256 * 1024 * 1024
+HASH_CHUNK_SIZE = 8 * 1024 * 1024
+
+
+def file_digest(file_path):
+    """
+    Streams a file through SHA-256 with a fixed-size buffer.
+    """
+    digest = hashlib.sha256()
+    buf = bytearray(HASH_CHUNK_SIZE)
+    view = memoryview(buf)
+    with open(file_path, 'rb') as f:
+        while True:
+            n = f.readinto(buf)
+            if not n:
+                break
+            digest.update(view[:n])
+    return digest.hexdigest()
+
+
+def _rebase_paths(value, old_path, new_path):
+    """
+    Rewrites a cached result that was produced for the same content at another path.
+    """
+    if isinstance(value, str):
+        return value.replace(old_path, new_path)
+    if isinstance(value, list):
+        return [_rebase_paths(v, old_path, new_path) for v in value]
+    if isinstance(value, dict):
+        return {k: _rebase_paths(v, old_path, new_path) for k, v in value.items()}
+    return value
+
+
+class AnalysisCache:
+    """
+    Persistent, content-addressed store for StaticAnalyzer results.
+
+    Entries are keyed by the installer's SHA-256 plus the analyzer version. A
+    (size, mtime) index per path means unchanged files are never re-hashed.
+    Total stored bytes are bounded with least-recently-used eviction.
+    """
+    def __init__(self, db_path=None, max_bytes=DEFAULT_MAX_BYTES):
+        if db_path is None:
+            db_path = os.path.join(DEFAULT_CACHE_DIR, DEFAULT_CACHE_FILE)
+        os.makedirs(os.path.dirname(os.path.abspath(db_path)), exist_ok=True)
+        self.db_path = db_path
+        self.max_bytes = max_bytes
+
+        # Batch workers share the file, so wait on locks instead of failing
+        self.conn = sqlite3.connect(db_path, timeout=30, isolation_level=None)
+        self.conn.execute("PRAGMA journal_mode=WAL")
+        self.conn.execute("PRAGMA synchronous=NORMAL")
+        self.conn.executescript("""
+            CREATE TABLE IF NOT EXISTS entries (
+                key TEXT PRIMARY KEY,
+                value TEXT NOT NULL,
+                size INTEGER NOT NULL,
+                last_access REAL NOT NULL
+            );
+            CREATE INDEX IF NOT EXISTS entries_lru ON entries(last_access);
+            CREATE TABLE IF NOT EXISTS file_index (
+                path TEXT PRIMARY KEY,
+                size INTEGER NOT NULL,
+                mtime_ns INTEGER NOT NULL,
+                digest TEXT NOT NULL
+            );
+            CREATE TABLE IF NOT EXISTS stats (
+                name TEXT PRIMARY KEY,
+                value INTEGER NOT NULL
+            );
+        """)
+
+    def close(self):
+        self.conn.close()
+
+    def content_hash(self, file_path):
+        """
+        Returns the file's SHA-256, re-hashing only if its size or mtime changed.
+        """
+        file_path = os.path.abspath(file_path)
+        st = os.stat(file_path)
+        row = self.conn.execute(
+            "SELECT size, mtime_ns, digest FROM file_index WHERE path = ?", (file_path,)
+        ).fetchone()
+        if row and row[0] == st.st_size and row[1] == st.st_mtime_ns:
+            return row[2]
+
+        with span("cache.hash", bytes=st.st_size):
+            digest = file_digest(file_path)
+        count("cache.bytes_hashed", st.st_size)
+        self.conn.execute(
+            "INSERT OR REPLACE INTO file_index (path, size, mtime_ns, digest) VALUES (?, ?, ?, ?)",
+            (file_path, st.st_size, st.st_mtime_ns, digest)
+        )
+        return digest
+
+    @staticmethod
+    def _key(digest, version):
+        return f"{digest}:{version}"
+
+    def get(self, file_path, version):
+        """
+        Returns the cached analysis for this file's content, or None.
+        """
+        file_path = os.path.abspath(file_path)
+        key = self._key(self.content_hash(file_path), version)
+        row = self.conn.execute("SELECT value FROM entries WHERE key = ?", (key,)).fetchone()
+        if row is None:
+            self._bump("misses")
+            count("cache.misses")
+            return None
+
+        self.conn.execute("UPDATE entries SET last_access = ? WHERE key = ?", (time.time(), key))
+        self._bump("hits")
+        count("cache.hits")
+        self._bump("bytes_saved", os.path.getsize(file_path))
+
+        result = json.loads(row[0])
+        cached_path = result.get("path")
+        if cached_path and cached_path != file_path:
+            result = _rebase_paths(result, cached_path, file_path)
+        return result
+
+    def put(self, file_path, version, result):
+        file_path = os.path.abspath(file_path)
+        key = self._key(self.content_hash(file_path), version)
+        value = json.dumps(result)
+        self.conn.execute(
+            "INSERT OR REPLACE INTO entries (key, value, size, last_access) VALUES (?, ?, ?, ?)",
+            (key, value, len(value), time.time())
+        )
+        self._evict()
+
+    def get_or_compute(self, file_path, version, compute):
+        """
+        Returns the cached result, or calls `compute()` and stores what it returns.
+        """
+        try:
+            result = self.get(file_path, version)
+        except (OSError, sqlite3.Error) as e:
+            logging.error(f"Analysis cache lookup failed: {e}")
+            return compute()
+        if result is not None:
+            return result
+
+        result = compute()
+        if "error" not in result:
+            try:
+                self.put(file_path, version, result)
+            except (OSError, sqlite3.Error) as e:
+                logging.error(f"Analysis cache store failed: {e}")
+        return result
+
+    def _evict(self):
+        total = self.conn.execute("SELECT COALESCE(SUM(size), 0) FROM entries").fetchone()[0]
+        if total <= self.max_bytes:
+            return
+        victims = []
+        for key, size in self.conn.execute("SELECT key, size FROM entries ORDER BY last_access ASC"):
+            if total <= self.max_bytes:
+                break
+            victims.append((key,))
+            total -= size
+        self.conn.executemany("DELETE FROM entries WHERE key = ?", victims)
+        self._bump("evictions", len(victims))
+
+    def _bump(self, name, amount=1):
+        self.conn.execute(
+            "INSERT INTO stats (name, value) VALUES (?, ?) "
+            "ON CONFLICT(name) DO UPDATE SET value = value + excluded.value",
+            (name, amount)
+        )
+
+    def stats(self):
+        """
+        Returns cumulative hits, misses, bytes saved and current size.
+        """
+        stats = {"hits": 0, "misses": 0, "bytes_saved": 0, "evictions": 0}
+        stats.update(dict(self.conn.execute("SELECT name, value FROM stats")))
+        entries, size = self.conn.execute("SELECT COUNT(*), COALESCE(SUM(size), 0) FROM entries").fetchone()
+        lookups = stats["hits"] + stats["misses"]
+        stats.update({
+            "entries": entries,
+            "size_bytes": size,
+            "max_bytes": self.max_bytes,
+            "hit_rate": round(stats["hits"] / lookups, 4) if lookups else 0.0
+        })
+        return stats
+
+
+_open_caches = {}
+
+
+def open_cache(db_path=None, max_bytes=DEFAULT_MAX_BYTES):
+    """
+    Returns one AnalysisCache per process and path. Pool workers each get their
+    own sqlite connection instead of inheriting the parent's across a fork.
+    """
+    key = (os.getpid(), db_path)
+    cache = _open_caches.get(key)
+    if cache is None:
+        cache = AnalysisCache(db_path, max_bytes=max_bytes)
+        _open_caches[key] = cache
+    return cache
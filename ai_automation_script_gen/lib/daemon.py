@@ -0,0 +1,447 @@
+"""
+Resident analysis/generation service with a local HTTP/JSON API.
+
+    python main.py --serve [--port 8765 | --socket /tmp/aisg.sock] [--workers N]
+
+Endpoints (JSON bodies and answers):
+
+    POST /analyze   {"path"}                 -> {"analysis", "cached", "elapsed_ms"}
+    POST /generate  {"analysis", "events"?}  -> {"script", "elapsed_ms"}
+    POST /build     {"path", "output_dir"?}  -> {"analysis", "script", "script_path"?, "cached", "elapsed_ms"}
+    GET  /health                             -> {"status", "pid", "uptime_s"}
+    GET  /metrics                            -> queue, cache and per-endpoint latency figures
+    POST /shutdown                           -> stops after in-flight requests finish
+
+Interpreter startup and imports are paid once. Analyses of unchanged files
+(same path, size and mtime) are answered from memory; other files go to a
+bounded process pool backed by the on-disk AnalysisCache. When the pool
+and its queue are full, requests get 503 with Retry-After.
+"""
+import json
+import logging
+import os
+import signal
+import socket
+import socketserver
+import sys
+import threading
+import time
+from collections import OrderedDict, deque
+from concurrent.futures import ProcessPoolExecutor
+from concurrent.futures.process import BrokenProcessPool
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from lib.cache import open_cache
+from lib.daemon_client import DEFAULT_HOST, DEFAULT_PORT
+from lib.generator import ScriptGenerator
+from lib.introspect import DEFAULT_SCAN_WINDOW, StaticAnalyzer
+from lib.profiling import count, span
+from lib.telemetry import TelemetryStore, percentile
+
+# Requests waiting for a worker beyond those running; more are turned away
+DEFAULT_MAX_QUEUE = 64
+DEFAULT_MEMORY_ENTRIES = 4096
+MAX_BODY_BYTES = 16 * 1024 * 1024
+LATENCY_WINDOW = 2048
+RETRY_AFTER = 1
+# A kept-alive connection idle this long is closed (clients reconnect on their next call)
+KEEPALIVE_TIMEOUT = 15.0
+
+
+class DaemonError(Exception):
+    def __init__(self, status, message):
+        super().__init__(message)
+        self.status = status
+
+
+def analyze_installer(path, scan_window, cache_path):
+    """
+    Runs in a pool worker. Each worker keeps its own cache connection.
+    """
+    cache = open_cache(cache_path) if cache_path else None
+    return StaticAnalyzer(path, scan_window=scan_window, cache=cache).analyze()
+
+
+def _warm():
+    return os.getpid()
+
+
+class MemoryCache:
+    """
+    LRU of analyses keyed by (path, size, mtime_ns): a stat() decides a hit.
+    """
+    def __init__(self, max_entries=DEFAULT_MEMORY_ENTRIES):
+        self.max_entries = max_entries
+        self.entries = OrderedDict()
+        self.hits = self.misses = 0
+        self._lock = threading.Lock()
+
+    @staticmethod
+    def key(path):
+        st = os.stat(path)
+        return path, st.st_size, st.st_mtime_ns
+
+    def get(self, key):
+        with self._lock:
+            value = self.entries.get(key)
+            if value is None:
+                self.misses += 1
+                return None
+            self.entries.move_to_end(key)
+            self.hits += 1
+            return value
+
+    def put(self, key, value):
+        with self._lock:
+            self.entries[key] = value
+            self.entries.move_to_end(key)
+            while len(self.entries) > self.max_entries:
+                self.entries.popitem(last=False)
+
+    def stats(self):
+        with self._lock:
+            lookups = self.hits + self.misses
+            return {"entries": len(self.entries), "max_entries": self.max_entries, "hits": self.hits,
+                    "misses": self.misses, "hit_rate": round(self.hits / lookups, 4) if lookups else 0.0}
+
+
+class AnalysisService:
+    """
+    What the daemon does, independent of HTTP: bounded pool, warm caches
+    and metrics. Safe to call from many request threads.
+    """
+    def __init__(self, workers=None, max_queue=DEFAULT_MAX_QUEUE, cache_path=None, telemetry_path=None,
+                 scan_window=DEFAULT_SCAN_WINDOW, memory_entries=DEFAULT_MEMORY_ENTRIES):
+        self.workers = workers or os.cpu_count() or 1
+        self.max_queue = max_queue
+        self.cache_path = cache_path
+        self.telemetry_path = telemetry_path
+        self.scan_window = scan_window
+        self.memory = MemoryCache(memory_entries)
+        self.started = time.time()
+        self.counters = {"requests": 0, "errors": 0, "rejected": 0, "analyses": 0, "pool_restarts": 0}
+        self.latency = {}
+        self.in_flight = 0
+        self._slots = threading.BoundedSemaphore(self.workers + max_queue)
+        self._lock = threading.Lock()
+        self._local = threading.local()
+        self._executor = self._new_executor()
+
+    def _new_executor(self):
+        executor = ProcessPoolExecutor(max_workers=self.workers)
+        # Start the workers now so the first requests don't pay for it
+        for future in [executor.submit(_warm) for _ in range(self.workers)]:
+            future.result()
+        return executor
+
+    def _bump(self, name, amount=1):
+        with self._lock:
+            self.counters[name] += amount
+
+    def record(self, endpoint, elapsed_ms, ok):
+        with self._lock:
+            self.counters["requests"] += 1
+            if not ok:
+                self.counters["errors"] += 1
+            self.latency.setdefault(endpoint, deque(maxlen=LATENCY_WINDOW)).append(elapsed_ms)
+
+    def _telemetry(self):
+        # sqlite connections stay on the thread that opened them
+        if self.telemetry_path is None:
+            return None
+        store = getattr(self._local, "telemetry", None)
+        if store is None:
+            store = self._local.telemetry = TelemetryStore(self.telemetry_path)
+        return store
+
+    def analyze(self, path):
+        """
+        Returns (analysis, cached) where cached is "memory", or False when a
+        worker ran the analysis (which may itself hit the on-disk cache).
+        """
+        if not path or not isinstance(path, str):
+            raise DaemonError(400, "'path' is required")
+        path = os.path.abspath(path)
+        try:
+            key = MemoryCache.key(path)
+        except OSError:
+            raise DaemonError(404, f"File '{path}' not found")
+        analysis = self.memory.get(key)
+        if analysis is not None:
+            count("daemon.memory_hits")
+            return analysis, "memory"
+
+        if not self._slots.acquire(blocking=False):
+            self._bump("rejected")
+            raise DaemonError(503, "Analysis queue is full")
+        try:
+            with self._lock:
+                self.in_flight += 1
+            with span("daemon.analyze", path=os.path.basename(path)):
+                analysis = self._run(path)
+        finally:
+            with self._lock:
+                self.in_flight -= 1
+            self._slots.release()
+        self._bump("analyses")
+        if "error" not in analysis:
+            self.memory.put(key, analysis)
+        return analysis, False
+
+    def _run(self, path):
+        executor = self._executor
+        try:
+            return executor.submit(analyze_installer, path, self.scan_window, self.cache_path).result()
+        except BrokenProcessPool:
+            # A worker died hard; replace the pool once and retry
+            with self._lock:
+                if self._executor is executor:
+                    self.counters["pool_restarts"] += 1
+                    executor.shutdown(wait=False, cancel_futures=True)
+                    self._executor = ProcessPoolExecutor(max_workers=self.workers)
+            return self._executor.submit(analyze_installer, path, self.scan_window, self.cache_path).result()
+
+    def generate(self, analysis, events=None):
+        if not isinstance(analysis, dict):
+            raise DaemonError(400, "'analysis' must be an object")
+        generator = ScriptGenerator(analysis, telemetry=self._telemetry())
+        if events:
+            return generator.generate_gui_script(events)
+        return generator.generate_script()
+
+    def build(self, path, output_dir=None):
+        analysis, cached = self.analyze(path)
+        result = {"analysis": analysis, "cached": cached}
+        if "error" in analysis:
+            return result
+        result["script"] = self.generate(analysis)
+        if output_dir:
+            script_path = os.path.join(os.path.abspath(output_dir), f"install_{os.path.basename(path)}.ps1")
+            with open(script_path, "w") as f:
+                f.write(result["script"])
+            result["script_path"] = script_path
+        return result
+
+    def metrics(self):
+        with self._lock:
+            counters = dict(self.counters)
+            in_flight = self.in_flight
+            latency = {endpoint: sorted(values) for endpoint, values in self.latency.items()}
+        return {
+            **counters,
+            "workers": self.workers,
+            "in_flight": in_flight,
+            "queued": max(0, in_flight - self.workers),
+            "max_queue": self.max_queue,
+            "memory_cache": self.memory.stats(),
+            "latency_ms": {
+                endpoint: {"count": len(values), **{f"p{p}": round(percentile(values, p), 3) for p in (50, 95, 99)}}
+                for endpoint, values in latency.items()
+            },
+            "uptime_s": round(time.time() - self.started, 1),
+        }
+
+    def close(self):
+        self._executor.shutdown(wait=True, cancel_futures=True)
+
+
+class RequestHandler(BaseHTTPRequestHandler):
+    # Keep-alive, so a client pays one connect for many requests
+    protocol_version = "HTTP/1.1"
+    server_version = "AIScriptGenDaemon/1"
+    # Headers and body go out in separate writes; with Nagle on, delayed
+    # ACKs add ~40 ms to every kept-alive response
+    disable_nagle_algorithm = True
+    timeout = KEEPALIVE_TIMEOUT
+
+    def log_message(self, format, *args):
+        logging.debug("daemon: " + format % args)
+
+    def handle_one_request(self):
+        # Between requests the connection is idle and shutdown may end it
+        if not self.server.connection_idle(self.connection, True):
+            self.close_connection = True
+            return
+        super().handle_one_request()
+
+    def parse_request(self):
+        self.server.connection_idle(self.connection, False)
+        return super().parse_request()
+
+    def finish(self):
+        self.server.connection_idle(self.connection, False)
+        super().finish()
+
+    def address_string(self):
+        # Unix socket peers have no address
+        return self.client_address[0] if isinstance(self.client_address, tuple) else "local"
+
+    def _send(self, status, body, headers=None):
+        data = json.dumps(body).encode("utf-8")
+        self.send_response(status)
+        self.send_header("Content-Type", "application/json")
+        self.send_header("Content-Length", str(len(data)))
+        for name, value in (headers or {}).items():
+            self.send_header(name, value)
+        self.end_headers()
+        self.wfile.write(data)
+
+    def _body(self):
+        length = int(self.headers.get("Content-Length") or 0)
+        if length > MAX_BODY_BYTES:
+            raise DaemonError(413, "Request body too large")
+        if not length:
+            return {}
+        try:
+            body = json.loads(self.rfile.read(length))
+        except (json.JSONDecodeError, UnicodeDecodeError) as e:
+            raise DaemonError(400, f"Invalid JSON: {e}")
+        if not isinstance(body, dict):
+            raise DaemonError(400, "Request body must be a JSON object")
+        return body
+
+    def _dispatch(self, method):
+        service = self.server.service
+        endpoint = self.path.split("?", 1)[0]
+        started = time.perf_counter()
+        status, headers = 200, None
+        try:
+            if method == "GET" and endpoint == "/health":
+                body = {"status": "ok", "pid": os.getpid(), "uptime_s": round(time.time() - service.started, 1)}
+            elif method == "GET" and endpoint == "/metrics":
+                body = service.metrics()
+            elif method == "POST" and endpoint == "/analyze":
+                analysis, cached = service.analyze(self._body().get("path"))
+                body = {"analysis": analysis, "cached": cached}
+            elif method == "POST" and endpoint == "/generate":
+                request = self._body()
+                body = {"script": service.generate(request.get("analysis"), request.get("events"))}
+            elif method == "POST" and endpoint == "/build":
+                request = self._body()
+                body = service.build(request.get("path"), request.get("output_dir"))
+            elif method == "POST" and endpoint == "/shutdown":
+                body = {"status": "shutting down"}
+                self.close_connection = True
+                threading.Thread(target=self.server.shutdown, daemon=True).start()
+            else:
+                raise DaemonError(404, f"No endpoint {method} {endpoint}")
+        except DaemonError as e:
+            status, body = e.status, {"error": str(e)}
+            if e.status == 503:
+                headers = {"Retry-After": str(RETRY_AFTER)}
+        except Exception as e:
+            logging.exception(f"Daemon request {endpoint} failed")
+            status, body = 500, {"error": f"{type(e).__name__}: {e}"}
+        elapsed_ms = (time.perf_counter() - started) * 1000
+        if isinstance(body, dict) and endpoint not in ("/health", "/metrics"):
+            body["elapsed_ms"] = round(elapsed_ms, 3)
+        self._send(status, body, headers)
+        service.record(endpoint, elapsed_ms, status < 400)
+
+    def do_GET(self):
+        self._dispatch("GET")
+
+    def do_POST(self):
+        self._dispatch("POST")
+
+
+class KeepAliveTracking:
+    """
+    Server mixin tracking which connections wait for their next request.
+    Request threads are joined on shutdown so in-flight work completes; idle
+    keep-alive connections are ended at once instead of holding it up.
+    """
+    daemon_threads = False
+    block_on_close = True
+
+    def init_tracking(self):
+        self._idle = set()
+        self._idle_lock = threading.Lock()
+        self._stopping = False
+
+    def connection_idle(self, sock, idle):
+        """
+        Marks a connection idle or busy. False once the server is stopping:
+        the connection must close rather than wait for another request.
+        """
+        with self._idle_lock:
+            if idle and self._stopping:
+                return False
+            (self._idle.add if idle else self._idle.discard)(sock)
+            return True
+
+    def shutdown(self):
+        with self._idle_lock:
+            self._stopping = True
+            idle = list(self._idle)
+        for sock in idle:
+            # The handler's pending read returns EOF and the connection closes
+            try:
+                sock.shutdown(socket.SHUT_RD)
+            except OSError:
+                pass
+        super().shutdown()
+
+
+class DaemonHTTPServer(KeepAliveTracking, ThreadingHTTPServer):
+    def __init__(self, address, service):
+        self.service = service
+        self.init_tracking()
+        super().__init__(address, RequestHandler)
+
+
+class UnixRequestHandler(RequestHandler):
+    # TCP_NODELAY does not apply to Unix sockets
+    disable_nagle_algorithm = False
+
+
+if hasattr(socket, "AF_UNIX"):
+    class DaemonUnixServer(KeepAliveTracking, socketserver.ThreadingMixIn, socketserver.UnixStreamServer):
+        def __init__(self, path, service):
+            self.service = service
+            self.init_tracking()
+            if os.path.exists(path):
+                os.unlink(path)
+            super().__init__(path, UnixRequestHandler)
+
+        def server_close(self):
+            super().server_close()
+            try:
+                os.unlink(self.server_address)
+            except OSError:
+                pass
+
+
+def make_server(service, host=DEFAULT_HOST, port=DEFAULT_PORT, socket_path=None):
+    if socket_path:
+        if not hasattr(socket, "AF_UNIX"):
+            raise DaemonError(400, "Unix sockets are not available on this platform")
+        return DaemonUnixServer(socket_path, service)
+    return DaemonHTTPServer((host, port), service)
+
+
+def serve(host=DEFAULT_HOST, port=DEFAULT_PORT, socket_path=None, ready=None, **service_options):
+    """
+    Runs the daemon until /shutdown, SIGTERM or Ctrl+C, then lets in-flight
+    requests finish and stops the worker pool. `ready(address)` is called
+    once the server is listening.
+    """
+    service = AnalysisService(**service_options)
+    server = make_server(service, host, port, socket_path)
+
+    def stop(signum, frame):
+        threading.Thread(target=server.shutdown, daemon=True).start()
+
+    if threading.current_thread() is threading.main_thread():
+        signal.signal(signal.SIGTERM, stop)
+        signal.signal(signal.SIGINT, stop)
+    address = server.server_address if socket_path else f"http://{server.server_address[0]}:{server.server_address[1]}"
+    print(f"Serving on {address} with {service.workers} workers", file=sys.stderr)
+    if ready:
+        ready(address)
+    try:
+        server.serve_forever()
+    finally:
+        server.server_close()
+        service.close()
+        print("Daemon stopped", file=sys.stderr)
+    return service.metrics()
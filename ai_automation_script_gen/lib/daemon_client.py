@@ -0,0 +1,184 @@
+"""
+Thin client for the resident daemon (lib/daemon.py). One kept-alive
+connection carries every request, so a call costs a round trip, not a
+Python startup.
+
+    python -m lib.daemon_client [--url http://127.0.0.1:8765 | --socket PATH] analyze FILE
+    python -m lib.daemon_client build FILE [--out-dir DIR]
+    python -m lib.daemon_client metrics | health | shutdown
+"""
+import http.client
+import json
+import os
+import socket
+import sys
+import time
+from urllib.parse import urlsplit
+
+# Shared with lib/daemon.py; defined here so the client stays stdlib-only and quick to import
+DEFAULT_HOST = "127.0.0.1"
+DEFAULT_PORT = 8765
+DEFAULT_URL = f"http://{DEFAULT_HOST}:{DEFAULT_PORT}"
+
+
+class DaemonUnavailable(Exception):
+    pass
+
+
+class DaemonRequestError(Exception):
+    def __init__(self, status, message, retry_after=None):
+        super().__init__(message)
+        self.status = status
+        self.retry_after = retry_after
+
+
+class UnixHTTPConnection(http.client.HTTPConnection):
+    def __init__(self, socket_path, timeout=None):
+        super().__init__("localhost", timeout=timeout)
+        self.socket_path = socket_path
+
+    def connect(self):
+        self.sock = socket.socket(socket.AF_UNIX, socket.SOCK_STREAM)
+        if self.timeout is not None:
+            self.sock.settimeout(self.timeout)
+        self.sock.connect(self.socket_path)
+
+
+class DaemonClient:
+    def __init__(self, url=DEFAULT_URL, socket_path=None, timeout=None, retries=3):
+        self.url = url
+        self.socket_path = socket_path
+        self.timeout = timeout
+        # Attempts on 503 (queue full), honouring Retry-After
+        self.retries = retries
+        self._conn = None
+
+    def _connection(self):
+        if self._conn is None:
+            if self.socket_path:
+                self._conn = UnixHTTPConnection(self.socket_path, timeout=self.timeout)
+            else:
+                parts = urlsplit(self.url)
+                self._conn = http.client.HTTPConnection(parts.hostname or DEFAULT_HOST, parts.port or DEFAULT_PORT,
+                                                        timeout=self.timeout)
+        return self._conn
+
+    def close(self):
+        if self._conn is not None:
+            self._conn.close()
+            self._conn = None
+
+    def _send(self, method, path, body):
+        data = json.dumps(body).encode("utf-8") if body is not None else None
+        headers = {"Content-Type": "application/json"} if data is not None else {}
+        # A kept-alive connection the server closed fails once; reconnect and resend
+        for attempt in range(2):
+            conn = self._connection()
+            try:
+                conn.request(method, path, body=data, headers=headers)
+                response = conn.getresponse()
+                payload = response.read()
+                if response.getheader("Connection", "").lower() == "close":
+                    self.close()
+                return response, payload
+            except (ConnectionError, http.client.RemoteDisconnected, http.client.CannotSendRequest):
+                self.close()
+                if attempt:
+                    raise
+            except OSError as e:
+                self.close()
+                raise DaemonUnavailable(f"Daemon not reachable at {self.socket_path or self.url}: {e}")
+
+    def request(self, method, path, body=None):
+        for attempt in range(self.retries + 1):
+            try:
+                response, payload = self._send(method, path, body)
+            except (ConnectionError, http.client.HTTPException) as e:
+                raise DaemonUnavailable(f"Daemon not reachable at {self.socket_path or self.url}: {e}")
+            result = json.loads(payload) if payload else {}
+            if response.status == 503 and attempt < self.retries:
+                time.sleep(float(response.getheader("Retry-After", 1)))
+                continue
+            if response.status >= 400:
+                raise DaemonRequestError(response.status, result.get("error", response.reason),
+                                         response.getheader("Retry-After"))
+            return result
+
+    def analyze(self, path):
+        return self.request("POST", "/analyze", {"path": os.path.abspath(path)})
+
+    def generate(self, analysis, events=None):
+        body = {"analysis": analysis}
+        if events:
+            body["events"] = events
+        return self.request("POST", "/generate", body)
+
+    def build(self, path, output_dir=None):
+        body = {"path": os.path.abspath(path)}
+        if output_dir:
+            body["output_dir"] = os.path.abspath(output_dir)
+        return self.request("POST", "/build", body)
+
+    def health(self):
+        return self.request("GET", "/health")
+
+    def metrics(self):
+        return self.request("GET", "/metrics")
+
+    def shutdown(self):
+        return self.request("POST", "/shutdown")
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
+        return False
+
+
+def main(argv):
+    def option(name, default=None):
+        if name in argv:
+            idx = argv.index(name)
+            if idx + 1 < len(argv):
+                return argv[idx + 1]
+        return default
+
+    valued = {"--url", "--socket", "--out-dir"}
+    positional = [arg for i, arg in enumerate(argv)
+                  if not arg.startswith("--") and (i == 0 or argv[i - 1] not in valued)]
+    if not positional:
+        print(__doc__.strip())
+        return 1
+    command, args = positional[0], positional[1:]
+
+    with DaemonClient(option("--url", DEFAULT_URL), socket_path=option("--socket")) as client:
+        try:
+            if command in ("analyze", "build"):
+                if not args:
+                    print(f"Usage: {command} FILE")
+                    return 1
+                result = client.analyze(args[0]) if command == "analyze" else \
+                    client.build(args[0], option("--out-dir", os.getcwd()))
+            elif command in ("metrics", "health", "shutdown"):
+                result = getattr(client, command)()
+            else:
+                print(f"Unknown command '{command}'")
+                return 1
+        except DaemonUnavailable as e:
+            print(f"Error: {e}")
+            return 1
+        except DaemonRequestError as e:
+            print(f"Error ({e.status}): {e}")
+            return 1
+    if command == "build" and "script_path" in result:
+        print(f"SUCCESS: PowerShell Script generated at: {result['script_path']} "
+              f"(cached: {result['cached']}, {result['elapsed_ms']} ms)")
+    else:
+        result.pop("script", None)
+        print(json.dumps(result, indent=2))
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main(sys.argv[1:]))
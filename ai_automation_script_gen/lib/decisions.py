@@ -0,0 +1,149 @@
+import hashlib
+import json
+import logging
+import os
+from collections import OrderedDict
+from lib.cache import DEFAULT_CACHE_DIR
+
+DEFAULT_DECISIONS_FILE = "decision_cache.json"
+DEFAULT_MAX_ENTRIES = 4096
+
+# Navigation buttons in the order a standard installer wants them pressed
+PRIORITIES = [
+    "I agree", "I accept", "Agree",
+    "Next", "Next >", "Install", "Finish", "Close"
+]
+CHECKBOX_TYPES = ("CheckBox", "RadioButton")
+
+# Stored entries are only valid for the heuristic that produced them
+ENGINE_VERSION = "2"
+
+
+def screen_fingerprint(ui_context):
+    """
+    Order-independent hash of everything a decision depends on: the sorted
+    (title, control type, toggle state) signature of the screen's elements.
+    """
+    signature = sorted(
+        f"{item.get('title', '')}\x1f{item.get('control_type') or ''}\x1f{item.get('toggle_state') or ''}"
+        for item in ui_context
+    )
+    return hashlib.sha1("\x1e".join(signature).encode("utf-8")).hexdigest()
+
+
+class ScreenIndex:
+    """
+    One pass over a screen's elements: buckets by normalized title (first
+    occurrence order preserved) and the unticked "agree" boxes.
+    """
+    def __init__(self, ui_context):
+        self.by_title = {}
+        self.agree_boxes = []
+        for item in ui_context:
+            title = item.get('title', '')
+            self.by_title.setdefault(title.strip().lower(), []).append(item)
+            # UI Automation reports "ControlType.CheckBox"; accept both spellings
+            control_type = (item.get('control_type') or '').rsplit('.', 1)[-1]
+            if control_type in CHECKBOX_TYPES and "agree" in title.lower():
+                if not item.get("toggle_state", "off") == "on":
+                    self.agree_boxes.append(item)
+
+
+def decide(index, priorities=PRIORITIES):
+    """
+    The navigation heuristic over a ScreenIndex. Returns (decision, ambiguous):
+    `ambiguous` is set when the screen holds several different elements that
+    could win, so the outcome depends on their on-screen order.
+    """
+    # 1. Blocking "Agree" checkboxes first
+    if index.agree_boxes:
+        item = index.agree_boxes[0]
+        ambiguous = len({(i['title'], i['control_type']) for i in index.agree_boxes}) > 1
+        return {"action": "click", "selector": {"title": item['title'], "control_type": item['control_type']},
+                "reason": "Accepting Terms"}, ambiguous
+
+    # 2. Navigation buttons by priority
+    for keyword in priorities:
+        bucket = index.by_title.get(keyword.lower())
+        if bucket:
+            item = bucket[0]
+            text = item.get('title', '').strip()
+            ambiguous = len({(i.get('title', '').strip(), i.get('control_type')) for i in bucket}) > 1
+            # Avoid clicking "Cancel"
+            return {"action": "click", "selector": {"title": text, "control_type": item['control_type']},
+                    "reason": f"Clicking navigation button '{text}'"}, ambiguous
+
+    return None, False
+
+
+class DecisionCache:
+    """
+    Bounded LRU of decisions keyed by screen fingerprint, optionally persisted
+    to a JSON file so recurring wizard screens are decided once across runs.
+    """
+    def __init__(self, path=None, max_entries=DEFAULT_MAX_ENTRIES):
+        self.path = path
+        self.max_entries = max_entries
+        self.entries = OrderedDict()
+        self.hits = self.misses = self.uncacheable = 0
+        self._dirty = False
+        if path and os.path.exists(path):
+            self.load()
+
+    @classmethod
+    def persistent(cls, cache_dir=None, max_entries=DEFAULT_MAX_ENTRIES):
+        return cls(os.path.join(cache_dir or DEFAULT_CACHE_DIR, DEFAULT_DECISIONS_FILE), max_entries)
+
+    def get(self, fingerprint):
+        """
+        Returns (found, decision); a cached None means "nothing to click".
+        """
+        if fingerprint in self.entries:
+            self.entries.move_to_end(fingerprint)
+            self.hits += 1
+            return True, self.entries[fingerprint]
+        self.misses += 1
+        return False, None
+
+    def put(self, fingerprint, decision):
+        self.entries[fingerprint] = decision
+        self.entries.move_to_end(fingerprint)
+        while len(self.entries) > self.max_entries:
+            self.entries.popitem(last=False)
+        self._dirty = True
+
+    def load(self):
+        try:
+            with open(self.path, "r", encoding="utf-8") as f:
+                data = json.load(f)
+        except (OSError, ValueError) as e:
+            logging.error(f"Failed to load decision cache: {e}")
+            return
+        if data.get("version") != ENGINE_VERSION:
+            return
+        for fingerprint, decision in data.get("entries", [])[-self.max_entries:]:
+            self.entries[fingerprint] = decision
+
+    def save(self):
+        if not self.path or not self._dirty:
+            return
+        os.makedirs(os.path.dirname(os.path.abspath(self.path)), exist_ok=True)
+        tmp_path = f"{self.path}.{os.getpid()}.tmp"
+        try:
+            with open(tmp_path, "w", encoding="utf-8") as f:
+                json.dump({"version": ENGINE_VERSION, "entries": list(self.entries.items())}, f)
+            os.replace(tmp_path, self.path)
+            self._dirty = False
+        except OSError as e:
+            logging.error(f"Failed to save decision cache: {e}")
+
+    def stats(self):
+        lookups = self.hits + self.misses
+        return {
+            "hits": self.hits,
+            "misses": self.misses,
+            "uncacheable": self.uncacheable,
+            "entries": len(self.entries),
+            "max_entries": self.max_entries,
+            "hit_rate": round(self.hits / lookups, 4) if lookups else 0.0
+        }
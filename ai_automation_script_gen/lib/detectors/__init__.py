@@ -0,0 +1,3 @@
+# Installer detectors, registered in lib.introspect and imported on first match.
+# Each module exposes detect(analyzer, buf, pe) returning a partial analysis
+# dict (or None when the file turns out not to be of its kind).
@@ -0,0 +1,64 @@
+import struct
+import uuid
+from lib.introspect import INSTALLER_FRAMEWORKS, _payload_type
+
+BURN_SECTION_MAGIC = 0x00F14300
+CAB_MAGIC = b"MSCF"
+
+
+def container_type(buf, offset):
+    """
+    (type, compressed) from a container's first bytes. Bundles built with
+    uncompressed payloads attach the MSI or EXE itself, which can be
+    analyzed in place; cabinets can not.
+    """
+    head = bytes(buf[offset:offset + 8])
+    kind = _payload_type(head)
+    if kind:
+        return kind, False
+    return ("cab" if head.startswith(CAB_MAGIC) else None), True
+
+
+def detect(analyzer, buf, pe):
+    """
+    Reads the .wixburn section of a WiX Burn bundle: bundle id, stub size and
+    the sizes of the attached containers.
+    """
+    section = pe.section(b".wixburn")
+    start = section["raw_offset"]
+    data = bytes(buf[start:start + min(section["raw_size"], 512)])
+    if len(data) < 52:
+        return None
+    magic, version = struct.unpack_from("<II", data, 0)
+    if magic != BURN_SECTION_MAGIC:
+        return None
+    bundle_id = uuid.UUID(bytes_le=data[8:24])
+    stub_size, _, _, _, _, count = struct.unpack_from("<IIIIII", data, 24)
+    containers = list(struct.unpack_from(f"<{min(count, (len(data) - 48) // 4)}I", data, 48))
+
+    # Containers are appended after the stub, the UX container first
+    payloads = []
+    offset = stub_size
+    for index, size in enumerate(containers):
+        kind, compressed = container_type(buf, offset)
+        payload = {"offset": offset, "size": size, "type": kind, "container": "burn",
+                   "member": "ux" if index == 0 else f"attached{index}"}
+        if compressed:
+            payload["compressed"] = True
+        payloads.append(payload)
+        offset += size
+
+    flags = INSTALLER_FRAMEWORKS["wix_burn"]
+    return {
+        "framework": {"name": "wix_burn", "confidence": 0.99,
+                      "evidence": [f"section .wixburn v{version}", f"bundle {bundle_id}"]},
+        "burn": {
+            "bundle_id": str(bundle_id),
+            "stub_size": stub_size,
+            "container_sizes": containers,
+        },
+        "payloads": payloads,
+        "silent_flags": list(flags),
+        "install_cmd": f'"{analyzer.file_path}" ' + " ".join(flags),
+        "install_cmd_confidence": 0.99,
+    }
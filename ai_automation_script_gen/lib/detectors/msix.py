@@ -0,0 +1,39 @@
+import zipfile
+import xml.etree.ElementTree as ET
+from lib.introspect import BufferReader
+
+MANIFESTS = ("AppxManifest.xml", "AppxMetadata/AppxBundleManifest.xml")
+
+
+def _identity(manifest):
+    root = ET.fromstring(manifest)
+    for element in root.iter():
+        if element.tag.rsplit("}", 1)[-1] == "Identity":
+            return dict(element.attrib)
+    return {}
+
+
+def detect(analyzer, buf, pe):
+    """
+    MSIX/APPX packages and bundles are zip files with an XML manifest; they are
+    installed with Add-AppxPackage rather than run.
+    """
+    with BufferReader(buf) as reader, zipfile.ZipFile(reader) as package:
+        names = set(package.namelist())
+        manifest = next((m for m in MANIFESTS if m in names), None)
+        if manifest is None:
+            return None
+        identity = _identity(package.read(manifest))
+
+    properties = {
+        "ProductName": identity.get("Name", ""),
+        "ProductVersion": identity.get("Version", ""),
+        "Publisher": identity.get("Publisher", ""),
+    }
+    return {
+        "framework": {"name": "msix", "confidence": 0.99, "evidence": [f"manifest {manifest}"]},
+        "properties": {k: v for k, v in properties.items() if v},
+        "silent_flags": [],
+        "install_cmd": f'powershell -NoProfile -Command "Add-AppxPackage -Path \\"{analyzer.file_path}\\""',
+        "install_cmd_confidence": 0.99,
+    }
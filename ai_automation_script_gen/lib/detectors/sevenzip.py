@@ -0,0 +1,47 @@
+from lib.introspect import INSTALLER_FRAMEWORKS
+
+CONFIG_BEGIN = b";!@Install@!UTF-8!"
+CONFIG_END = b";!@InstallEnd@!"
+ARCHIVE_MAGIC = b"7z\xbc\xaf\x27\x1c"
+
+
+def _config(overlay):
+    """
+    Parses the optional SFX config block (key="value" lines) that precedes the archive.
+    """
+    end = overlay.find(CONFIG_END)
+    if not overlay.startswith(CONFIG_BEGIN) or end < 0:
+        return {}
+    config = {}
+    for line in overlay[len(CONFIG_BEGIN):end].decode("utf-8", "replace").splitlines():
+        key, sep, value = line.partition("=")
+        if sep:
+            config[key.strip()] = value.strip().strip('"')
+    return config
+
+
+def detect(analyzer, buf, pe):
+    """
+    7-Zip self-extracting archives: a PE stub followed by a 7z archive, with an
+    optional config block. -y answers every prompt with the defaults.
+    """
+    overlay = bytes(buf[pe.overlay_offset:pe.overlay_offset + min(pe.overlay_size, 64 * 1024)])
+    config = _config(overlay)
+    flags = INSTALLER_FRAMEWORKS["7z_sfx"]
+    result = {
+        "framework": {"name": "7z_sfx", "confidence": 0.9,
+                      "evidence": ["7z archive in overlay" if not config else "SFX config block in overlay"]},
+        "silent_flags": list(flags),
+        "install_cmd": f'"{analyzer.file_path}" ' + " ".join(flags),
+        "install_cmd_confidence": 0.9,
+    }
+    archive = overlay.find(ARCHIVE_MAGIC)
+    if archive >= 0:
+        offset = pe.overlay_offset + archive
+        result["payloads"] = [{"offset": offset, "size": pe.overlay_offset + pe.overlay_size - offset,
+                               "type": "7z", "container": "overlay", "compressed": True}]
+    if config:
+        result["sfx_config"] = config
+        if config.get("Title"):
+            result["properties"] = {"ProductName": config["Title"]}
+    return result
@@ -0,0 +1,53 @@
+import re
+import zipfile
+from lib.introspect import INSTALLER_FRAMEWORKS, BufferReader, find_resources
+
+PACKAGE_NAME = re.compile(r"^(?P<id>.+?)-(?P<version>\d+(?:\.\d+)*(?:-[0-9A-Za-z.]+)?)-(?:full|delta)$")
+
+
+def detect(analyzer, buf, pe):
+    """
+    Repacked Squirrel bundles append the zip with the app's .nupkg as the
+    overlay.
+    """
+    packages = _packages(buf, pe.overlay_offset, pe.overlay_size)
+    return _result(analyzer, packages, "overlay") if packages else None
+
+
+def detect_resource(analyzer, buf, pe):
+    """
+    Squirrel's own Setup.exe stores the zip as a "DATA" resource.
+    """
+    for offset, size in find_resources(buf, pe, "DATA"):
+        packages = _packages(buf, offset, size)
+        if packages:
+            return _result(analyzer, packages, "DATA resource")
+    return None
+
+
+def _result(analyzer, packages, where):
+    flags = INSTALLER_FRAMEWORKS["squirrel"]
+    # Package files are named <id>-<version>-full.nupkg; ids may contain hyphens
+    name = packages[0].rsplit("/", 1)[-1][:-len(".nupkg")]
+    match = PACKAGE_NAME.match(name)
+    if match:
+        product, version = match.group("id"), match.group("version")
+    else:
+        product, _, version = name.removesuffix("-full").rpartition("-")
+        product, version = (product, version) if product else (version, "")
+    return {
+        "framework": {"name": "squirrel", "confidence": 0.97, "evidence": [f"package {packages[0]} in {where}"]},
+        "properties": {k: v for k, v in {"ProductName": product, "ProductVersion": version}.items() if v},
+        "silent_flags": list(flags),
+        "install_cmd": f'"{analyzer.file_path}" ' + " ".join(flags),
+        "install_cmd_confidence": 0.97,
+    }
+
+
+def _packages(buf, offset, size):
+    with memoryview(buf) as view, BufferReader(view[offset:offset + size]) as reader:
+        try:
+            with zipfile.ZipFile(reader) as archive:
+                return [n for n in archive.namelist() if n.lower().endswith(".nupkg")]
+        except zipfile.BadZipFile:
+            return []
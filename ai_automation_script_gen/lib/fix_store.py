@@ -0,0 +1,189 @@
+import hashlib
+import json
+import logging
+import math
+import os
+import re
+import sqlite3
+import time
+from lib.cache import DEFAULT_CACHE_DIR
+from lib.profiling import count
+from lib.verifier import FAILURE_SIGNATURES
+
+DEFAULT_FIX_STORE_FILE = "fix_store.sqlite"
+
+# Evidence loses half its weight every HALF_LIFE seconds
+HALF_LIFE = 30 * 24 * 3600
+# Entries whose decayed evidence falls below this are pruned
+MIN_WEIGHT = 0.05
+# A known fix is applied without analysis only if it usually works
+MIN_SUCCESS_RATE = 0.5
+# Lines kept in a signature
+MAX_SIGNATURE_LINES = 20
+
+# Volatile parts of verifier output, replaced before hashing. Order matters:
+# timestamps and GUIDs contain numbers, paths contain almost anything.
+_NOISE = [
+    (re.compile(r"\d{4}-\d{2}-\d{2}[T ]\d{2}:\d{2}:\d{2}(?:[.,]\d+)?(?:Z|[+-]\d{2}:?\d{2})?"), "<ts>"),
+    (re.compile(r"\b\d{1,2}[/.]\d{1,2}[/.]\d{2,4}\b"), "<date>"),
+    (re.compile(r"\b\d{1,2}:\d{2}(?::\d{2}(?:[.,]\d+)?)?\b"), "<time>"),
+    (re.compile(r"\{?\b[0-9a-fA-F]{8}-(?:[0-9a-fA-F]{4}-){3}[0-9a-fA-F]{12}\b\}?"), "<guid>"),
+    (re.compile(r"(?:[A-Za-z]:|\\\\[^\\\s]+)\\[^\s'\"<>|]*"), "<path>"),
+    (re.compile(r"(?<![\w<])/(?:[^\s/'\"<>]+/)*[^\s/'\"<>]+"), "<path>"),
+    (re.compile(r"\b[\w.-]+\.(?:py|ps1|bat|cmd|exe|msi|msix|dll|log|txt)\b", re.IGNORECASE), "<file>"),
+    (re.compile(r"\b0x[0-9a-fA-F]+\b"), "<hex>"),
+    (re.compile(r"\d+(?:\.\d+)?"), "<n>"),
+]
+# Lines that describe the failure, as opposed to progress chatter
+_FAILURE_CUES = [re.compile(p) for p in FAILURE_SIGNATURES] + [
+    re.compile(r"(?i)\b(?:error|exception|fail(?:ed|ure)?|timed out|denied|not found|aborted)\b"),
+    re.compile(r"^\w+(?:\.\w+)*(?:Error|Exception|Expired|Interrupt):"),
+]
+_STREAM_PREFIX = re.compile(r"^(?:Output|Error):\s?")
+
+
+def normalize_line(line):
+    line = _STREAM_PREFIX.sub("", line.strip())
+    for pattern, placeholder in _NOISE:
+        line = pattern.sub(placeholder, line)
+    return re.sub(r"\s+", " ", line).strip().lower()
+
+
+def failure_signature(output):
+    """
+    Hash of the failure-describing lines of verifier output with paths,
+    numbers, GUIDs and timestamps stripped, so the same failure on another
+    machine, script or day maps to the same signature. Falls back to the
+    last lines when nothing looks like an error.
+    """
+    lines = [line for line in (output or "").splitlines() if line.strip()]
+    cues = [line for line in lines if any(p.search(_STREAM_PREFIX.sub("", line.strip())) for p in _FAILURE_CUES)]
+    selected = []
+    for line in (cues or lines[-5:]):
+        normalized = normalize_line(line)
+        if normalized and normalized not in selected:
+            selected.append(normalized)
+    selected = selected[-MAX_SIGNATURE_LINES:]
+    return hashlib.sha1("\n".join(selected).encode("utf-8")).hexdigest()
+
+
+def fix_key(fix):
+    return hashlib.sha1(json.dumps(fix, sort_keys=True).encode("utf-8")).hexdigest()
+
+
+class FixStore:
+    """
+    Persistent knowledge base of which fix healed which failure signature.
+
+    Each (signature, fix) pair carries success and failure evidence that
+    decays with a half-life, so fixes that stopped working fade out and
+    stale entries are pruned. Lookups go through the primary key and cost
+    the same however large the store grows.
+    """
+    def __init__(self, db_path=None, half_life=HALF_LIFE, min_success_rate=MIN_SUCCESS_RATE):
+        if db_path is None:
+            db_path = os.path.join(DEFAULT_CACHE_DIR, DEFAULT_FIX_STORE_FILE)
+        os.makedirs(os.path.dirname(os.path.abspath(db_path)), exist_ok=True)
+        self.db_path = db_path
+        self.half_life = half_life
+        self.min_success_rate = min_success_rate
+        self.hits = self.misses = 0
+
+        self.conn = sqlite3.connect(db_path, timeout=30, isolation_level=None)
+        self.conn.execute("PRAGMA journal_mode=WAL")
+        self.conn.execute("PRAGMA synchronous=NORMAL")
+        self.conn.executescript("""
+            CREATE TABLE IF NOT EXISTS fixes (
+                signature TEXT NOT NULL,
+                fix_key TEXT NOT NULL,
+                fix TEXT NOT NULL,
+                successes REAL NOT NULL,
+                failures REAL NOT NULL,
+                updated REAL NOT NULL,
+                PRIMARY KEY (signature, fix_key)
+            ) WITHOUT ROWID;
+            CREATE INDEX IF NOT EXISTS fixes_updated ON fixes(updated);
+        """)
+        self.prune()
+
+    def close(self):
+        self.conn.close()
+
+    def _decay(self, updated, now):
+        return math.pow(0.5, max(0.0, now - updated) / self.half_life)
+
+    def lookup(self, signature, exclude=()):
+        """
+        Returns the fix with the best decayed success rate for this
+        signature, or None if none is known to work. `exclude` holds fix
+        keys already tried.
+        """
+        now = time.time()
+        best, best_rate = None, self.min_success_rate
+        rows = self.conn.execute(
+            "SELECT fix_key, fix, successes, failures, updated FROM fixes WHERE signature = ?", (signature,))
+        for key, fix, successes, failures, updated in rows:
+            if key in exclude:
+                continue
+            decay = self._decay(updated, now)
+            successes, failures = successes * decay, failures * decay
+            if successes + failures < MIN_WEIGHT:
+                continue
+            rate = successes / (successes + failures)
+            if rate >= best_rate:
+                best, best_rate = json.loads(fix), rate
+        if best is None:
+            self.misses += 1
+            count("fix_store.misses")
+        else:
+            self.hits += 1
+            count("fix_store.hits")
+        return best
+
+    def record(self, signature, fix, success):
+        """
+        Adds one verification outcome of `fix` applied to `signature`.
+        """
+        now = time.time()
+        key = fix_key(fix)
+        try:
+            row = self.conn.execute(
+                "SELECT successes, failures, updated FROM fixes WHERE signature = ? AND fix_key = ?",
+                (signature, key)).fetchone()
+            successes = failures = 0.0
+            if row:
+                decay = self._decay(row[2], now)
+                successes, failures = row[0] * decay, row[1] * decay
+            if success:
+                successes += 1
+            else:
+                failures += 1
+            self.conn.execute(
+                "INSERT OR REPLACE INTO fixes (signature, fix_key, fix, successes, failures, updated) "
+                "VALUES (?, ?, ?, ?, ?, ?)",
+                (signature, key, json.dumps(fix, sort_keys=True), successes, failures, now))
+        except sqlite3.Error as e:
+            logging.error(f"Fix store update failed: {e}")
+
+    def prune(self):
+        """
+        Deletes entries untouched for as long as it takes one outcome to
+        decay below MIN_WEIGHT (about four half-lives). Uses the index on
+        `updated`, so it is cheap to run on every open.
+        """
+        cutoff = time.time() - self.half_life * math.log2(1 / MIN_WEIGHT)
+        return self.conn.execute("DELETE FROM fixes WHERE updated < ?", (cutoff,)).rowcount
+
+    def stats(self):
+        entries, signatures, successes, failures = self.conn.execute(
+            "SELECT COUNT(*), COUNT(DISTINCT signature), COALESCE(SUM(successes), 0), "
+            "COALESCE(SUM(failures), 0) FROM fixes").fetchone()
+        lookups = self.hits + self.misses
+        return {
+            "entries": entries,
+            "signatures": signatures,
+            "success_rate": round(successes / (successes + failures), 4) if successes + failures else 0.0,
+            "hits": self.hits,
+            "misses": self.misses,
+            "hit_rate": round(self.hits / lookups, 4) if lookups else 0.0
+        }
@@ -0,0 +1,337 @@
+import heapq
+import json
+import os
+import re
+from lib.generator import EXTRACT_FUNCTION, INSTALL_TIMEOUT, select_install
+from lib.profiling import profiled
+from lib.telemetry import TELEMETRY_FUNCTION, product_key
+
+DEFAULT_PARALLEL = 4
+DEFAULT_ENTRY_TIMEOUT = INSTALL_TIMEOUT
+# Windows Installer runs one installation at a time (the _MSIExecute mutex).
+# These frameworks go through it even when wrapped in an .exe.
+MSI_FRAMEWORKS = ("msi", "wix_burn", "installshield")
+
+PLAN_BEGIN = "$PlanJson = @'"
+PLAN_END = "'@"
+
+
+class PlanError(ValueError):
+    pass
+
+
+def _basename(path):
+    # Analyses may come from Windows while the plan is built elsewhere
+    return re.split(r"[\\/]", path)[-1]
+
+
+def _entry_id(path, taken):
+    base = re.sub(r"[^\w.-]", "_", os.path.splitext(_basename(path))[0]) or "app"
+    entry_id, n = base, 2
+    while entry_id.lower() in taken:
+        entry_id, n = f"{base}-{n}", n + 1
+    taken.add(entry_id.lower())
+    return entry_id
+
+
+def plan_entry(analysis, entry_id, timeout=DEFAULT_ENTRY_TIMEOUT, telemetry=None):
+    """
+    One installer's line in a fleet plan: what to run and on which lane.
+    With a TelemetryStore the timeout comes from earlier runs of the product.
+    """
+    path = analysis.get("path", "")
+    node, extract = select_install(analysis)
+    install_cmd = node.get("install_cmd", f'"{path}"')
+    if extract:
+        install_cmd = install_cmd.replace(node["path"], f"%TEMP%\\{extract['name']}")
+    framework = node.get("framework", {}).get("name", node.get("type", "unknown"))
+    uses_msi = node.get("type") == "msi" or framework in MSI_FRAMEWORKS or "msiexec" in install_cmd.lower()
+    product_name = node.get("properties", {}).get("ProductName") or analysis.get("properties", {}).get("ProductName")
+    product = product_key(product_name, path)
+    if telemetry is not None:
+        timeout = telemetry.suggest_timeout(product, "install", timeout)
+    return {
+        "id": entry_id,
+        "name": product_name or entry_id,
+        "product": product,
+        "path": path,
+        "install_cmd": install_cmd,
+        "extract": extract,
+        "framework": framework,
+        "confidence": node.get("install_cmd_confidence", 0.0),
+        "lane": "msi" if uses_msi else None,
+        "depends_on": [],
+        "timeout_s": timeout,
+    }
+
+
+@profiled("fleet.build_plan")
+def build_plan(analyses, dependencies=None, parallel=DEFAULT_PARALLEL, timeout=DEFAULT_ENTRY_TIMEOUT,
+               telemetry=None):
+    """
+    Turns many StaticAnalyzer results into a fleet plan. `dependencies` maps
+    an installer to the installers it needs first; either side may be given
+    by plan id, installer file name or product name. Raises PlanError for
+    unknown names and dependency cycles. Linear in entries + dependencies.
+    """
+    entries, taken, lookup = [], set(), {}
+    for analysis in analyses:
+        if not analysis or "error" in analysis:
+            continue
+        entry = plan_entry(analysis, _entry_id(analysis.get("path", ""), taken), timeout, telemetry)
+        entries.append(entry)
+        for key in (entry["id"], _basename(entry["path"]), entry["name"]):
+            lookup.setdefault(str(key).lower(), entry)
+
+    def resolve(name):
+        entry = lookup.get(str(name).lower())
+        if entry is None:
+            raise PlanError(f"Unknown installer in dependencies: '{name}'")
+        return entry
+
+    for name, needs in (dependencies or {}).items():
+        entry = resolve(name)
+        for need in ([needs] if isinstance(needs, str) else needs):
+            dependency = resolve(need)["id"]
+            if dependency == entry["id"]:
+                raise PlanError(f"'{name}' depends on itself")
+            if dependency not in entry["depends_on"]:
+                entry["depends_on"].append(dependency)
+
+    order = _topological_order(entries)
+    return {
+        "version": 1,
+        "parallel": parallel,
+        "entries": [entries[i] for i in order],
+    }
+
+
+def _topological_order(entries):
+    """
+    Kahn's algorithm; keeps the input order among independent entries so
+    plans are stable.
+    """
+    index = {entry["id"]: i for i, entry in enumerate(entries)}
+    waiting = [len(entry["depends_on"]) for entry in entries]
+    dependents = [[] for _ in entries]
+    for i, entry in enumerate(entries):
+        for dependency in entry["depends_on"]:
+            dependents[index[dependency]].append(i)
+
+    ready = [i for i, count in enumerate(waiting) if count == 0]
+    heapq.heapify(ready)
+    order = []
+    while ready:
+        i = heapq.heappop(ready)
+        order.append(i)
+        for j in dependents[i]:
+            waiting[j] -= 1
+            if waiting[j] == 0:
+                heapq.heappush(ready, j)
+    if len(order) != len(entries):
+        stuck = [entries[i]["id"] for i, count in enumerate(waiting) if count][:10]
+        raise PlanError(f"Dependency cycle among: {', '.join(stuck)}")
+    return order
+
+
+def load_analyses(jsonl_path):
+    """
+    Yields analyses from a batch results file (--batch --output), skipping
+    installers that failed. Lines holding a bare analysis are accepted too.
+    """
+    with open(jsonl_path, "r", encoding="utf-8") as f:
+        for line in f:
+            if not line.strip():
+                continue
+            record = json.loads(line)
+            if "installer" in record:
+                if record.get("status") == "ok":
+                    yield record["analysis"]
+            else:
+                yield record
+
+
+def parse_plan(script_content):
+    """
+    Reads the plan back out of a generated fleet script.
+    """
+    start = script_content.index(PLAN_BEGIN + "\n") + len(PLAN_BEGIN) + 1
+    end = script_content.index("\n" + PLAN_END, start)
+    return json.loads(script_content[start:end])
+
+
+def _plan_json(plan):
+    # One entry per line: no line can start with '@ and end the here-string
+    lines = [json.dumps(entry) for entry in plan["entries"]]
+    header = json.dumps({key: value for key, value in plan.items() if key != "entries"})[:-1]
+    return header + ', "entries": [\n' + ",\n".join(lines) + "\n]}"
+
+
+class FleetGenerator:
+    """
+    Emits one PowerShell script that installs many apps concurrently: at most
+    `parallel` at once, one at a time on the MSI lane, each only after its
+    dependencies succeeded. Results are aggregated per app.
+    """
+    def __init__(self, analyses, dependencies=None, parallel=DEFAULT_PARALLEL, timeout=DEFAULT_ENTRY_TIMEOUT,
+                 telemetry=None):
+        self.plan = build_plan(analyses, dependencies, parallel, timeout, telemetry)
+
+    @profiled("fleet.generate_script")
+    def generate_script(self):
+        count = len(self.plan["entries"])
+        msi_count = sum(1 for entry in self.plan["entries"] if entry["lane"] == "msi")
+        script_content = f'''<#
+.SYNOPSIS
+    Auto-generated fleet installation script for {count} apps ({msi_count} on the MSI lane)
+    Generated by AI Automation Script Generator
+    Platform: PowerShell (Native)
+#>
+param(
+    [int]$MaxParallel = {self.plan["parallel"]},
+    [string]$ResultsPath = "fleet_results.json"
+)
+
+{PLAN_BEGIN}
+{_plan_json(self.plan)}
+{PLAN_END}
+$Plan = $PlanJson | ConvertFrom-Json
+$MaxParallel = [Math]::Max(1, $MaxParallel)
+$TelemetryProduct = $null
+{TELEMETRY_FUNCTION}
+# Payload extraction runs in each install's own process, not in the scheduling loop
+$ExportPayloadSource = @'
+{EXTRACT_FUNCTION}
+'@
+
+function ConvertTo-Literal($text) {{
+    "'" + ($text -replace "'", "''") + "'"
+}}
+# Exit codes that mean success, and "another installation is in progress"
+$SuccessCodes = @(0, 1641, 3010)
+$MsiBusyCode = 1618
+$MaxBusyRetries = 5
+
+$Status = @{{}}
+$Results = @{{}}
+$Running = @{{}}
+$Retries = @{{}}
+$Pending = New-Object System.Collections.Generic.List[object]
+foreach ($entry in $Plan.entries) {{
+    $Status[$entry.id] = "pending"
+    $Retries[$entry.id] = 0
+    $Pending.Add($entry)
+}}
+$MsiBusy = $false
+
+function Complete-Entry($entry, $state, $code, $started, $message) {{
+    $Status[$entry.id] = $state
+    $finished = Get-Date
+    $Results[$entry.id] = [ordered]@{{
+        id = $entry.id; name = $entry.name; status = $state; exit_code = $code
+        started = if ($started) {{ $started.ToString("o") }} else {{ $null }}
+        finished = $finished.ToString("o")
+        duration_s = if ($started) {{ [Math]::Round(($finished - $started).TotalSeconds, 2) }} else {{ 0 }}
+        message = $message
+    }}
+    if ($started -and $state -ne "skipped") {{
+        Write-Telemetry "install" ($finished - $started).TotalMilliseconds ($state -eq "ok") $code $entry.product
+    }}
+    $color = if ($state -eq "ok") {{ "Green" }} elseif ($state -eq "skipped") {{ "Yellow" }} else {{ "Red" }}
+    Write-Host "[$state] $($entry.id) $message" -ForegroundColor $color
+}}
+
+function Start-Entry($entry) {{
+    try {{
+        if (-not (Test-Path $entry.path)) {{ throw "Installer not found at $($entry.path)" }}
+        if ($entry.extract) {{
+            # Carve the payload out, then install, as one child; its exit code is the installer's
+            $target = Join-Path $env:TEMP $entry.extract.name
+            $job = "`$ErrorActionPreference = 'Stop'`n$ExportPayloadSource`n" +
+                "Export-Payload $(ConvertTo-Literal $entry.path) $($entry.extract.offset) $($entry.extract.size) $(ConvertTo-Literal $target)`n" +
+                "`$p = Start-Process -FilePath 'cmd.exe' -ArgumentList $(ConvertTo-Literal "/c $($entry.install_cmd)") -PassThru -Wait -NoNewWindow`n" +
+                "exit `$p.ExitCode"
+            $encoded = [Convert]::ToBase64String([System.Text.Encoding]::Unicode.GetBytes($job))
+            $proc = Start-Process -FilePath "powershell.exe" -PassThru -NoNewWindow `
+                -ArgumentList "-NoProfile -NonInteractive -ExecutionPolicy Bypass -EncodedCommand $encoded"
+        }} else {{
+            $proc = Start-Process -FilePath "cmd.exe" -ArgumentList "/c $($entry.install_cmd)" -PassThru -NoNewWindow
+        }}
+        # Touching Handle keeps ExitCode readable once the process exits
+        $null = $proc.Handle
+        $Running[$entry.id] = @{{ Entry = $entry; Proc = $proc; Started = Get-Date }}
+        $Status[$entry.id] = "running"
+        Write-Host "[start] $($entry.id): $($entry.install_cmd)"
+        return $true
+    }} catch {{
+        Complete-Entry $entry "failed" $null (Get-Date) "$_"
+        return $false
+    }}
+}}
+
+while ($Pending.Count -gt 0 -or $Running.Count -gt 0) {{
+    # Reap finished and overdue installs
+    foreach ($id in @($Running.Keys)) {{
+        $run = $Running[$id]
+        $entry = $run.Entry
+        $elapsed = ((Get-Date) - $run.Started).TotalSeconds
+        if (-not $run.Proc.HasExited) {{
+            if ($elapsed -lt $entry.timeout_s) {{ continue }}
+            & taskkill.exe /T /F /PID $run.Proc.Id | Out-Null
+            $Running.Remove($id)
+            if ($entry.lane -eq "msi") {{ $MsiBusy = $false }}
+            Complete-Entry $entry "failed" $null $run.Started "Timed out after $($entry.timeout_s) s"
+            continue
+        }}
+        $Running.Remove($id)
+        if ($entry.lane -eq "msi") {{ $MsiBusy = $false }}
+        $code = $run.Proc.ExitCode
+        if ($code -eq $MsiBusyCode -and $Retries[$id] -lt $MaxBusyRetries) {{
+            # Another Windows Installer session held the mutex; queue it again
+            $Retries[$id]++
+            $Status[$id] = "pending"
+            $Pending.Add($entry)
+            Write-Host "[retry] ${{id}}: Windows Installer busy"
+        }} elseif ($SuccessCodes -contains $code) {{
+            Complete-Entry $entry "ok" $code $run.Started "exit code $code"
+        }} else {{
+            Complete-Entry $entry "failed" $code $run.Started "exit code $code"
+        }}
+    }}
+
+    # Start whatever is ready, in plan order
+    $blocked = New-Object System.Collections.Generic.List[object]
+    foreach ($entry in $Pending) {{
+        $deps = @($entry.depends_on | ForEach-Object {{ $Status[$_] }})
+        if ($deps | Where-Object {{ $_ -in @("failed", "skipped") }}) {{
+            Complete-Entry $entry "skipped" $null $null "a dependency did not install"
+            continue
+        }}
+        $ready = -not ($deps | Where-Object {{ $_ -ne "ok" }})
+        $laneFree = -not ($entry.lane -eq "msi" -and $MsiBusy)
+        if ($ready -and $laneFree -and $Running.Count -lt $MaxParallel) {{
+            if ((Start-Entry $entry) -and $entry.lane -eq "msi") {{ $MsiBusy = $true }}
+        }} else {{
+            $blocked.Add($entry)
+        }}
+    }}
+    $Pending = $blocked
+
+    if ($Running.Count -gt 0) {{ Start-Sleep -Milliseconds 500 }}
+}}
+
+$ordered = @($Plan.entries | ForEach-Object {{ [pscustomobject]$Results[$_.id] }})
+$ordered | ConvertTo-Json -Depth 3 | Set-Content -Path $ResultsPath -Encoding UTF8
+$ordered | Format-Table id, status, exit_code, duration_s -AutoSize | Out-String | Write-Host
+
+$failed = @($ordered | Where-Object {{ $_.status -ne "ok" }}).Count
+Write-Host "Fleet finished: $($ordered.Count - $failed) ok, $failed not installed. Results: $ResultsPath"
+if ($failed -eq 0) {{
+    Write-Host "PASS: All installations completed successfully." -ForegroundColor Green
+    exit 0
+}} else {{
+    Write-Host "FAIL: $failed installations did not complete." -ForegroundColor Red
+    exit 1
+}}
+'''
+        return script_content
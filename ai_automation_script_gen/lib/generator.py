@@ -1,14 +1,247 @@
 import os
+import re
+from lib.profiling import profiled
+from lib.telemetry import TELEMETRY_FUNCTION, product_key
+
+# An outer installer whose own silent switch is this reliable is trusted to
+# pass it on to whatever it wraps
+WRAPPER_TRUST = 0.9
+
+
+def select_install(analysis):
+    """
+    Picks the node of an analysis tree whose install command to run. Returns
+    (node, extract): extract is None for the outer installer, or the offset,
+    size and file name of an embedded installer that the script carves out of
+    the outer file before running it. Only payloads stored uncompressed at a
+    known offset can be carved.
+    """
+    root_confidence = analysis.get("install_cmd_confidence", 0.0)
+    if root_confidence >= WRAPPER_TRUST:
+        return analysis, None
+
+    best = (root_confidence, 0, analysis, None)
+
+    def walk(node, base, depth):
+        nonlocal best
+        for child in node.get("children", []):
+            inner = child.get("analysis")
+            if not inner or "error" in inner or child.get("compressed"):
+                continue
+            offset = base + child["offset"]
+            confidence = inner.get("install_cmd_confidence", 0.0)
+            # Prefer the shallowest of equally reliable commands
+            if inner.get("install_cmd") and confidence > best[0]:
+                label = child.get("member") or f"payload_{offset:x}"
+                name = re.sub(r"[^\w.-]", "_", os.path.basename(label))
+                extension = "." + inner.get("type", "bin")
+                if not name.lower().endswith(extension):
+                    name += extension
+                best = (confidence, depth, inner, {"offset": offset, "size": child["size"], "name": name})
+            walk(inner, offset, depth + 1)
+
+    walk(analysis, 0, 1)
+    return best[2], best[3]
+
+
+# Copies an embedded installer out of its wrapper in 1 MB blocks
+EXTRACT_FUNCTION = '''
+function Export-Payload($SourcePath, [long]$Offset, [long]$Size, $TargetPath) {
+    $source = [System.IO.File]::OpenRead($SourcePath)
+    $target = [System.IO.File]::Create($TargetPath)
+    try {
+        [void]$source.Seek($Offset, [System.IO.SeekOrigin]::Begin)
+        $buffer = New-Object byte[] 1048576
+        $remaining = $Size
+        while ($remaining -gt 0) {
+            $read = $source.Read($buffer, 0, [int][Math]::Min($buffer.Length, $remaining))
+            if ($read -le 0) { break }
+            $target.Write($buffer, 0, $read)
+            $remaining -= $read
+        }
+    } finally {
+        $target.Dispose()
+        $source.Dispose()
+    }
+}
+'''
+
+
+# Default waits in seconds, until telemetry has enough runs to size them
+INSTALL_TIMEOUT = 3600
+GUI_LAUNCH_TIMEOUT = 60
+GUI_STEP_TIMEOUT = 30
+# How long a click may take to change the page before the next step looks anyway
+GUI_PAGE_CHANGE_TIMEOUT = 5
+
+GUI_HEADER = """
+Add-Type -AssemblyName UIAutomationClient
+Add-Type -AssemblyName UIAutomationTypes
+
+$AE = [System.Windows.Automation.AutomationElement]
+$TreeScope = [System.Windows.Automation.TreeScope]
+$Walker = [System.Windows.Automation.TreeWalker]::ControlViewWalker
+$PollMinMs = 25
+$PollMaxMs = 500
+# Elements found on the current page, by control type and name; cleared when the page changes
+$ElementCache = @{}
+$LastPage = $null
+$ChangeTimeoutMs = 0
+
+# Polls $Probe with exponential backoff until it returns something, or throws after $TimeoutMs
+function Wait-Until([scriptblock]$Probe, [int]$TimeoutMs, [string]$What) {
+    $deadline = [DateTime]::UtcNow.AddMilliseconds($TimeoutMs)
+    $delay = $PollMinMs
+    while ($true) {
+        $result = & $Probe
+        if ($result) { return $result }
+        if ([DateTime]::UtcNow -ge $deadline) { throw "Timed out after $TimeoutMs ms waiting for $What" }
+        Start-Sleep -Milliseconds $delay
+        $delay = [Math]::Min($delay * 2, $PollMaxMs)
+    }
+}
+
+# Top-level windows of the installer process: lookups never walk the whole desktop
+# (written to the pipeline one by one, so @(Get-Dialogs) is an array of windows)
+function Get-Dialogs {
+    $cond = New-Object System.Windows.Automation.PropertyCondition($AE::ProcessIdProperty, $script:ProcessId)
+    $AE::RootElement.FindAll($TreeScope::Children, $cond)
+}
+
+# Cheap fingerprint of what the installer shows: names of each window's direct children
+function Get-PageSignature {
+    $names = @()
+    foreach ($dialog in @(Get-Dialogs)) {
+        try {
+            $names += $dialog.Current.Name
+            $child = $Walker.GetFirstChild($dialog)
+            while ($child) {
+                $names += $child.Current.Name
+                $child = $Walker.GetNextSibling($child)
+            }
+        } catch { }
+    }
+    return ($names -join "|")
+}
+
+function Find-Element([string]$Name, [string]$ControlType) {
+    # "Next" the button and "Next" the link text are different elements
+    $key = "$ControlType|$Name"
+    $cached = $ElementCache[$key]
+    if ($cached) {
+        try {
+            if ($cached.Current.IsEnabled -and -not $cached.Current.IsOffscreen) { return $cached }
+        } catch { }
+        $ElementCache.Remove($key)
+    }
+    $cond = New-Object System.Windows.Automation.PropertyCondition($AE::NameProperty, $Name)
+    foreach ($dialog in @(Get-Dialogs)) {
+        try {
+            foreach ($element in $dialog.FindAll($TreeScope::Descendants, $cond)) {
+                $current = $element.Current
+                if ($ControlType -and $current.ControlType.ProgrammaticName -ne $ControlType) { continue }
+                if ($current.IsEnabled -and -not $current.IsOffscreen) {
+                    $ElementCache[$key] = $element
+                    return $element
+                }
+            }
+        } catch { }
+    }
+    return $null
+}
+
+function Invoke-Element($element) {
+    $pattern = $null
+    if ($element.TryGetCurrentPattern([System.Windows.Automation.InvokePattern]::Pattern, [ref]$pattern)) {
+        $pattern.Invoke()
+    } elseif ($element.TryGetCurrentPattern([System.Windows.Automation.TogglePattern]::Pattern, [ref]$pattern)) {
+        $pattern.Toggle()
+    } elseif ($element.TryGetCurrentPattern([System.Windows.Automation.SelectionItemPattern]::Pattern, [ref]$pattern)) {
+        $pattern.Select()
+    } else {
+        throw "'$($element.Current.Name)' cannot be clicked"
+    }
+}
+
+function Invoke-Step([string]$Name, [string]$ControlType, [int]$TimeoutMs, [int]$ChangeTimeoutMs, [int]$SettleMs, [switch]$ExpectChange) {
+    # Recorded as this step's duration: how long the installer took to get here
+    $timer = [System.Diagnostics.Stopwatch]::StartNew()
+    if ($script:LastPage -ne $null) {
+        # The previous click moves to another page; don't act on the old one
+        try {
+            $null = Wait-Until { if ((Get-PageSignature) -ne $script:LastPage) { $true } } $script:ChangeTimeoutMs "the next page"
+        } catch { }
+        $ElementCache.Clear()
+        $script:LastPage = $null
+    }
+    try {
+        $element = Wait-Until { Find-Element $Name $ControlType } $TimeoutMs "'$Name'"
+    } catch {
+        Write-Telemetry "step:$Name" $timer.Elapsed.TotalMilliseconds $false
+        throw
+    }
+    Write-Telemetry "step:$Name" $timer.Elapsed.TotalMilliseconds $true
+    if ($SettleMs -gt 0) { Start-Sleep -Milliseconds $SettleMs }
+    if ($ExpectChange) {
+        $script:LastPage = Get-PageSignature
+        $script:ChangeTimeoutMs = $ChangeTimeoutMs
+    }
+    Invoke-Element $element
+    Write-Host "Clicked $Name"
+}
+"""
+
+
+def _ps_quote(text):
+    # Single-quoted PowerShell strings only escape the quote itself
+    return str(text).replace("'", "''")
+
 
 class ScriptGenerator:
-    def __init__(self, analysis_result):
+    def __init__(self, analysis_result, telemetry=None):
         self.analysis = analysis_result
-    
+        # TelemetryStore of earlier runs; sizes timeouts once it has enough samples
+        self.telemetry = telemetry
+
+    def product(self):
+        node, _ = select_install(self.analysis)
+        name = node.get("properties", {}).get("ProductName") or \
+            self.analysis.get("properties", {}).get("ProductName")
+        return product_key(name, self.analysis.get("path", ""))
+
+    def timeout(self, phase, default):
+        """
+        Seconds to allow a phase: from observed durations if there are enough
+        of them, else `default`.
+        """
+        if self.telemetry is None:
+            return default
+        return self.telemetry.suggest_timeout(self.product(), phase, default)
+
+    @profiled("generate_script")
     def generate_script(self):
         # Default to raw path if no command introspection worked
         path = self.analysis.get("path", "")
-        install_cmd = self.analysis.get("install_cmd", f'"{path}"')
-        product_name = self.analysis.get("properties", {}).get("ProductName", "Unknown App")
+        node, extract = select_install(self.analysis)
+        install_cmd = node.get("install_cmd", f'"{path}"')
+        product_name = node.get("properties", {}).get("ProductName") or \
+            self.analysis.get("properties", {}).get("ProductName", "Unknown App")
+        framework = node.get("framework", {}).get("name", node.get("type", "unknown"))
+        confidence = node.get("install_cmd_confidence", 0.0)
+        install_timeout = self.timeout("install", INSTALL_TIMEOUT)
+
+        extract_block = ""
+        if extract:
+            # cmd.exe expands %TEMP% when the command runs
+            install_cmd = install_cmd.replace(node["path"], f"%TEMP%\\{extract['name']}")
+            framework = f"{framework} (embedded at offset {extract['offset']})"
+            extract_block = EXTRACT_FUNCTION + f'''
+$PayloadPath = Join-Path $env:TEMP "{extract['name']}"
+Write-Host "Extracting embedded installer to $PayloadPath"
+$timer = [System.Diagnostics.Stopwatch]::StartNew()
+Export-Payload $InstallerPath {extract['offset']} {extract['size']} $PayloadPath
+Write-Telemetry "extract" $timer.Elapsed.TotalMilliseconds $true
+'''
         
         # PowerShell Script Template
         script_content = f'''<#
@@ -16,27 +249,38 @@ class ScriptGenerator:
     Auto-generated installation script for {product_name}
     Generated by AI Automation Script Generator
     Platform: PowerShell (Native)
+    Installer Framework: {framework} (confidence {confidence})
 #>
 
 $InstallerPath = "{path}"
 $InstallCmd = '{install_cmd}'
-
+$InstallTimeout = {install_timeout}
+$TelemetryProduct = '{_ps_quote(self.product())}'
+{TELEMETRY_FUNCTION}
 Write-Host "Checking installer existence at: $InstallerPath"
 if (-not (Test-Path $InstallerPath)) {{
     Write-Error "CRITICAL: Installer not found at $InstallerPath"
     exit 1
 }}
-
+{extract_block}
 Write-Host "Starting silent installation command: $InstallCmd"
 
 try {{
-    $time = Measure-Command {{
-        # Run process and wait
-        $proc = Start-Process -FilePath "cmd.exe" -ArgumentList "/c $InstallCmd" -PassThru -Wait -NoNewWindow
+    $timer = [System.Diagnostics.Stopwatch]::StartNew()
+    $proc = Start-Process -FilePath "cmd.exe" -ArgumentList "/c $InstallCmd" -PassThru -NoNewWindow
+    # Touching Handle keeps ExitCode readable once the process exits
+    $null = $proc.Handle
+    if (-not $proc.WaitForExit($InstallTimeout * 1000)) {{
+        & taskkill.exe /T /F /PID $proc.Id | Out-Null
+        Write-Telemetry "install" $timer.Elapsed.TotalMilliseconds $false
+        Write-Host "FAIL: Installation did not finish within $InstallTimeout seconds." -ForegroundColor Red
+        exit 1
     }}
+    $time = $timer.Elapsed
     
     Write-Host "Command executed in $($time.TotalSeconds) seconds."
     Write-Host "Return Code: $($proc.ExitCode)"
+    Write-Telemetry "install" $time.TotalMilliseconds ($proc.ExitCode -eq 0) $proc.ExitCode
     
     if ($proc.ExitCode -eq 0) {{
         Write-Host "PASS: Installation process completed successfully." -ForegroundColor Green
@@ -52,47 +296,70 @@ try {{
 '''
         return script_content
 
-    def generate_gui_script(self, events):
+    @profiled("generate_gui_script")
+    def generate_gui_script(self, events, timing=None):
         """
         Generates a PowerShell script using UIAutomation.
+
+        Each step waits for its target instead of sleeping: it polls the
+        installer's own windows with exponential backoff until the element is
+        enabled, up to a per-step timeout. After a button click the next step
+        first waits (up to change_timeout) for the page to change. Elements
+        are looked up in the installer's own windows and cached until the
+        page changes. `timing` holds per-step hints
+        keyed by step index (0-based, clicks only) or button title, e.g.
+        {"Install": {"timeout": 600}}; an event may also carry its own
+        "timing" dict. Hint keys: timeout (s), expect_change (bool),
+        change_timeout (s, how long this click may take to change the page),
+        settle_ms. Without a hint, timeouts come from telemetry.
         """
         path = self.analysis.get("path", "")
-        
-        header = """
-Add-Type -AssemblyName UIAutomationClient
-Add-Type -AssemblyName UIAutomationTypes
+        timing = timing or {}
+        launch_timeout = self.timeout("launch", GUI_LAUNCH_TIMEOUT)
 
-function Find-Click($name) {
-    param($root)
-    $cond = New-Object System.Windows.Automation.PropertyCondition([System.Windows.Automation.AutomationElement]::NameProperty, $name)
-    $element = $root.FindFirst([System.Windows.Automation.TreeScope]::Descendants, $cond)
-    if ($element) {
-        $invoke = $element.GetCurrentPattern([System.Windows.Automation.InvokePattern]::Pattern)
-        $invoke.Invoke()
-        Write-Host "Clicked $name"
-    }
-}
-"""
         steps_code = []
-        for event in events:
-            if 'action' in event and event['action'] == 'click':
-                title = event['selector']['title']
-                steps_code.append(f'Find-Click -name "{title}" -root $root')
-                steps_code.append('Start-Sleep -Seconds 2')
+        clicks = [e for e in events if e and e.get('action') == 'click']
+        for index, event in enumerate(clicks):
+            title = event['selector']['title']
+            control_type = event['selector'].get('control_type') or ""
+            hints = {
+                "timeout": self.timeout(f"step:{title}", GUI_STEP_TIMEOUT),
+                # Toggling a box leaves the page as it is
+                "expect_change": not any(t in control_type for t in ("CheckBox", "RadioButton")),
+                "change_timeout": GUI_PAGE_CHANGE_TIMEOUT,
+                "settle_ms": 0,
+            }
+            hints.update(timing.get(title, {}))
+            hints.update(timing.get(index, {}))
+            hints.update(event.get("timing", {}))
+            steps_code.append(
+                f"Invoke-Step -Name '{_ps_quote(title)}' -ControlType '{_ps_quote(control_type)}' "
+                f"-TimeoutMs {int(hints['timeout'] * 1000)} -ChangeTimeoutMs {int(hints['change_timeout'] * 1000)} "
+                f"-SettleMs {int(hints['settle_ms'])}" + (" -ExpectChange" if hints["expect_change"] else "")
+            )
 
-        steps_joined = "\n".join(steps_code)
+        steps_joined = "\n    ".join(steps_code)
 
-        script_content = f'''{header}
+        script_content = f'''{GUI_HEADER}
 
 $InstallerPath = "{path}"
+$TelemetryProduct = '{_ps_quote(self.product())}'
+{TELEMETRY_FUNCTION}
 Write-Host "Launching GUI installer: $InstallerPath"
 
+$timer = [System.Diagnostics.Stopwatch]::StartNew()
 $proc = Start-Process -FilePath $InstallerPath -PassThru
-Start-Sleep -Seconds 3
+$script:ProcessId = $proc.Id
 
 try {{
-    $root = [System.Windows.Automation.AutomationElement]::FromHandle($proc.MainWindowHandle)
-    if (-not $root) {{ throw "Could not attach to window" }}
+    # Ready as soon as the installer shows a window
+    try {{
+        $null = Wait-Until {{ Get-Dialogs }} {int(launch_timeout * 1000)} "the installer window"
+    }} catch {{
+        Write-Telemetry "launch" $timer.Elapsed.TotalMilliseconds $false
+        throw
+    }}
+    Write-Telemetry "launch" $timer.Elapsed.TotalMilliseconds $true
 
     {steps_joined}
     
@@ -2,51 +2,128 @@ import logging
 import subprocess
 import json
 import os
+import time
+from lib.profiling import count, span
+from lib.ps_session import SessionError, default_pool
+from lib.ui_tree import UITree, StaleSnapshotError
 
 class GuiAutomator:
-    def __init__(self, exe_path):
+    """
+    Inspects and drives one installer's UI through a pooled worker session:
+
+        with GuiAutomator(path) as automator:
+            elements = automator.get_ui_hierarchy()
+    """
+    def __init__(self, exe_path, pool=None):
         self.exe_path = exe_path
         self.ps_script = os.path.join(os.path.dirname(__file__), "ui_inspector.ps1")
+        # Inspections go through a long-lived worker session from this pool
+        self.pool = pool or default_pool()
+        self.session = None
+        self.pid = None
+        # Kept current from snapshot deltas; indexed for lookups
+        self.tree = UITree()
+
+    def launch(self, **options):
+        """
+        Starts the installer inside a worker session, which then stays bound
+        to this automator until close().
+        """
+        if self.session is None:
+            with span("gui.acquire_session"):
+                self.session = self.pool.acquire()
+        with span("gui.launch", path=os.path.basename(self.exe_path)):
+            result = self.session.request("launch", path=self.exe_path, **options)
+        self.pid = result["pid"]
+        self.tree.clear()
+        return result
 
-    def launch(self):
-        # We don't maintain a persistent python object anymore
-        # The logic is handled per-inspection in the PS script for this hybrid MVP
-        pass
+    def refresh(self):
+        """
+        Brings self.tree up to date. After the first snapshot the worker only
+        sends the nodes that were added, removed or changed.
+        """
+        if self.pid is None:
+            self.launch()
+        with span("gui.snapshot") as s:
+            snapshot = self.session.request("snapshot", pid=self.pid, since=self.tree.version)
+            s.set(full=snapshot.get("full"))
+        try:
+            self.tree.apply(snapshot)
+        except StaleSnapshotError:
+            # The worker restarted or lost track; start over from a full tree
+            self.tree.clear()
+            self.tree.apply(self.session.request("snapshot", pid=self.pid, since=None))
+        return self.tree
 
     def get_ui_hierarchy(self):
+        """
+        Returns the UI tree of the installer window as a list of
+        {id, parent, pos, title, control_type, enabled} dicts in on-screen order.
+        """
+        try:
+            return self.refresh().elements()
+        except SessionError as e:
+            logging.error(f"UI worker session failed, falling back to one-shot inspection: {e}")
+            return self._one_shot_hierarchy()
+
+    def _one_shot_hierarchy(self):
         """
         Calls the PowerShell script to get the UI tree.
         """
         cmd = ["powershell", "-ExecutionPolicy", "Bypass", "-File", self.ps_script, "-ProcessPath", self.exe_path]
-        
-        print(f"DEBUG: Running PowerShell introspection...")
-        
+
+        logging.debug("Running one-shot PowerShell introspection")
+
+        started = time.perf_counter()
         try:
             # Run PowerShell
-            result = subprocess.run(cmd, capture_output=True, text=True, timeout=15)
-            
-            # Parse output. The PS script prints JSON lines. 
-            # We need to clean up the output to make it valid JSON list
-            output_lines = result.stdout.strip().split('\n')
-            
-            # Simple parser for the MVP output format
-            hierarchy = []
-            for line in output_lines:
+            with span("gui.one_shot_inspection"):
+                result = subprocess.run(cmd, capture_output=True, text=True, timeout=15)
+            count("subprocess.wall_s", time.perf_counter() - started)
+
+            # The script prints one full snapshot as a JSON line
+            for line in result.stdout.splitlines():
                 line = line.strip()
                 if line.startswith("{"):
-                    try:
-                        data = json.loads(line)
-                        hierarchy.append(data)
-                    except json.JSONDecodeError:
-                        pass
-            
-            return hierarchy
+                    return UITree().apply(json.loads(line)).elements()
+            return []
 
         except Exception as e:
             logging.error(f"Error reading UI hierarchy: {e}")
             return []
 
     def perform_action(self, action_type, selector):
-        # In a generic PS implementation, current MVP doesn't support interactive driving from Python
-        # It generates the full PS script at once.
-        pass
+        """
+        Drives the running installer, e.g. ("click", {"title": "Next"}).
+        Returns True if the worker performed the action.
+        """
+        if action_type != "click" or self.pid is None:
+            return False
+        # The control type tells a "Next" button from a "Next" link
+        fields = {"control_type": selector["control_type"]} if selector.get("control_type") else {}
+        try:
+            with span("gui.click", title=selector["title"]):
+                self.session.request("click", pid=self.pid, title=selector["title"], **fields)
+            return True
+        except SessionError as e:
+            logging.error(f"Action {action_type} on '{selector.get('title')}' failed: {e}")
+            return False
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
+        return False
+
+    def close(self):
+        """
+        Returns the worker session to the pool. Use the automator as a context
+        manager (or close it in a finally) so the session is never leaked.
+        """
+        if self.session is not None:
+            self.pool.release(self.session)
+            self.session = None
+            self.pid = None
+            self.tree.clear()
@@ -1,22 +1,44 @@
 import logging
 import os
 import sys
-from lib.verifier import verify_script
+from concurrent.futures import ThreadPoolExecutor, FIRST_COMPLETED, wait
+from lib.fix_store import failure_signature, fix_key
+from lib.profiling import count, profiled, span
+from lib.verifier import Verification, verify_script
+
+# Candidate fixes tried side by side per attempt in speculative mode
+DEFAULT_CANDIDATES = 3
 
 class SelfHealer:
-    def __init__(self, llm_client):
+    def __init__(self, llm_client, speculative=False, max_parallel=None, fix_store=None):
         self.llm = llm_client
         self.max_retries = 3
+        # Failures seen before (by signature) get their known fix without analysis
+        self.fix_store = fix_store
+        # Speculative mode verifies several ranked fixes at once and keeps the
+        # first that passes, instead of trying one fix per attempt
+        self.speculative = speculative
+        self.max_parallel = max_parallel or min(DEFAULT_CANDIDATES, os.cpu_count() or 1)
 
+    @profiled("heal")
     def attempt_heal(self, script_path):
         """
         Tries to run the script. If it fails, attempts to fix it and re-run.
         """
+        if self.speculative:
+            return self._attempt_heal_speculative(script_path)
+
         current_script_path = script_path
+        # (signature, fix) the current script was patched with, and fixes used so far
+        applied = None
+        tried = set()
         
         for attempt in range(1, self.max_retries + 1):
             print(f"\n--- Execution Attempt {attempt}/{self.max_retries} ---")
+            count("heal.attempts")
             success, output = verify_script(current_script_path)
+            if applied:
+                self._record(*applied, success)
             
             if success:
                 print("SUCCESS: Script executed successfully.")
@@ -29,7 +51,9 @@ class SelfHealer:
             with open(current_script_path, 'r') as f:
                 content = f.read()
             
-            fix = self.llm.analyze_error(output, content)
+            signature = failure_signature(output) if self.fix_store else None
+            with span("heal.analyze_error"):
+                fix = self._known_fix(signature, tried) or self.llm.analyze_error(output, content)
             
             if not fix:
                 print("AI could not determine a fix. Aborting.")
@@ -45,5 +69,122 @@ class SelfHealer:
                 
             print(f"Created patched script: {new_path}")
             current_script_path = new_path
+            applied = (signature, fix)
+            tried.add(fix_key(fix))
             
         return False, current_script_path
+
+    def _attempt_heal_speculative(self, script_path):
+        """
+        Each attempt patches the failing script with every ranked candidate fix
+        and verifies the variants concurrently. The first variant to pass wins;
+        the others are killed and deleted. If none passes, the top-ranked
+        variant and its output carry into the next attempt.
+        """
+        current_script_path = script_path
+        print(f"\n--- Execution Attempt 1/{self.max_retries} ---")
+        success, output = verify_script(current_script_path)
+        if success:
+            print("SUCCESS: Script executed successfully.")
+            return True, current_script_path
+
+        tried = set()
+        for attempt in range(1, self.max_retries + 1):
+            print(f"FAILURE: Script failed with error.")
+            with open(current_script_path, 'r') as f:
+                content = f.read()
+
+            signature = failure_signature(output) if self.fix_store else None
+            with span("heal.analyze_error"):
+                known = self._known_fix(signature, tried)
+                fixes = [known] if known else self.llm.analyze_errors(output, content, limit=DEFAULT_CANDIDATES)
+            variants = self._write_variants(current_script_path, content, fixes, attempt)
+            if not variants:
+                print("AI could not determine a fix. Aborting.")
+                return False, current_script_path
+            tried.update(fix_key(fix) for fix in variants.values())
+
+            print(f"\n--- Speculative Attempt {attempt}/{self.max_retries}: {len(variants)} variants ---")
+            count("heal.attempts")
+            paths = list(variants)
+            with span("heal.race", variants=len(paths)):
+                winner, results = self._race(paths)
+            # Cancelled variants prove nothing either way
+            for path in results:
+                self._record(signature, variants[path], path == winner)
+            if winner is not None:
+                self._discard(path for path in paths if path != winner)
+                print(f"SUCCESS: Patched script {winner} executed successfully.")
+                return True, winner
+
+            # Carry on from the best-ranked variant; its failure is already known
+            current_script_path = paths[0]
+            output = results.get(current_script_path, "")
+            self._discard(paths[1:])
+
+        return False, current_script_path
+
+    def _write_variants(self, script_path, content, fixes, attempt):
+        """
+        Writes one patched script per fix, most likely first. Fixes that
+        don't change the script, or duplicate another, are skipped.
+        Returns {path: fix} in rank order.
+        """
+        variants = {}
+        seen = {content}
+        for rank, fix in enumerate(fixes or [], 1):
+            new_content = self.llm.apply_fix(content, fix)
+            if new_content in seen and fix.get("type") != "retry":
+                continue
+            seen.add(new_content)
+            new_path = script_path.replace(".py", f"_v{attempt}_{rank}.py")
+            with open(new_path, 'w') as f:
+                f.write(new_content)
+            print(f"Created patched script: {new_path}")
+            variants[new_path] = fix
+        return variants
+
+    def _known_fix(self, signature, tried):
+        if self.fix_store is None:
+            return None
+        fix = self.fix_store.lookup(signature, exclude=tried)
+        if fix:
+            print(f"[Fix Store] Known failure, applying stored fix: {fix.get('reason')}")
+        return fix
+
+    def _record(self, signature, fix, success):
+        if self.fix_store is not None:
+            self.fix_store.record(signature, fix, success)
+
+    def _race(self, variants):
+        """
+        Verifies variants with at most max_parallel running at a time.
+        Returns (first passing path or None, {path: output} of finished runs).
+        """
+        runs = {path: Verification(path) for path in variants}
+        results = {}
+        winner = None
+        with ThreadPoolExecutor(max_workers=self.max_parallel) as executor:
+            pending = {executor.submit(run.run): path for path, run in runs.items()}
+            while pending and winner is None:
+                done, _ = wait(pending, return_when=FIRST_COMPLETED)
+                for future in done:
+                    path = pending.pop(future)
+                    success, output = future.result()
+                    results[path] = output
+                    if success and winner is None:
+                        winner = path
+            if winner is not None:
+                # Queued runs never start; running ones are killed
+                for future in pending:
+                    future.cancel()
+                for path in pending.values():
+                    runs[path].cancel()
+        return winner, results
+
+    def _discard(self, paths):
+        for path in paths:
+            try:
+                os.remove(path)
+            except OSError as e:
+                logging.error(f"Failed to remove variant {path}: {e}")
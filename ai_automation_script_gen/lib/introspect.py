@@ -1,28 +1,762 @@
+import io
 import os
+import importlib
 import logging
+import mmap
+import math
 import re
-try:
-    import msilib
-except ImportError:
-    msilib = None
-    # Can't log yet if logging isn't configured, but usually it works if imported.
-    # Actually, let's just use print or ignore since we are at top level.
-    pass
+import struct
+import time
+from collections import Counter
+from contextlib import contextmanager
+from lib.profiling import count, span
+
+# Optional modules are imported on first use so CLI startup stays light:
+# numpy (vectorized entropy histograms) and msilib (Windows-only, removed in
+# Python 3.13; the native reader covers it).
+_optional_modules = {}
+
+
+def _optional_import(name):
+    if name not in _optional_modules:
+        try:
+            _optional_modules[name] = importlib.import_module(name)
+        except ImportError:
+            _optional_modules[name] = None
+    return _optional_modules[name]
+
+# Bump whenever analysis output changes so cached results are not reused
+ANALYZER_VERSION = "6"
+
+# The scan window bounds how much of a mapped installer is resident at once.
+# Matches that straddle two windows are still found.
+DEFAULT_SCAN_WINDOW = 64 * 1024 * 1024
+# Offsets reported per pattern; counting stops there so memory stays flat.
+DEFAULT_MAX_HITS = 16
+
+# Entropy pre-pass. Compressed payload (LZMA, zlib, CAB) sits near 8 bits/byte;
+# headers, resources and script tables are well below the threshold.
+ENTROPY_BLOCK_SIZE = 4096
+ENTROPY_SKIP_THRESHOLD = 7.2
+# Below this size the whole file is scanned; the pre-pass would not pay off
+ENTROPY_MIN_FILE_SIZE = 4 * 1024 * 1024
+# Blocks histogrammed per NumPy batch, bounding the temporary arrays
+ENTROPY_BATCH_BLOCKS = 1024
+# Every n-th byte of a block is histogrammed (NumPy / pure-Python fallback)
+ENTROPY_SAMPLE_STRIDE = 4
+ENTROPY_FALLBACK_STRIDE = 16
+
+
+class PatternScanner:
+    """
+    Finds every ASCII and UTF-16LE occurrence of a set of patterns in a single
+    pass over a buffer or a memory-mapped file.
+
+    All encoded needles are compiled into one longest-first alternation, so the
+    regex engine walks the bytes once instead of once per flag and encoding.
+    """
+    def __init__(self, patterns, encodings=("ascii", "utf-16le"),
+                 window=DEFAULT_SCAN_WINDOW, max_hits=DEFAULT_MAX_HITS):
+        self.patterns = list(patterns)
+        self.encodings = tuple(encodings)
+        self.max_hits = max_hits
+        granularity = mmap.ALLOCATIONGRANULARITY
+        self.window = max(granularity, (window // granularity) * granularity)
+
+        # Encoded needle -> [(pattern, encoding)] it reports
+        self._needles = {}
+        for pattern in self.patterns:
+            for encoding in self.encodings:
+                self._needles.setdefault(pattern.encode(encoding), []).append((pattern, encoding))
+
+        # The alternation only reports the longest needle at an offset, so
+        # needles that are prefixes of it (e.g. "/q" in "/quiet") ride along.
+        self._shadowed = {
+            needle: [other for other in self._needles if other != needle and needle.startswith(other)]
+            for needle in self._needles
+        }
+        ordered = sorted(self._needles, key=len, reverse=True)
+        self._regex = re.compile(b"|".join(re.escape(n) for n in ordered)) if ordered else None
+        self._overlap = max((len(n) for n in ordered), default=1) - 1
+
+    def scan_file(self, path, start=0, end=None):
+        """
+        Memory-maps `path` read-only and scans [start, end).
+        Returns {pattern: [(offset, encoding), ...]} for patterns that were found.
+        """
+        with open(path, 'rb') as f:
+            if os.fstat(f.fileno()).st_size == 0:
+                return {}
+            with mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ) as mm:
+                if hasattr(mmap, "MADV_SEQUENTIAL"):
+                    mm.madvise(mmap.MADV_SEQUENTIAL)
+                return self.scan(mm, start, end)
+
+    def scan(self, buf, start=0, end=None):
+        """
+        Scans any bytes-like object (bytes, mmap, memoryview) window by window.
+        """
+        return self.scan_regions(buf, [(start, len(buf) if end is None else end)])
+
+    def scan_regions(self, buf, regions):
+        """
+        Scans only the given [start, end) byte ranges of `buf`.
+        """
+        hits = {}
+        if self._regex is None:
+            return hits
+        for start, end in regions:
+            end = min(end, len(buf))
+            pos = max(start, 0)
+            while pos < end:
+                window_end = min(pos + self.window, end)
+                self._scan_window(buf, pos, window_end, end, hits)
+                _release_pages(buf, pos, window_end)
+                pos = window_end
+        return hits
+
+    def _scan_window(self, buf, start, stop, end, hits):
+        # Matches must start inside [start, stop) but may run past stop
+        limit = min(stop + self._overlap, end)
+        search = self._regex.search
+        pos = start
+        while True:
+            match = search(buf, pos, limit)
+            if match is None or match.start() >= stop:
+                return
+            needle = match.group()
+            for n in (needle, *self._shadowed[needle]):
+                for pattern, encoding in self._needles[n]:
+                    offsets = hits.setdefault(pattern, [])
+                    if len(offsets) < self.max_hits:
+                        offsets.append((match.start(), encoding))
+            # Resume one byte later so overlapping needles are not skipped
+            pos = match.start() + 1
+
+
+def _release_pages(buf, start, stop):
+    """
+    Drops already-scanned pages of a mapping so resident memory stays flat.
+    """
+    if not isinstance(buf, mmap.mmap) or not hasattr(mmap, "MADV_DONTNEED"):
+        return
+    aligned = start - (start % mmap.PAGESIZE)
+    try:
+        buf.madvise(mmap.MADV_DONTNEED, aligned, stop - aligned)
+    except (OSError, ValueError):
+        pass
+
+
+def block_entropies(buf, block_size=ENTROPY_BLOCK_SIZE, start=0, end=None):
+    """
+    Returns the Shannon entropy (bits/byte) of each block of `buf[start:end]`,
+    estimated from every n-th byte with the Miller-Madow bias correction so
+    sparse samples of random data still land near 8 bits/byte.
+    Uses NumPy batched histograms when available, a pure-Python loop otherwise.
+    Sampled pages of an mmap are released batch by batch.
+    """
+    size = len(buf) if end is None else end
+    batch = block_size * ENTROPY_BATCH_BLOCKS
+    entropies = []
+    numpy = _optional_import("numpy")
+    if numpy is not None:
+        for pos in range(start, size, batch):
+            length = min(batch, size - pos)
+            data = numpy.frombuffer(buf, dtype=numpy.uint8, count=length, offset=pos)
+            full = length // block_size
+            rows = [data[:full * block_size].reshape(full, block_size)] if full else []
+            if length % block_size:
+                rows.append(data[full * block_size:].reshape(1, -1))
+            for blocks in rows:
+                samples = blocks[:, ::ENTROPY_SAMPLE_STRIDE]
+                n, width = samples.shape
+                # One bincount per batch: each block gets its own 256-bin range
+                keys = samples.astype(numpy.intp)
+                keys += (numpy.arange(n, dtype=numpy.intp) * 256)[:, None]
+                counts = numpy.bincount(keys.ravel(), minlength=n * 256).reshape(n, 256)
+                p = counts / float(width)
+                with numpy.errstate(divide="ignore", invalid="ignore"):
+                    h = -numpy.where(p > 0, p * numpy.log2(p), 0.0).sum(axis=1)
+                h += ((counts > 0).sum(axis=1) - 1) / (2.0 * width * math.log(2))
+                entropies.extend(h.tolist())
+            _release_pages(buf, pos, pos + length)
+        return entropies
+
+    plogp = [0.0] + [c * math.log2(c) for c in range(1, block_size + 1)]
+    with memoryview(buf) as view:
+        for pos in range(start, size, block_size):
+            sample = view[pos:min(pos + block_size, size):ENTROPY_FALLBACK_STRIDE].tobytes()
+            n = len(sample)
+            counts = Counter(sample)
+            h = math.log2(n) - sum(map(plogp.__getitem__, counts.values())) / n
+            entropies.append(h + (len(counts) - 1) / (2 * n * math.log(2)))
+            if (pos - start + block_size) % batch == 0:
+                _release_pages(buf, pos + block_size - batch, pos + block_size)
+    return entropies
+
+
+def low_entropy_regions(buf, threshold=ENTROPY_SKIP_THRESHOLD, block_size=ENTROPY_BLOCK_SIZE, margin=0,
+                        start=0, end=None):
+    """
+    Merges consecutive blocks below `threshold` into [start, end) ranges,
+    optionally only within buf[start:end]. Offsets are relative to `buf`.
+    `margin` extends each range so strings straddling into a skipped block are kept.
+    """
+    base = start
+    size = len(buf) if end is None else end
+    regions = []
+    for index, h in enumerate(block_entropies(buf, block_size, start, size)):
+        if h >= threshold:
+            continue
+        start = base + index * block_size
+        stop = min(start + block_size + margin, size)
+        if regions and regions[-1][1] >= start:
+            regions[-1][1] = stop
+        else:
+            regions.append([max(base, start - margin), stop])
+    return [tuple(r) for r in regions]
+
+
+# Silent switches per installer framework
+INSTALLER_FRAMEWORKS = {
+    "nsis": ["/S"],
+    "inno": ["/VERYSILENT", "/SUPPRESSMSGBOXES", "/NORESTART"],
+    "installshield": ["/s", '/v"/qn"'],
+    "wix_burn": ["/quiet", "/norestart"],
+    "squirrel": ["--silent"],
+    "7z_sfx": ["-y"],
+}
+
+# Section names emitted by installer stubs
+FRAMEWORK_SECTIONS = {
+    b".ndata": ("nsis", 0.95),
+    b".wixburn": ("wix_burn", 0.98),
+}
+
+# Signatures found at (or just after) the start of the overlay
+FRAMEWORK_OVERLAY_SIGNATURES = [
+    (b"\xef\xbe\xad\xdeNullsoftInst", "nsis", 0.99),
+    (b"Inno Setup Setup Data", "inno", 0.95),
+    (b"zlb\x1a", "inno", 0.85),
+    (b"InstallShield", "installshield", 0.9),
+    (b"ISSetupStream", "installshield", 0.9),
+]
+
+# Substrings in version resource strings
+FRAMEWORK_VERSION_HINTS = [
+    ("Inno Setup", "inno", 0.85),
+    ("Nullsoft", "nsis", 0.8),
+    ("InstallShield", "installshield", 0.8),
+    ("WiX Toolset", "wix_burn", 0.7),
+    ("Squirrel", "squirrel", 0.7),
+]
+
+PE_HEADER_SIZE = 4096
+OVERLAY_PROBE_SIZE = 4096
+RT_VERSION = 16
+VERSION_STRINGS = ("ProductName", "ProductVersion", "CompanyName", "FileDescription", "FileVersion", "Comments")
+
+
+class PEInfo:
+    """
+    The parts of a PE image that identify an installer: sections, overlay
+    location and version resource. Built by parse_pe().
+    """
+    def __init__(self, machine, is_64bit, sections, overlay_offset, overlay_size):
+        self.machine = machine
+        self.is_64bit = is_64bit
+        self.sections = sections
+        self.overlay_offset = overlay_offset
+        self.overlay_size = overlay_size
+        self.resource_rva = 0
+        self.version_info = {}
+
+    def section(self, name):
+        for section in self.sections:
+            if section["name"] == name:
+                return section
+        return None
+
+    def rva_to_offset(self, rva):
+        for section in self.sections:
+            start = section["virtual_address"]
+            if start <= rva < start + max(section["virtual_size"], section["raw_size"]):
+                return rva - start + section["raw_offset"]
+        return None
+
+    def to_dict(self):
+        return {
+            "machine": hex(self.machine),
+            "is_64bit": self.is_64bit,
+            "sections": [s["name"].decode("ascii", "replace") for s in self.sections],
+            "overlay_offset": self.overlay_offset,
+            "overlay_size": self.overlay_size,
+        }
+
+
+def parse_pe(buf):
+    """
+    Parses DOS/PE headers, the section table and the version resource from any
+    bytes-like object (typically an mmap). Only the pages holding those
+    structures are touched. Returns None if `buf` is not a PE image.
+    """
+    try:
+        if len(buf) < 64 or buf[:2] != b"MZ":
+            return None
+        pe_offset = struct.unpack_from("<I", buf, 0x3C)[0]
+        if buf[pe_offset:pe_offset + 4] != b"PE\0\0":
+            return None
+
+        machine, num_sections, _, _, _, opt_size, _ = struct.unpack_from("<HHIIIHH", buf, pe_offset + 4)
+        opt_offset = pe_offset + 24
+        magic = struct.unpack_from("<H", buf, opt_offset)[0]
+        is_64bit = magic == 0x20B
+        dirs_offset = opt_offset + (112 if is_64bit else 96)
+        num_dirs = struct.unpack_from("<I", buf, dirs_offset - 4)[0]
+
+        def data_directory(index):
+            if index >= num_dirs:
+                return 0, 0
+            return struct.unpack_from("<II", buf, dirs_offset + index * 8)
+
+        sections = []
+        table = opt_offset + opt_size
+        for i in range(num_sections):
+            entry = table + i * 40
+            name, vsize, va, raw_size, raw_offset = struct.unpack_from("<8sIIII", buf, entry)
+            sections.append({
+                "name": name.rstrip(b"\0"),
+                "virtual_size": vsize,
+                "virtual_address": va,
+                "raw_size": raw_size,
+                "raw_offset": raw_offset,
+            })
+
+        # The overlay is whatever follows the last section's raw data, minus an
+        # Authenticode certificate appended at the very end.
+        size_of_headers = struct.unpack_from("<I", buf, opt_offset + 60)[0]
+        overlay_offset = max([size_of_headers] + [s["raw_offset"] + s["raw_size"] for s in sections if s["raw_size"]])
+        overlay_end = len(buf)
+        cert_offset, cert_size = data_directory(4)
+        if cert_size and overlay_offset <= cert_offset < overlay_end:
+            overlay_end = cert_offset
+        overlay_offset = min(overlay_offset, len(buf))
+
+        pe = PEInfo(machine, is_64bit, sections, overlay_offset, max(0, overlay_end - overlay_offset))
+        pe.resource_rva, _ = data_directory(2)
+        if pe.resource_rva:
+            pe.version_info = _read_version_resource(buf, pe)
+        return pe
+    except struct.error:
+        return None
+
+
+def find_resources(buf, pe, resource_type):
+    """
+    Returns (offset, size) of every resource of `resource_type`, either an
+    integer id such as RT_VERSION or the name of a custom type like "DATA".
+    """
+    root = pe.rva_to_offset(pe.resource_rva) if pe.resource_rva else None
+    if root is None:
+        return []
+
+    def entries(directory):
+        named, ids = struct.unpack_from("<HH", buf, directory + 12)
+        for i in range(named + ids):
+            yield struct.unpack_from("<II", buf, directory + 16 + i * 8)
+
+    def matches(name):
+        if not name & 0x80000000:
+            return name == resource_type
+        if not isinstance(resource_type, str):
+            return False
+        pos = root + (name & 0x7FFFFFFF)
+        length = struct.unpack_from("<H", buf, pos)[0]
+        return bytes(buf[pos + 2:pos + 2 + length * 2]).decode("utf-16-le", "replace").upper() == resource_type.upper()
+
+    found = []
+    try:
+        # type -> name -> language -> data entry
+        for name, node in entries(root):
+            if not node & 0x80000000 or not matches(name):
+                continue
+            for _, languages in entries(root + (node & 0x7FFFFFFF)):
+                if not languages & 0x80000000:
+                    continue
+                for _, entry in entries(root + (languages & 0x7FFFFFFF)):
+                    if entry & 0x80000000:
+                        continue
+                    data_rva, data_size = struct.unpack_from("<II", buf, root + entry)
+                    offset = pe.rva_to_offset(data_rva)
+                    if offset is not None and offset < len(buf):
+                        found.append((offset, min(data_size, len(buf) - offset)))
+    except struct.error:
+        pass
+    return found
+
+
+def _read_version_resource(buf, pe):
+    """
+    Decodes the VS_VERSIONINFO strings of the first RT_VERSION resource.
+    """
+    resources = find_resources(buf, pe, RT_VERSION)
+    if not resources:
+        return {}
+    offset, size = resources[0]
+    data = bytes(buf[offset:offset + min(size, 64 * 1024)])
+
+    info = {}
+    _walk_version_block(data, 0, len(data), info)
+    return {k: v for k, v in info.items() if k in VERSION_STRINGS or k.startswith("Squirrel")}
+
+
+def _walk_version_block(data, pos, end, info, depth=0):
+    """
+    Recursively decodes a VS_VERSIONINFO block, collecting String key/values.
+    """
+    while pos + 6 <= end and depth < 4:
+        length, value_length, value_type = struct.unpack_from("<HHH", data, pos)
+        if length < 6:
+            return
+        block_end = min(pos + length, end)
+        key_end = pos + 6
+        while key_end + 1 < block_end and data[key_end:key_end + 2] != b"\0\0":
+            key_end += 2
+        key = data[pos + 6:key_end].decode("utf-16le", "replace")
+        value_start = (key_end + 2 + 3) & ~3
+
+        if value_type == 1:
+            # Text values are counted in words; trust the terminator over the count
+            raw = data[value_start:min(value_start + value_length * 2, block_end)]
+            terminator = raw.find(b"\0\0")
+            while terminator != -1 and terminator % 2:
+                terminator = raw.find(b"\0\0", terminator + 1)
+            if terminator != -1:
+                raw = raw[:terminator]
+            if depth == 3:
+                info[key] = raw.decode("utf-16le", "replace")
+            children = value_start + value_length * 2
+        else:
+            if key == "VS_VERSION_INFO" and value_length >= 52:
+                signature, _, file_ms, file_ls, prod_ms, prod_ls = struct.unpack_from("<IIIIII", data, value_start)
+                if signature == 0xFEEF04BD:
+                    info.setdefault("FileVersion", f"{file_ms >> 16}.{file_ms & 0xFFFF}.{file_ls >> 16}.{file_ls & 0xFFFF}")
+                    info.setdefault("ProductVersion", f"{prod_ms >> 16}.{prod_ms & 0xFFFF}.{prod_ls >> 16}.{prod_ls & 0xFFFF}")
+            children = value_start + value_length
+
+        # VS_VERSIONINFO -> StringFileInfo -> StringTable -> String
+        if key in ("VS_VERSION_INFO", "StringFileInfo") or depth == 2:
+            _walk_version_block(data, (children + 3) & ~3, block_end, info, depth + 1)
+        pos = (block_end + 3) & ~3
+
+
+def identify_framework(buf, pe):
+    """
+    Scores installer frameworks from section names, overlay signatures and
+    version strings. Returns (name, confidence, evidence) or (None, 0.0, []).
+    """
+    votes = {}
+
+    def vote(name, confidence, evidence):
+        entry = votes.setdefault(name, [1.0, []])
+        # Independent signals reinforce each other
+        entry[0] *= (1.0 - confidence)
+        entry[1].append(evidence)
+
+    for section in pe.sections:
+        if section["name"] in FRAMEWORK_SECTIONS:
+            name, confidence = FRAMEWORK_SECTIONS[section["name"]]
+            vote(name, confidence, f"section {section['name'].decode('ascii', 'replace')}")
+
+    if pe.overlay_size:
+        start = pe.overlay_offset
+        probe = bytes(buf[start:start + min(OVERLAY_PROBE_SIZE, pe.overlay_size)])
+        for signature, name, confidence in FRAMEWORK_OVERLAY_SIGNATURES:
+            if signature in probe:
+                vote(name, confidence, f"overlay signature {signature!r}")
+
+    # Older Inno Setup loaders stamp their offset table into the DOS stub
+    if bytes(buf[0x30:0x34]) == b"Inno":
+        vote("inno", 0.9, "loader signature at 0x30")
+
+    for key, value in pe.version_info.items():
+        for hint, name, confidence in FRAMEWORK_VERSION_HINTS:
+            if hint in value or hint in key:
+                vote(name, confidence, f"version resource {key}")
+
+    if not votes:
+        return None, 0.0, []
+    name, (miss, evidence) = min(votes.items(), key=lambda item: item[1][0])
+    return name, round(1.0 - miss, 3), evidence
+
+
+# Bytes read from the start of a file to dispatch on magic
+HEADER_PROBE_SIZE = 4096
+CFB_MAGIC = b"\xd0\xcf\x11\xe0\xa1\xb1\x1a\xe1"
+
+
+class DetectorSpec:
+    """
+    A detector's cheap signature plus the dotted path of its implementation.
+
+    The signature is checked against one small header read (and, for PE files,
+    the section table and first page of the overlay). The implementation
+    module is only imported once a file matches.
+    """
+    def __init__(self, name, target=None, magic=None, offset=0, section=None,
+                 extensions=(), file_type=None):
+        self.name = name
+        # "package.module:function", called as function(analyzer, buf, pe)
+        self.target = target
+        self.magic = (magic,) if isinstance(magic, bytes) else tuple(magic or ())
+        # Byte offset of the magic, or "overlay" for the start of the PE overlay
+        self.offset = offset
+        self.section = section
+        self.extensions = tuple(extensions)
+        # Set on detectors that decide the file type itself
+        self.file_type = file_type
+        self._func = None
+
+    def matches(self, header, extension, pe=None, overlay=b""):
+        if self.extensions and extension not in self.extensions:
+            return False
+        if self.section is not None and (pe is None or pe.section(self.section) is None):
+            return False
+        if self.magic:
+            if self.offset == "overlay":
+                if pe is None:
+                    return False
+                data = overlay
+            else:
+                data = header[self.offset:]
+            if not any(data.startswith(m) for m in self.magic):
+                return False
+        return True
+
+    def load(self):
+        if self._func is None:
+            module, _, attr = self.target.partition(":")
+            self._func = getattr(importlib.import_module(module), attr)
+        return self._func
+
+
+_DETECTORS = []
+
+
+def register_detector(name, target=None, magic=None, offset=0, section=None,
+                      extensions=(), file_type=None):
+    """
+    Registers an installer detector. Detectors run in registration order after
+    the base MSI/EXE analysis; a result with a higher install_cmd_confidence
+    replaces the current command, otherwise only new keys are added.
+    """
+    spec = DetectorSpec(name, target, magic, offset, section, extensions, file_type)
+    _DETECTORS.append(spec)
+    return spec
+
+
+def registered_detectors():
+    return list(_DETECTORS)
+
+
+register_detector("msi", magic=CFB_MAGIC, file_type="msi")
+register_detector("msix", "lib.detectors.msix:detect", magic=b"PK\x03\x04",
+                  extensions=(".msix", ".appx", ".msixbundle", ".appxbundle"), file_type="msix")
+register_detector("pe", magic=b"MZ", file_type="exe")
+register_detector("wix_burn", "lib.detectors.burn:detect", magic=b"MZ", section=b".wixburn")
+register_detector("7z_sfx", "lib.detectors.sevenzip:detect",
+                  magic=(b"7z\xbc\xaf\x27\x1c", b";!@Install@!"), offset="overlay")
+register_detector("squirrel", "lib.detectors.squirrel:detect", magic=b"PK\x03\x04", offset="overlay")
+register_detector("squirrel_resource", "lib.detectors.squirrel:detect_resource", magic=b"MZ", section=b".rsrc")
+
+
+class BufferReader(io.RawIOBase):
+    """
+    Read-only, seekable file object over a buffer (mmap or memoryview slice),
+    for APIs such as zipfile that want a file. Reads copy only what is asked for.
+    """
+    def __init__(self, buf):
+        self._view = memoryview(buf)
+        self._pos = 0
+
+    def readable(self):
+        return True
+
+    def seekable(self):
+        return True
+
+    def seek(self, offset, whence=io.SEEK_SET):
+        if whence == io.SEEK_CUR:
+            offset += self._pos
+        elif whence == io.SEEK_END:
+            offset += len(self._view)
+        self._pos = max(0, offset)
+        return self._pos
+
+    def tell(self):
+        return self._pos
+
+    def readinto(self, b):
+        chunk = self._view[self._pos:self._pos + len(b)]
+        n = len(chunk)
+        b[:n] = chunk
+        self._pos += n
+        return n
+
+    def close(self):
+        if not self.closed:
+            self._view.release()
+        super().close()
+
+
+# Nested payloads: how deep wrappers are unpacked and how many per level
+MAX_NESTING_DEPTH = 3
+MAX_PAYLOADS = 16
+# Compressed zip members up to this size are inflated in memory and analyzed
+INFLATE_LIMIT = 16 * 1024 * 1024
+ZIP_END_RECORD = b"PK\x05\x06"
+ZIP_END_SEARCH = 64 * 1024 + 22
+_CFB_RE = re.compile(re.escape(CFB_MAGIC))
+
+
+def _payload_type(header):
+    if header.startswith(CFB_MAGIC):
+        return "msi"
+    if header.startswith(b"MZ"):
+        return "exe"
+    return None
+
+
+def find_payloads(buf, pe):
+    """
+    Locates installers embedded in a PE overlay without copying them: the
+    members of an appended zip, a PE at the start of the overlay, or compound
+    files (MSI) anywhere in it. Returns dicts with offset, size, type and
+    container. Compressed zip members small enough to inflate carry `data`.
+    """
+    if pe is None or not pe.overlay_size:
+        return []
+    start, end = pe.overlay_offset, pe.overlay_offset + pe.overlay_size
+
+    tail = bytes(buf[max(start, end - ZIP_END_SEARCH):end])
+    if ZIP_END_RECORD in tail:
+        payloads = _zip_payloads(buf, start, end)
+        if payloads is not None:
+            return payloads
+
+    head = bytes(buf[start:start + 8])
+    if _payload_type(head) == "exe":
+        return [{"offset": start, "size": end - start, "type": "exe", "container": "overlay"}]
+
+    offsets = []
+    overlap = len(CFB_MAGIC) - 1
+    for pos in range(start, end, DEFAULT_SCAN_WINDOW):
+        stop = min(pos + DEFAULT_SCAN_WINDOW + overlap, end)
+        offsets.extend(m.start() for m in _CFB_RE.finditer(buf, pos, stop) if m.start() not in offsets)
+        _release_pages(buf, pos, stop)
+        if len(offsets) >= MAX_PAYLOADS:
+            del offsets[MAX_PAYLOADS:]
+            break
+    # A compound file's length is not recorded; each one runs to the next
+    return [
+        {"offset": offset, "size": nxt - offset, "type": "msi", "container": "overlay"}
+        for offset, nxt in zip(offsets, offsets[1:] + [end])
+    ]
+
+
+def _zip_payloads(buf, start, end):
+    import zipfile
+    payloads = []
+    with memoryview(buf) as view, BufferReader(view[start:end]) as reader:
+        try:
+            archive = zipfile.ZipFile(reader)
+        except zipfile.BadZipFile:
+            return None
+        with archive:
+            for info in archive.infolist():
+                if info.is_dir() or len(payloads) >= MAX_PAYLOADS:
+                    continue
+                # Data follows the local header, whose name/extra lengths may differ
+                local = info.header_offset
+                name_len, extra_len = struct.unpack_from("<HH", view, start + local + 26)
+                offset = start + local + 30 + name_len + extra_len
+                record = {"offset": offset, "size": info.compress_size, "container": "zip", "member": info.filename}
+                if info.compress_type == zipfile.ZIP_STORED:
+                    record["type"] = _payload_type(bytes(view[offset:offset + 8]))
+                else:
+                    with archive.open(info) as member:
+                        record["type"] = _payload_type(member.read(8))
+                    record["compressed"] = True
+                    if record["type"] and info.file_size <= INFLATE_LIMIT:
+                        record["data"] = archive.read(info)
+                if record["type"]:
+                    payloads.append(record)
+    return payloads
+
 
 class StaticAnalyzer:
-    def __init__(self, file_path):
-        self.file_path = os.path.abspath(file_path)
+    def __init__(self, file_path, scan_window=DEFAULT_SCAN_WINDOW, cache=None, entropy_skip=True,
+                 max_depth=MAX_NESTING_DEPTH, buffer=None):
+        # With `buffer` (bytes, mmap or memoryview) the installer is analyzed in
+        # memory and `file_path` only names it
+        self._buffer = buffer
+        # (mmap, offset) of `buffer` within a mapping, so scans can release pages
+        self._origin = None
+        self.file_path = file_path if buffer is not None else os.path.abspath(file_path)
+        self.max_depth = max_depth
+        self.depth = 0
         self.file_type = self._detect_type()
+        self.scan_window = scan_window
+        # Skip high-entropy (compressed) blocks during the string scan
+        self.entropy_skip = entropy_skip
+        self.entropy_backend = None
+        self.phase_times = {}
+        # Optional lib.cache.AnalysisCache; unchanged installers skip analysis
+        self.cache = cache
 
     def _detect_type(self):
-        if self.file_path.lower().endswith(".msi"):
+        # Magic bytes first, so misnamed files are still recognized
+        self.header = b""
+        if self._buffer is not None:
+            self.header = bytes(self._buffer[:HEADER_PROBE_SIZE])
+        else:
+            try:
+                with open(self.file_path, 'rb') as f:
+                    self.header = f.read(HEADER_PROBE_SIZE)
+            except OSError:
+                pass
+        extension = os.path.splitext(self.file_path)[1].lower()
+        for spec in _DETECTORS:
+            if spec.file_type and spec.offset != "overlay" and spec.section is None \
+                    and spec.matches(self.header, extension):
+                return spec.file_type
+
+        if extension == ".msi":
             return "msi"
-        elif self.file_path.lower().endswith(".exe"):
+        elif extension == ".exe":
             return "exe"
         else:
             return "unknown"
 
     def analyze(self):
+        with span("analyze", path=os.path.basename(self.file_path), type=self.file_type, depth=self.depth):
+            if self.cache is not None and self._buffer is None:
+                return self.cache.get_or_compute(self.file_path, ANALYZER_VERSION, self._analyze)
+            return self._analyze()
+
+    def query_strings(self, pattern, regex=False, index=None, limit=1000):
+        """
+        Answers a substring or regex query over this installer's strings from the
+        persistent strings index, extracting them first if the content is new.
+        The default index shares this analyzer's cache (if any) for hashing.
+        """
+        from lib.strings_index import StringsIndex
+        index = index or StringsIndex(hash_cache=self.cache)
+        if not index.is_indexed(self.file_path):
+            index.index_file(self.file_path)
+        return index.query(pattern, regex=regex, file_path=self.file_path, limit=limit)
+
+    def _analyze(self):
         results = {
             "type": self.file_type,
             "path": self.file_path,
@@ -30,15 +764,123 @@ class StaticAnalyzer:
             "silent_flags": []
         }
 
-        if self.file_type == "msi":
-            results.update(self._analyze_msi())
-        elif self.file_type == "exe":
-            results.update(self._analyze_exe())
+        with self._map() as mm:
+            if mm is not None:
+                count("analyze.bytes", len(mm))
+            pe = None
+            if mm is not None and self.file_type == "exe":
+                started = time.perf_counter()
+                with span("analyze.pe"):
+                    pe = parse_pe(mm)
+                self.phase_times["pe"] = time.perf_counter() - started
+
+            if self.file_type == "msi":
+                with span("analyze.msi"):
+                    results.update(self._analyze_msi())
+            elif self.file_type == "exe":
+                with span("analyze.exe"):
+                    results.update(self._analyze_exe(mm, pe))
+
+            if mm is not None:
+                with span("analyze.detectors"):
+                    self._run_detectors(results, mm, pe)
+                with span("analyze.find_payloads"):
+                    payloads = results.pop("payloads", [])
+                    # Detectors know their containers' bounds; a generic find inside one is the same payload
+                    payloads += [p for p in find_payloads(mm, pe)
+                                 if not any(q["offset"] <= p["offset"] < q["offset"] + q["size"] for q in payloads)]
+                if payloads:
+                    with span("analyze.payloads", count=len(payloads)):
+                        results["children"] = self._analyze_payloads(mm, payloads)
         
         return results
 
+    def _analyze_payloads(self, mm, payloads):
+        """
+        Analyzes embedded installers in place through memoryview slices of the
+        mapping; nothing is extracted. Compressed payloads are listed but only
+        descended into when small enough to inflate.
+        """
+        children = []
+        for payload in payloads:
+            data = payload.pop("data", None)
+            child = dict(payload)
+            child["analysis"] = None
+            children.append(child)
+            if self.depth >= self.max_depth or not payload.get("type") or \
+                    (payload.get("compressed") and data is None):
+                continue
+
+            label = payload.get("member") or f"payload@0x{payload['offset']:x}"
+            with memoryview(mm) as view, view[payload["offset"]:payload["offset"] + payload["size"]] as window:
+                nested = StaticAnalyzer(f"{self.file_path}!{label}", scan_window=self.scan_window,
+                                        entropy_skip=self.entropy_skip, max_depth=self.max_depth,
+                                        buffer=data if data is not None else window)
+                nested.depth = self.depth + 1
+                if data is None:
+                    if isinstance(mm, mmap.mmap):
+                        nested._origin = (mm, payload["offset"])
+                    elif self._origin is not None:
+                        nested._origin = (self._origin[0], self._origin[1] + payload["offset"])
+                try:
+                    child["analysis"] = nested.analyze()
+                except Exception as e:
+                    logging.error(f"Failed to analyze embedded payload {label}: {e}")
+                finally:
+                    # The nested analyzer must not outlive the slice it was given
+                    nested._buffer = None
+        return children
+
+    @contextmanager
+    def _map(self):
+        """
+        Maps the installer read-only for the duration of the analysis.
+        Yields None for empty or unreadable files.
+        """
+        if self._buffer is not None:
+            yield self._buffer if len(self._buffer) else None
+            return
+        try:
+            f = open(self.file_path, 'rb')
+        except OSError as e:
+            logging.error(f"Failed to open installer: {e}")
+            yield None
+            return
+        with f:
+            if os.fstat(f.fileno()).st_size == 0:
+                yield None
+                return
+            with mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ) as mm:
+                yield mm
+
+    def _run_detectors(self, results, mm, pe):
+        extension = os.path.splitext(self.file_path)[1].lower()
+        overlay = b""
+        if pe is not None and pe.overlay_size:
+            overlay = bytes(mm[pe.overlay_offset:pe.overlay_offset + min(OVERLAY_PROBE_SIZE, pe.overlay_size)])
+
+        for spec in _DETECTORS:
+            if spec.target is None or not spec.matches(self.header, extension, pe, overlay):
+                continue
+            try:
+                update = spec.load()(self, mm, pe)
+            except Exception as e:
+                logging.error(f"Detector '{spec.name}' failed: {e}")
+                continue
+            if not update:
+                continue
+            results.setdefault("detectors", []).append(spec.name)
+            if update.get("install_cmd_confidence", 0.0) >= results.get("install_cmd_confidence", 0.0):
+                properties = {**results.get("properties", {}), **update.pop("properties", {})}
+                results.update(update)
+                results["properties"] = properties
+            else:
+                for key, value in update.items():
+                    results.setdefault(key, value)
+
     def _analyze_msi(self):
         props = {}
+        msilib = _optional_import("msilib") if self._buffer is None else None
         if msilib:
             try:
                 db = msilib.OpenDatabase(self.file_path, msilib.MSIDBOPEN_READONLY)
@@ -52,38 +894,93 @@ class StaticAnalyzer:
                 logging.error(f"Failed to analyze MSI: {e}")
                 return {"error": str(e)}
         else:
-             props = {"Note": "Deep introspection unavailable (msilib missing)"}
+            # Native compound-file reader: works on any OS and Python version
+            from lib.msi_reader import read_msi_properties, CompoundFileError
+            try:
+                if self._buffer is not None:
+                    with BufferReader(self._buffer) as f:
+                        props = read_msi_properties(f)
+                else:
+                    props = read_msi_properties(self.file_path)
+            except (CompoundFileError, OSError, struct.error) as e:
+                logging.error(f"Failed to analyze MSI: {e}")
+                return {"error": str(e)}
         
         # MSI always supports standard flags
         return {
             "properties": props, 
             "silent_flags": ["/qn", "/norestart"],
-            "install_cmd": f'msiexec /i "{self.file_path}" /qn /norestart'
+            "install_cmd": f'msiexec /i "{self.file_path}" /qn /norestart',
+            "install_cmd_confidence": 1.0
         }
 
-    def _analyze_exe(self):
+    def _analyze_exe(self, mm, pe):
+        # Identify the installer framework from the PE structures first. That
+        # touches a few KB; the full flag scan is only the fallback.
+        framework, confidence, evidence = None, 0.0, []
+        if pe:
+            try:
+                framework, confidence, evidence = identify_framework(mm, pe)
+            except Exception as e:
+                logging.error(f"Failed to identify installer framework: {e}")
+
+        result = {}
+        if pe:
+            result["pe"] = pe.to_dict()
+            result["properties"] = dict(pe.version_info)
+
+        if framework:
+            flags = INSTALLER_FRAMEWORKS[framework]
+            result.update({
+                "framework": {"name": framework, "confidence": confidence, "evidence": evidence},
+                "silent_flags": list(flags),
+                "install_cmd": f'"{self.file_path}" ' + " ".join(flags),
+                "install_cmd_confidence": confidence,
+                "scan_stats": self._scan_stats(len(mm), 0)
+            })
+            return result
+
+        result["framework"] = {"name": "unknown", "confidence": 0.0, "evidence": []}
+        result.update(self._scan_for_flags(mm, pe.overlay_offset if pe else 0))
+        return result
+
+    def _scan_for_flags(self, mm, image_size=0):
         # Static analysis: Search for common flag patterns in the binary strings
         # This is safer than executing an unknown generic installer
         
         possible_flags = [
             "/S", "/silent", "/q", "/quiet", "-q", "--silent", "/verysilent", "/supressmsgboxes"
         ]
-        found_flags = []
-        
-        try:
-            with open(self.file_path, 'rb') as f:
-                # Read first 5MB is usually enough for header/strings
-                content = f.read(5 * 1024 * 1024) 
-                
-                # Check for ASCII and UTF-16LE encoding of flags
-                for flag in possible_flags:
-                    # Some installers like NSIS use /S (case sensitive)
-                    # Others might be case insensitive. 
-                    if flag.encode('ascii') in content or flag.encode('utf-16le') in content:
-                        found_flags.append(flag)
-                        
-        except Exception as e:
-            logging.error(f"Failed to read EXE: {e}")
+        # Map the whole file and find every flag, ASCII and UTF-16LE, in one pass.
+        # Flag tables often sit in the overlay at the end of large installers.
+        # Some installers like NSIS use /S (case sensitive), so matching is exact.
+        hits = {}
+        size = scanned = 0
+        if mm is not None:
+            try:
+                scanner = PatternScanner(possible_flags, window=self.scan_window)
+                size = len(mm)
+                # An embedded payload is scanned through the outer mapping so
+                # pages are released as in a top-level scan
+                source, base = self._origin or (mm, 0)
+                regions = self._scan_regions(source, base, size, scanner, image_size)
+                started = time.perf_counter()
+                with span("analyze.scan", regions=len(regions)):
+                    hits = scanner.scan_regions(source, regions)
+                if base:
+                    hits = {flag: [(offset - base, encoding) for offset, encoding in found]
+                            for flag, found in hits.items()}
+                self.phase_times["scan"] = time.perf_counter() - started
+                scanned = sum(end - start for start, end in regions)
+                count("analyze.bytes_scanned", scanned)
+            except Exception as e:
+                logging.error(f"Failed to read EXE: {e}")
+
+        found_flags = [flag for flag in possible_flags if flag in hits]
+        flag_offsets = {
+            flag: [{"offset": offset, "encoding": encoding} for offset, encoding in hits[flag]]
+            for flag in found_flags
+        }
 
         # Heuristic for command construction
         cmd = f'"{self.file_path}"'
@@ -99,4 +996,44 @@ class StaticAnalyzer:
             else:
                 cmd += f" {found_flags[0]}"
         
-        return {"silent_flags": found_flags, "install_cmd": cmd}
+        return {
+            "silent_flags": found_flags,
+            "flag_offsets": flag_offsets,
+            "install_cmd": cmd,
+            # Substring hits show up by accident in many binaries
+            "install_cmd_confidence": 0.3 if found_flags else 0.0,
+            "scan_stats": self._scan_stats(size, scanned)
+        }
+
+    def _scan_regions(self, buf, start, size, scanner, image_size=0):
+        """
+        Picks the byte ranges of buf[start:start + size] worth scanning.
+        Compressed payload can never hold a readable flag, so high-entropy
+        blocks past the first `image_size` bytes (the PE headers and
+        sections, whose string tables sit among dense code) are skipped on
+        large files.
+        """
+        if not self.entropy_skip or size < ENTROPY_MIN_FILE_SIZE:
+            return [(start, start + size)]
+        image_size = min(image_size, size)
+        started = time.perf_counter()
+        with span("analyze.entropy", bytes=size - image_size):
+            regions = low_entropy_regions(buf, margin=scanner._overlap, start=start + image_size, end=start + size)
+        if image_size:
+            head_end = min(start + image_size + scanner._overlap, start + size)
+            if regions and regions[0][0] <= head_end:
+                regions[0] = (start, max(regions[0][1], head_end))
+            else:
+                regions.insert(0, (start, head_end))
+        self.phase_times["entropy"] = time.perf_counter() - started
+        self.entropy_backend = "numpy" if _optional_import("numpy") is not None else "python"
+        return regions
+
+    def _scan_stats(self, size, scanned):
+        return {
+            "bytes_total": size,
+            "bytes_scanned": scanned,
+            "skipped_fraction": round(1.0 - scanned / size, 4) if size else 0.0,
+            "entropy_backend": self.entropy_backend,
+            "phase_times_s": {k: round(v, 6) for k, v in self.phase_times.items()}
+        }
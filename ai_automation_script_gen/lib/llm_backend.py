@@ -0,0 +1,430 @@
+import asyncio
+import copy
+import email.utils
+import hashlib
+import json
+import logging
+import math
+import random
+import ssl
+import threading
+import time
+from collections import OrderedDict
+from datetime import datetime, timezone
+from urllib.parse import urlsplit
+from lib.llm_client import LLMClient
+from lib.profiling import count, span
+
+DEFAULT_MAX_CONNECTIONS = 8
+DEFAULT_BATCH_SIZE = 16
+# How long a request waits for others to share its batch
+DEFAULT_BATCH_WINDOW = 0.005
+DEFAULT_RETRIES = 4
+DEFAULT_BACKOFF = 0.1
+DEFAULT_TIMEOUT = 60.0
+DEFAULT_CACHE_ENTRIES = 4096
+DEFAULT_CACHE_TTL = 3600.0
+
+RETRYABLE_STATUS = (429, 502, 503, 504)
+
+
+class BackendError(Exception):
+    pass
+
+
+def request_key(request):
+    """
+    Content hash of a request; identical prompts share one cache entry.
+    """
+    return hashlib.sha256(json.dumps(request, sort_keys=True).encode("utf-8")).hexdigest()
+
+
+def retry_after_seconds(value):
+    """
+    Delay asked for by a Retry-After header, given either as seconds or as an
+    HTTP-date. None if the value cannot be parsed.
+    """
+    try:
+        seconds = float(value)
+    except ValueError:
+        try:
+            when = email.utils.parsedate_to_datetime(value)
+        except (TypeError, ValueError):
+            return None
+        if when.tzinfo is None:
+            when = when.replace(tzinfo=timezone.utc)
+        seconds = (when - datetime.now(timezone.utc)).total_seconds()
+    return max(0.0, seconds) if math.isfinite(seconds) else None
+
+
+class ResponseCache:
+    """
+    LRU of model responses with a time-to-live per entry.
+    """
+    def __init__(self, max_entries=DEFAULT_CACHE_ENTRIES, ttl=DEFAULT_CACHE_TTL):
+        self.max_entries = max_entries
+        self.ttl = ttl
+        self.entries = OrderedDict()
+        self.hits = self.misses = self.expired = 0
+
+    def get(self, key):
+        entry = self.entries.get(key)
+        if entry is not None:
+            expires, value = entry
+            if expires > time.monotonic():
+                self.entries.move_to_end(key)
+                self.hits += 1
+                return True, value
+            del self.entries[key]
+            self.expired += 1
+        self.misses += 1
+        return False, None
+
+    def put(self, key, value):
+        self.entries[key] = (time.monotonic() + self.ttl, value)
+        self.entries.move_to_end(key)
+        while len(self.entries) > self.max_entries:
+            self.entries.popitem(last=False)
+
+    def stats(self):
+        lookups = self.hits + self.misses
+        return {
+            "hits": self.hits,
+            "misses": self.misses,
+            "expired": self.expired,
+            "entries": len(self.entries),
+            "hit_rate": round(self.hits / lookups, 4) if lookups else 0.0
+        }
+
+
+class LLMBackend:
+    """
+    Interface for model backends. `complete` answers one task; implementations
+    are free to pool, batch and cache underneath.
+    """
+    async def complete(self, task, payload):
+        raise NotImplementedError
+
+    async def complete_many(self, requests):
+        return await asyncio.gather(*(self.complete(task, payload) for task, payload in requests))
+
+    async def close(self):
+        pass
+
+
+class HTTPBackend(LLMBackend):
+    """
+    Model backend speaking JSON over HTTP/1.1 with keep-alive connections.
+
+    POST {path}/complete takes {"model", "task", "input"} and returns
+    {"output"}; POST {path}/batch takes {"requests": [...]} and returns
+    {"responses": [{"output"} | {"error"}]}. Requests arriving within
+    `batch_window` of each other are sent as one batch (set batch_size=1 to
+    disable). At most `max_connections` calls are in flight. 429/5xx answers
+    are retried with exponential backoff, honoring Retry-After.
+    https URLs are verified against `ssl_context` (the system CAs by
+    default); `token` is sent as a Bearer Authorization header alongside any
+    extra `headers`. Must be used from a single event loop.
+    """
+    def __init__(self, url, model="default", max_connections=DEFAULT_MAX_CONNECTIONS,
+                 batch_size=DEFAULT_BATCH_SIZE, batch_window=DEFAULT_BATCH_WINDOW,
+                 retries=DEFAULT_RETRIES, backoff=DEFAULT_BACKOFF, timeout=DEFAULT_TIMEOUT, cache=None,
+                 headers=None, token=None, ssl_context=None):
+        parts = urlsplit(url)
+        if parts.scheme not in ("http", "https"):
+            raise ValueError(f"Unsupported URL scheme in '{url}'")
+        self.host = parts.hostname
+        self.ssl = (ssl_context or ssl.create_default_context()) if parts.scheme == "https" else None
+        default_port = 443 if self.ssl else 80
+        self.port = parts.port or default_port
+        self.path = parts.path.rstrip("/")
+        self.headers = {"Host": self.host if self.port == default_port else f"{self.host}:{self.port}",
+                        "Content-Type": "application/json", **(headers or {})}
+        if token:
+            self.headers["Authorization"] = f"Bearer {token}"
+        self.model = model
+        self.max_connections = max_connections
+        self.batch_size = batch_size
+        self.batch_window = batch_window
+        self.retries = retries
+        self.backoff = backoff
+        self.timeout = timeout
+        self.cache = cache if cache is not None else ResponseCache()
+
+        self._slots = None
+        self._idle = []
+        self._pending = []
+        self._timer = None
+        self._inflight = {}
+        self._tasks = set()
+        self.counters = {"requests": 0, "deduplicated": 0, "http_calls": 0, "batches": 0,
+                         "batched_requests": 0, "retries": 0, "connections_opened": 0}
+
+    async def complete(self, task, payload):
+        request = {"model": self.model, "task": task, "input": payload}
+        key = request_key(request)
+        self.counters["requests"] += 1
+        found, value = self.cache.get(key)
+        if found:
+            return copy.deepcopy(value)
+
+        # Identical requests already on the wire share their answer. The call
+        # runs in its own task, so a caller that gives up (cancellation,
+        # timeout) does not cancel it for the others waiting on it.
+        shared = self._inflight.get(key)
+        if shared is None:
+            shared = asyncio.ensure_future(self._fetch(key, request))
+            self._inflight[key] = shared
+            self._tasks.add(shared)
+            shared.add_done_callback(self._tasks.discard)
+            # Every caller may have given up; don't warn about an unretrieved exception
+            shared.add_done_callback(lambda task: task.cancelled() or task.exception())
+        else:
+            self.counters["deduplicated"] += 1
+        # Callers own what they get; the cached answer stays private
+        return copy.deepcopy(await asyncio.shield(shared))
+
+    async def _fetch(self, key, request):
+        try:
+            if self.batch_size > 1:
+                output = await self._enqueue(request)
+            else:
+                output = (await self._post("/complete", request))["output"]
+            self.cache.put(key, output)
+            return output
+        finally:
+            del self._inflight[key]
+
+    async def _enqueue(self, request):
+        future = asyncio.get_running_loop().create_future()
+        self._pending.append((request, future))
+        if len(self._pending) >= self.batch_size:
+            self._flush()
+        elif self._timer is None:
+            self._timer = asyncio.get_running_loop().call_later(self.batch_window, self._flush)
+        return await future
+
+    def _flush(self):
+        if self._timer is not None:
+            self._timer.cancel()
+            self._timer = None
+        while self._pending:
+            batch, self._pending = self._pending[:self.batch_size], self._pending[self.batch_size:]
+            task = asyncio.ensure_future(self._send_batch(batch))
+            self._tasks.add(task)
+            task.add_done_callback(self._tasks.discard)
+
+    async def _send_batch(self, batch):
+        try:
+            if len(batch) == 1:
+                responses = [await self._post("/complete", batch[0][0])]
+            else:
+                self.counters["batches"] += 1
+                self.counters["batched_requests"] += len(batch)
+                body = await self._post("/batch", {"requests": [request for request, _ in batch]})
+                responses = body["responses"]
+        except Exception as e:
+            for _, future in batch:
+                if not future.done():
+                    future.set_exception(e)
+            return
+        for (_, future), response in zip(batch, responses):
+            if future.done():
+                continue
+            if "error" in response:
+                future.set_exception(BackendError(response["error"]))
+            else:
+                future.set_result(response["output"])
+        # A short answer must not leave the remaining callers waiting forever
+        for _, future in batch[len(responses):]:
+            if not future.done():
+                future.set_exception(BackendError(
+                    f"Batch answered {len(responses)} of {len(batch)} requests"))
+
+    async def _post(self, path, body):
+        data = json.dumps(body).encode("utf-8")
+        for attempt in range(self.retries + 1):
+            status, headers, payload = await self._http("POST", self.path + path, data)
+            if status in RETRYABLE_STATUS and attempt < self.retries:
+                self.counters["retries"] += 1
+                count("llm_backend.retries")
+                delay = retry_after_seconds(headers.get("retry-after", ""))
+                if delay is None:
+                    delay = self.backoff * (2 ** attempt)
+                # Jitter keeps throttled clients from retrying in lockstep
+                await asyncio.sleep(delay * (0.5 + random.random()))
+                continue
+            if status >= 400:
+                raise BackendError(f"HTTP {status}: {payload[:200]!r}")
+            return json.loads(payload)
+
+    async def _http(self, method, path, data):
+        if self._slots is None:
+            self._slots = asyncio.Semaphore(self.max_connections)
+        async with self._slots:
+            self.counters["http_calls"] += 1
+            # A pooled keep-alive connection may have been closed by the server;
+            # only a fresh connection's failure is an error
+            while True:
+                reused = bool(self._idle)
+                reader, writer = self._idle.pop() if reused else await self._connect()
+                try:
+                    status, headers, payload = await asyncio.wait_for(
+                        self._roundtrip(reader, writer, method, path, data), self.timeout)
+                except (ConnectionError, asyncio.IncompleteReadError) as e:
+                    writer.close()
+                    if reused:
+                        continue
+                    raise BackendError(f"Connection to {self.host}:{self.port} failed: {e}")
+                except asyncio.TimeoutError:
+                    writer.close()
+                    raise BackendError(f"No answer from {self.host}:{self.port} within {self.timeout}s")
+                except ValueError as e:
+                    writer.close()
+                    raise BackendError(f"Malformed response from {self.host}:{self.port}: {e}")
+                except BaseException:
+                    writer.close()
+                    raise
+                if headers.get("connection", "").lower() == "close":
+                    writer.close()
+                else:
+                    self._idle.append((reader, writer))
+                return status, headers, payload
+
+    async def _connect(self):
+        try:
+            connection = await asyncio.wait_for(
+                asyncio.open_connection(self.host, self.port, ssl=self.ssl), self.timeout)
+        except (OSError, asyncio.TimeoutError) as e:
+            # ssl.SSLError (e.g. certificate verification) is an OSError too
+            raise BackendError(f"Cannot connect to {self.host}:{self.port}: {e}")
+        self.counters["connections_opened"] += 1
+        return connection
+
+    async def _roundtrip(self, reader, writer, method, path, data):
+        headers = "".join(f"{name}: {value}\r\n" for name, value in self.headers.items())
+        writer.write(
+            f"{method} {path} HTTP/1.1\r\n{headers}Content-Length: {len(data)}\r\n\r\n".encode("latin-1") + data
+        )
+        await writer.drain()
+        status_line = await reader.readline()
+        if not status_line:
+            raise ConnectionResetError("Server closed the connection")
+        status = int(status_line.split()[1])
+        headers = {}
+        while True:
+            line = await reader.readline()
+            if line in (b"\r\n", b"\n", b""):
+                break
+            name, _, value = line.decode("latin-1").partition(":")
+            headers[name.strip().lower()] = value.strip()
+        if status in (204, 304) or 100 <= status < 200:
+            payload = b""
+        elif "chunked" in headers.get("transfer-encoding", "").lower():
+            payload = await self._read_chunked(reader)
+        elif "content-length" in headers:
+            payload = await reader.readexactly(int(headers["content-length"]))
+        else:
+            # The body runs to the end of the connection, which can't be reused
+            payload = await reader.read()
+            headers["connection"] = "close"
+        return status, headers, payload
+
+    @staticmethod
+    async def _read_chunked(reader):
+        chunks = []
+        while True:
+            line = await reader.readline()
+            if not line:
+                raise asyncio.IncompleteReadError(b"".join(chunks), None)
+            size = int(line.split(b";", 1)[0].strip(), 16)
+            if size == 0:
+                break
+            chunks.append(await reader.readexactly(size))
+            await reader.readexactly(2)
+        # Trailer fields, if any, end with an empty line
+        while (await reader.readline()) not in (b"\r\n", b"\n", b""):
+            pass
+        return b"".join(chunks)
+
+    async def close(self):
+        if self._pending:
+            self._flush()
+        if self._tasks:
+            await asyncio.gather(*self._tasks, return_exceptions=True)
+        while self._idle:
+            _, writer = self._idle.pop()
+            writer.close()
+
+    def stats(self):
+        return {**self.counters, "cache": self.cache.stats()}
+
+
+class BackendThread:
+    """
+    Runs a backend on its own event loop thread so synchronous callers
+    (one per installer thread) still share its pool, batches and cache.
+    """
+    def __init__(self, backend):
+        self.backend = backend
+        self.loop = asyncio.new_event_loop()
+        self.thread = threading.Thread(target=self.loop.run_forever, daemon=True)
+        self.thread.start()
+
+    def call(self, task, payload, timeout=None):
+        with span("llm_backend.call", task=task):
+            future = asyncio.run_coroutine_threadsafe(self.backend.complete(task, payload), self.loop)
+            return future.result(timeout)
+
+    def close(self):
+        asyncio.run_coroutine_threadsafe(self.backend.close(), self.loop).result()
+        self.loop.call_soon_threadsafe(self.loop.stop)
+        self.thread.join()
+        self.loop.close()
+
+
+class ModelLLMClient(LLMClient):
+    """
+    LLMClient backed by a real model. Falls back to the built-in heuristics
+    when the backend fails, so a flaky endpoint never stalls an install.
+    """
+    def __init__(self, backend, model_name=None, decision_cache=None, timeout=DEFAULT_TIMEOUT):
+        super().__init__(model_name or getattr(backend, "model", "model"), decision_cache)
+        self.runner = BackendThread(backend)
+        self.timeout = timeout
+
+    def decide_next_action(self, ui_context, history):
+        try:
+            return self.runner.call("decide_next_action", {"ui_context": ui_context, "history": history},
+                                    self.timeout)
+        except Exception as e:
+            logging.error(f"Model backend failed, using heuristic: {e}")
+            return super().decide_next_action(ui_context, history)
+
+    def analyze_error(self, error_log, current_script):
+        try:
+            return self.runner.call("analyze_error", {"error_log": error_log, "script": current_script},
+                                    self.timeout)
+        except Exception as e:
+            logging.error(f"Model backend failed, using heuristic: {e}")
+            return super().analyze_error(error_log, current_script)
+
+    def analyze_errors(self, error_log, current_script, limit=3):
+        try:
+            return self.runner.call("analyze_errors",
+                                    {"error_log": error_log, "script": current_script, "limit": limit},
+                                    self.timeout)
+        except Exception as e:
+            logging.error(f"Model backend failed, using heuristic: {e}")
+            return super().analyze_errors(error_log, current_script, limit)
+
+    async def adecide_next_action(self, ui_context, history):
+        """
+        For callers already on an event loop; many concurrent calls get batched.
+        """
+        return await asyncio.wrap_future(asyncio.run_coroutine_threadsafe(
+            self.runner.backend.complete("decide_next_action", {"ui_context": ui_context, "history": history}),
+            self.runner.loop))
+
+    def close(self):
+        self.runner.close()
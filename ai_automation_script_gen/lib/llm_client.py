@@ -1,11 +1,80 @@
+import atexit
+import copy
 import logging
 import json
 import re
+from lib.decisions import DecisionCache, ScreenIndex, decide, screen_fingerprint
+from lib.profiling import count, profiled
+
+def suggest_fixes(error_log):
+    """
+    The heuristic behind LLMClient.analyze_error(s): candidate fixes for a
+    failure, most likely first.
+    """
+    # Heuristic fixes for MVP
+    if "TimeoutExpired" in error_log or "timed out" in error_log:
+         return [
+             {
+                 "type": "modify_param",
+                 "param": "timeout",
+                 "value": 1200,
+                 "reason": "Installation took longer than expected."
+             },
+             {
+                 "type": "modify_param",
+                 "param": "timeout",
+                 "value": 3600,
+                 "reason": "Installation is much slower than expected."
+             },
+             {
+                 "type": "insert_step",
+                 "code": "time.sleep(30) # let a previous install finish",
+                 "location": "before_failure",
+                 "reason": "Another installation may still be running."
+             }
+         ]
+
+    if "ElementNotFoundError" in error_log:
+         # Assume we missed a pop-up or timing issue
+         return [
+             {
+                 "type": "insert_step",
+                 "code": "time.sleep(5) # adaptive wait for slow UI",
+                 "location": "before_failure",
+                 "reason": "Element not found, likely timing issue."
+             },
+             {
+                 "type": "insert_step",
+                 "code": "time.sleep(20) # adaptive wait for very slow UI",
+                 "location": "before_failure",
+                 "reason": "Element not found, UI may be very slow to appear."
+             }
+         ]
+
+    # Generic retry
+    return [{
+        "type": "retry", 
+        "reason": "Transient error suspected."
+    }]
+
+
+def suggest_fix(error_log):
+    """
+    The top-ranked heuristic fix.
+    """
+    return suggest_fixes(error_log)[0]
+
 
 class LLMClient:
-    def __init__(self, model_name="dummy-model"):
+    def __init__(self, model_name="dummy-model", decision_cache=None):
         self.model_name = model_name
+        # Screens seen before (by fingerprint) are not decided again.
+        # Pass DecisionCache.persistent() to keep decisions across runs.
+        self.decisions = decision_cache if decision_cache is not None else DecisionCache()
+        if self.decisions.path:
+            atexit.register(self.decisions.save)
 
+    @profiled("llm.decide_next_action")
     def decide_next_action(self, ui_context, history):
         """
         Simulates an LLM API call.
@@ -22,60 +91,43 @@ class LLMClient:
         # "Visible elements are {ui_context}. Goal is to install. What is the next step?"
         
         print(f"[AI Reasoning] Analyzing {len(ui_context)} UI elements...")
-        
-        # Priority list for standard installers
-        priorities = [
-            "I agree", "I accept", "Agree", 
-            "Next", "Next >", "Install", "Finish", "Close"
-        ]
-        
-        # 1. Check for blocking "Agree" checkboxes first
-        for item in ui_context:
-            text = item.get('title', '').lower()
-            if "agree" in text and item.get('control_type') in ['CheckBox', 'RadioButton']:
-                 if not item.get("toggle_state", "off") == "on": # hypothetical state check
-                     return {"action": "click", "selector": {"title": item['title'], "control_type": item['control_type']}, "reason": "Accepting Terms"}
 
-        # 2. Check for Navigation Buttons
-        for keyword in priorities:
-            for item in ui_context:
-                text = item.get('title', '').strip()
-                if text.lower() == keyword.lower():
-                    # Avoid clicking "Cancel"
-                    return {"action": "click", "selector": {"title": text, "control_type": item['control_type']}, "reason": f"Clicking navigation button '{text}'"}
-        
-        return None
+        fingerprint = screen_fingerprint(ui_context)
+        found, decision = self.decisions.get(fingerprint)
+        if found:
+            count("llm.decision_cache_hits")
+            return copy.deepcopy(decision)
+        count("llm.decision_cache_misses")
+
+        # Index the screen once; the heuristic then looks titles up directly
+        decision, ambiguous = decide(ScreenIndex(ui_context))
+        if ambiguous:
+            # The winner depends on on-screen order, which the fingerprint ignores
+            self.decisions.uncacheable += 1
+        else:
+            self.decisions.put(fingerprint, copy.deepcopy(decision))
+        return decision
 
+    def decision_stats(self):
+        return self.decisions.stats()
+
+    @profiled("llm.analyze_error")
     def analyze_error(self, error_log, current_script):
         """
         Analyzes an execution error and suggests a fix.
         In a real system, this sends the error + script to an LLM.
         """
         print("[AI Healing] Analyzing error log...")
-        
-        # Heuristic fixes for MVP
-        if "TimeoutExpired" in error_log or "timed out" in error_log:
-             return {
-                 "type": "modify_param",
-                 "param": "timeout",
-                 "value": 1200,
-                 "reason": "Installation took longer than expected."
-             }
-        
-        if "ElementNotFoundError" in error_log:
-             # Assume we missed a pop-up or timing issue
-             return {
-                 "type": "insert_step",
-                 "code": "time.sleep(5) # adaptive wait for slow UI",
-                 "location": "before_failure",
-                 "reason": "Element not found, likely timing issue."
-             }
+        return suggest_fix(error_log)
 
-        # Generic retry
-        return {
-            "type": "retry", 
-            "reason": "Transient error suspected."
-        }
+    @profiled("llm.analyze_errors")
+    def analyze_errors(self, error_log, current_script, limit=3):
+        """
+        Like analyze_error, but returns up to `limit` ranked candidate fixes
+        so they can be verified side by side.
+        """
+        print("[AI Healing] Analyzing error log for candidate fixes...")
+        return suggest_fixes(error_log)[:limit]
 
     def apply_fix(self, script_content, fix):
         """
@@ -0,0 +1,184 @@
+"""
+Local stand-in for a model endpoint, for testing and benchmarking
+lib/llm_backend.py. Answers with the built-in heuristics after an injected
+latency, and can throttle like a rate-limited API.
+
+    python -m lib.llm_stub_server [--port 8765] [--latency 0.05] [--max-concurrent 32]
+"""
+import asyncio
+import json
+import random
+import sys
+import threading
+from lib.decisions import ScreenIndex, decide
+from lib.llm_client import suggest_fix, suggest_fixes
+
+
+def answer(request):
+    task, payload = request.get("task"), request.get("input") or {}
+    if task == "decide_next_action":
+        return decide(ScreenIndex(payload.get("ui_context", [])))[0]
+    if task == "analyze_error":
+        return suggest_fix(payload.get("error_log", ""))
+    if task == "analyze_errors":
+        return suggest_fixes(payload.get("error_log", ""))[:payload.get("limit", 3)]
+    raise ValueError(f"Unknown task '{task}'")
+
+
+class StubModelServer:
+    """
+    HTTP/1.1 keep-alive server for POST /v1/complete and /v1/batch.
+
+    `latency` is added to every call and `per_item_latency` per request in it,
+    so batching pays off as it would against a real model. Calls beyond
+    `max_concurrent` get 429 with Retry-After, and `failure_rate` of calls
+    get 503.
+    """
+    def __init__(self, host="127.0.0.1", port=0, latency=0.05, per_item_latency=0.001,
+                 max_concurrent=None, failure_rate=0.0, retry_after=0.05):
+        self.host = host
+        self.port = port
+        self.latency = latency
+        self.per_item_latency = per_item_latency
+        self.max_concurrent = max_concurrent
+        self.failure_rate = failure_rate
+        self.retry_after = retry_after
+        self.active = 0
+        self.counters = {"calls": 0, "items": 0, "throttled": 0, "failed": 0, "connections": 0}
+        self._server = None
+        self._loop = None
+        self._thread = None
+        self._handlers = set()
+
+    @property
+    def url(self):
+        return f"http://{self.host}:{self.port}/v1"
+
+    async def _handle(self, reader, writer):
+        self.counters["connections"] += 1
+        self._handlers.add(asyncio.current_task())
+        try:
+            while True:
+                request_line = await reader.readline()
+                if not request_line:
+                    break
+                _, path, _ = request_line.decode("latin-1").split(" ", 2)
+                headers = {}
+                while True:
+                    line = await reader.readline()
+                    if line in (b"\r\n", b"\n", b""):
+                        break
+                    name, _, value = line.decode("latin-1").partition(":")
+                    headers[name.strip().lower()] = value.strip()
+                body = await reader.readexactly(int(headers.get("content-length", 0)))
+                status, extra, payload = await self._respond(path, body)
+                data = json.dumps(payload).encode("utf-8")
+                writer.write(
+                    f"HTTP/1.1 {status} X\r\nContent-Type: application/json\r\n"
+                    f"Content-Length: {len(data)}\r\n{extra}\r\n".encode("ascii") + data
+                )
+                await writer.drain()
+        except (ConnectionError, asyncio.IncompleteReadError, ValueError):
+            pass
+        finally:
+            self._handlers.discard(asyncio.current_task())
+            writer.close()
+
+    async def _respond(self, path, body):
+        self.counters["calls"] += 1
+        if self.max_concurrent is not None and self.active >= self.max_concurrent:
+            self.counters["throttled"] += 1
+            return 429, f"Retry-After: {self.retry_after}\r\n", {"error": "rate limited"}
+        if self.failure_rate and random.random() < self.failure_rate:
+            self.counters["failed"] += 1
+            return 503, "", {"error": "unavailable"}
+
+        self.active += 1
+        try:
+            request = json.loads(body)
+            if path.endswith("/batch"):
+                items = request["requests"]
+            elif path.endswith("/complete"):
+                items = [request]
+            else:
+                return 404, "", {"error": f"no route {path}"}
+            self.counters["items"] += len(items)
+            await asyncio.sleep(self.latency + self.per_item_latency * len(items))
+            responses = []
+            for item in items:
+                try:
+                    responses.append({"output": answer(item)})
+                except Exception as e:
+                    responses.append({"error": str(e)})
+            if path.endswith("/batch"):
+                return 200, "", {"responses": responses}
+            if "error" in responses[0]:
+                return 400, "", responses[0]
+            return 200, "", responses[0]
+        finally:
+            self.active -= 1
+
+    async def serve(self):
+        self._server = await asyncio.start_server(self._handle, self.host, self.port)
+        self.port = self._server.sockets[0].getsockname()[1]
+        return self._server
+
+    async def shutdown(self):
+        self._server.close()
+        for task in list(self._handlers):
+            task.cancel()
+        await asyncio.gather(*self._handlers, return_exceptions=True)
+
+    def start(self):
+        """
+        Serves from a background thread; returns once the port is bound.
+        """
+        ready = threading.Event()
+
+        def run():
+            self._loop = asyncio.new_event_loop()
+            self._loop.run_until_complete(self.serve())
+            ready.set()
+            self._loop.run_forever()
+
+        self._thread = threading.Thread(target=run, daemon=True)
+        self._thread.start()
+        ready.wait()
+        return self
+
+    def stop(self):
+        if self._loop is not None:
+            asyncio.run_coroutine_threadsafe(self.shutdown(), self._loop).result()
+            self._loop.call_soon_threadsafe(self._loop.stop)
+            self._thread.join()
+            self._loop.close()
+            self._loop = None
+
+    def __enter__(self):
+        return self.start()
+
+    def __exit__(self, *exc):
+        self.stop()
+
+
+def main(argv):
+    def option(name, default):
+        return type(default)(argv[argv.index(name) + 1]) if name in argv else default
+
+    server = StubModelServer(port=option("--port", 8765), latency=option("--latency", 0.05),
+                             max_concurrent=option("--max-concurrent", 0) or None)
+
+    async def run():
+        await server.serve()
+        print(f"Stub model server on {server.url}")
+        await asyncio.Event().wait()
+
+    try:
+        asyncio.run(run())
+    except KeyboardInterrupt:
+        pass
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main(sys.argv[1:]))
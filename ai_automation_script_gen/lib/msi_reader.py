@@ -0,0 +1,339 @@
+import array
+import struct
+import sys
+
+# Compound File Binary (OLE2) constants, see [MS-CFB]
+CFB_SIGNATURE = b"\xd0\xcf\x11\xe0\xa1\xb1\x1a\xe1"
+ENDOFCHAIN = 0xFFFFFFFE
+NOSTREAM = 0xFFFFFFFF
+HEADER_DIFAT_ENTRIES = 109
+DIR_ENTRY_SIZE = 128
+STREAM_OBJECT = 2
+ROOT_STORAGE = 5
+
+# FAT/miniFAT sectors kept decoded at once. Only chains we actually follow
+# are ever read, so this stays tiny even for multi-GB files.
+SECTOR_CACHE_SIZE = 64
+
+# MSI tables live in streams whose names start with this marker
+MSI_TABLE_MARKER = 0x4840
+
+
+class CompoundFileError(Exception):
+    pass
+
+
+def _decode_msi_name(name):
+    """
+    Undoes the MSI stream name packing: two base64-like characters per code
+    point in U+3800..U+47FF, single characters in U+4800..U+483F.
+    """
+    def mime(value):
+        if value < 10:
+            return chr(ord('0') + value)
+        if value < 36:
+            return chr(ord('A') + value - 10)
+        if value < 62:
+            return chr(ord('a') + value - 36)
+        return '.' if value == 62 else '_'
+
+    out = []
+    for ch in name:
+        code = ord(ch)
+        if code == MSI_TABLE_MARKER:
+            continue
+        if 0x3800 <= code < 0x4800:
+            code -= 0x3800
+            out.append(mime(code & 0x3F))
+            out.append(mime((code >> 6) & 0x3F))
+        elif 0x4800 <= code < MSI_TABLE_MARKER:
+            out.append(mime(code - 0x4800))
+        else:
+            out.append(ch)
+    return "".join(out)
+
+
+class _Chain:
+    """
+    Resolves the n-th sector of a FAT chain, following links only as far as needed.
+    """
+    def __init__(self, next_sector, start):
+        self._next = next_sector
+        self._sectors = [] if start >= ENDOFCHAIN else [start]
+
+    def __getitem__(self, index):
+        while len(self._sectors) <= index:
+            if not self._sectors:
+                raise CompoundFileError("Read past end of sector chain")
+            nxt = self._next(self._sectors[-1])
+            if nxt >= ENDOFCHAIN:
+                raise CompoundFileError("Read past end of sector chain")
+            if len(self._sectors) > (1 << 26):
+                raise CompoundFileError("Sector chain loop")
+            self._sectors.append(nxt)
+        return self._sectors[index]
+
+
+class CompoundFile:
+    """
+    Lazy, seek-based reader for Compound File Binary documents such as MSI.
+
+    Only the header is read up front. FAT, DIFAT and miniFAT sectors are loaded
+    on demand while following the chains of the streams that are opened, so
+    memory and I/O do not depend on the size of the file.
+    """
+    def __init__(self, f):
+        self.f = f
+        header = self._read_at(0, 512)
+        if len(header) < 512 or header[:8] != CFB_SIGNATURE:
+            raise CompoundFileError("Not a compound file")
+
+        major, = struct.unpack_from("<H", header, 0x1A)
+        sector_shift, mini_shift = struct.unpack_from("<HH", header, 0x1E)
+        (self._num_fat, first_dir, _, self._mini_cutoff, first_minifat,
+         _, first_difat, _) = struct.unpack_from("<IIIIIIII", header, 0x2C)
+
+        self.sector_size = 1 << sector_shift
+        self.mini_sector_size = 1 << mini_shift
+        self._per_sector = self.sector_size // 4
+        self._v3 = major == 3
+        self._header_difat = struct.unpack_from(f"<{HEADER_DIFAT_ENTRIES}I", header, 0x4C)
+        self._difat_chain = [] if first_difat >= ENDOFCHAIN else [first_difat]
+        self._fat_cache = {}
+        self._minifat_cache = {}
+
+        self._minifat_chain = _Chain(self._next_sector, first_minifat)
+        self._entries = self._read_directory(first_dir)
+        root = self._entries[0]
+        self._ministream_chain = _Chain(self._next_sector, root["start"])
+        self.streams = self._root_streams()
+
+    def _read_at(self, offset, size):
+        self.f.seek(offset)
+        return self.f.read(size)
+
+    def _sector_offset(self, sector):
+        return (sector + 1) * self.sector_size
+
+    def _read_sector(self, sector):
+        return self._read_at(self._sector_offset(sector), self.sector_size)
+
+    def _decode_sector(self, data):
+        entries = array.array("I", data)
+        if sys.byteorder != "little":
+            entries.byteswap()
+        return entries
+
+    def _cached(self, cache, key, load):
+        entries = cache.get(key)
+        if entries is None:
+            if len(cache) >= SECTOR_CACHE_SIZE:
+                cache.pop(next(iter(cache)))
+            entries = cache[key] = self._decode_sector(load())
+        return entries
+
+    def _fat_sector(self, index):
+        """
+        Locates the index-th FAT sector through the header DIFAT and, past
+        109 entries, the DIFAT sector chain.
+        """
+        if index < HEADER_DIFAT_ENTRIES:
+            return self._header_difat[index]
+        index -= HEADER_DIFAT_ENTRIES
+        # Each DIFAT sector holds per-1 entries plus the link to the next one
+        per = self._per_sector - 1
+        hop = index // per
+        while len(self._difat_chain) <= hop:
+            if not self._difat_chain:
+                raise CompoundFileError("FAT sector outside DIFAT")
+            last = self._cached(self._fat_cache, ("difat", self._difat_chain[-1]),
+                                lambda: self._read_sector(self._difat_chain[-1]))
+            self._difat_chain.append(last[per])
+        difat = self._cached(self._fat_cache, ("difat", self._difat_chain[hop]),
+                             lambda: self._read_sector(self._difat_chain[hop]))
+        return difat[index % per]
+
+    def _next_sector(self, sector):
+        index = sector // self._per_sector
+        fat = self._cached(self._fat_cache, index, lambda: self._read_sector(self._fat_sector(index)))
+        return fat[sector % self._per_sector]
+
+    def _next_mini_sector(self, sector):
+        index = sector // self._per_sector
+        minifat = self._cached(self._minifat_cache, index,
+                               lambda: self._read_sector(self._minifat_chain[index]))
+        return minifat[sector % self._per_sector]
+
+    def _read_chain(self, start, size):
+        """
+        Reads `size` bytes of a regular stream, merging contiguous sectors into one read.
+        """
+        chunks = []
+        remaining = size
+        sector = start
+        while remaining > 0:
+            if sector >= ENDOFCHAIN:
+                raise CompoundFileError("Stream shorter than its directory entry")
+            run_start = sector
+            run_len = 1
+            nxt = self._next_sector(sector)
+            while nxt == sector + 1 and run_len * self.sector_size < remaining:
+                sector = nxt
+                run_len += 1
+                nxt = self._next_sector(sector)
+            length = min(run_len * self.sector_size, remaining)
+            chunks.append(self._read_at(self._sector_offset(run_start), length))
+            remaining -= length
+            sector = nxt
+        return b"".join(chunks)
+
+    def _read_mini_chain(self, start, size):
+        chunks = []
+        remaining = size
+        sector = start
+        per_big = self.sector_size // self.mini_sector_size
+        while remaining > 0:
+            if sector >= ENDOFCHAIN:
+                raise CompoundFileError("Mini stream shorter than its directory entry")
+            big = self._ministream_chain[sector // per_big]
+            offset = self._sector_offset(big) + (sector % per_big) * self.mini_sector_size
+            length = min(self.mini_sector_size, remaining)
+            chunks.append(self._read_at(offset, length))
+            remaining -= length
+            sector = self._next_mini_sector(sector)
+        return b"".join(chunks)
+
+    def _read_directory(self, first_dir):
+        entries = []
+        chain = _Chain(self._next_sector, first_dir)
+        per_sector = self.sector_size // DIR_ENTRY_SIZE
+        index = 0
+        while True:
+            try:
+                sector = chain[index]
+            except CompoundFileError:
+                break
+            data = self._read_sector(sector)
+            for i in range(per_sector):
+                raw = data[i * DIR_ENTRY_SIZE:(i + 1) * DIR_ENTRY_SIZE]
+                if len(raw) < DIR_ENTRY_SIZE:
+                    break
+                name_len, obj_type = struct.unpack_from("<HB", raw, 64)
+                left, right, child = struct.unpack_from("<III", raw, 68)
+                start, size = struct.unpack_from("<IQ", raw, 116)
+                if self._v3:
+                    size &= 0xFFFFFFFF
+                entries.append({
+                    "name": raw[:max(0, name_len - 2)].decode("utf-16le", "replace"),
+                    "type": obj_type,
+                    "left": left,
+                    "right": right,
+                    "child": child,
+                    "start": start,
+                    "size": size,
+                })
+            index += 1
+        if not entries or entries[0]["type"] != ROOT_STORAGE:
+            raise CompoundFileError("Missing root storage entry")
+        return entries
+
+    def _root_streams(self):
+        """
+        Maps decoded names of the streams directly under the root storage.
+        Sub-storages (embedded transforms, nested MSIs) are not descended into.
+        """
+        streams = {}
+        stack = [self._entries[0]["child"]]
+        seen = set()
+        while stack:
+            sid = stack.pop()
+            if sid == NOSTREAM or sid >= len(self._entries) or sid in seen:
+                continue
+            seen.add(sid)
+            entry = self._entries[sid]
+            if entry["type"] == STREAM_OBJECT:
+                streams[_decode_msi_name(entry["name"])] = entry
+            stack.extend((entry["left"], entry["right"]))
+        return streams
+
+    def read_stream(self, name):
+        entry = self.streams.get(name)
+        if entry is None:
+            raise CompoundFileError(f"Stream '{name}' not found")
+        if entry["size"] < self._mini_cutoff:
+            return self._read_mini_chain(entry["start"], entry["size"])
+        return self._read_chain(entry["start"], entry["size"])
+
+
+def _parse_string_pool(pool, data):
+    """
+    Decodes the MSI string table. Returns (strings, string_ref_size) where
+    strings[0] is the null string.
+    """
+    if len(pool) < 4:
+        raise CompoundFileError("Truncated _StringPool")
+    codepage, = struct.unpack_from("<I", pool, 0)
+    ref_size = 3 if codepage & 0x80000000 else 2
+    codepage &= 0x7FFFFFFF
+    encoding = "utf-8" if codepage == 65001 else (f"cp{codepage}" if codepage else "cp1252")
+    try:
+        "".encode(encoding)
+    except LookupError:
+        encoding = "latin-1"
+
+    words = array.array("H", pool[:len(pool) - len(pool) % 2])
+    if sys.byteorder != "little":
+        words.byteswap()
+
+    strings = [""]
+    offset = 0
+    i = 1
+    count = len(words) // 2
+    while i < count:
+        length, refs = words[i * 2], words[i * 2 + 1]
+        if length == 0 and refs == 0:
+            # Unused id, still occupies a slot
+            strings.append("")
+            i += 1
+            continue
+        if length == 0 and i + 1 < count:
+            # Strings over 64K: the real length is in the following entry
+            length = (words[i * 2 + 3] << 16) + words[i * 2 + 2]
+            i += 2
+        else:
+            i += 1
+        strings.append(data[offset:offset + length].decode(encoding, "replace"))
+        offset += length
+    return strings, ref_size
+
+
+def read_msi_properties(source):
+    """
+    Reads the Property table of an MSI without msilib or Windows.
+    `source` is a path or a seekable binary file object.
+    Opens only the _StringPool, _StringData and Property streams.
+    """
+    if hasattr(source, "read"):
+        return _read_properties(source)
+    with open(source, 'rb') as f:
+        return _read_properties(f)
+
+
+def _read_properties(f):
+    cf = CompoundFile(f)
+    strings, ref_size = _parse_string_pool(cf.read_stream("_StringPool"), cf.read_stream("_StringData"))
+    table = cf.read_stream("Property")
+
+    # Tables are stored column by column: all Property refs, then all Value refs
+    rows = len(table) // (2 * ref_size)
+    column = rows * ref_size
+
+    def ref(pos):
+        return int.from_bytes(table[pos:pos + ref_size], "little")
+
+    props = {}
+    for row in range(rows):
+        key, value = ref(row * ref_size), ref(column + row * ref_size)
+        if 0 < key < len(strings):
+            props[strings[key]] = strings[value] if value < len(strings) else ""
+    return props
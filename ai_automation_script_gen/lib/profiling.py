@@ -0,0 +1,217 @@
+"""
+Lightweight timing spans and counters for the whole pipeline.
+
+    with span("analyze", path=path):
+        ...
+    count("bytes_scanned", n)
+
+Nothing is recorded until enable() is called (main.py --profile). While
+disabled, span() hands back a shared no-op context manager and count()
+returns at once, so instrumented code pays one function call and a global
+lookup. Recorded spans export as Chrome trace-event JSON
+(chrome://tracing, Perfetto) and as a per-name summary table.
+"""
+import functools
+import json
+import os
+import threading
+import time
+
+_profiler = None
+
+
+class _NullSpan:
+    __slots__ = ()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        return False
+
+    def set(self, **args):
+        pass
+
+
+_NULL_SPAN = _NullSpan()
+
+
+class _Span:
+    __slots__ = ("profiler", "name", "args", "start")
+
+    def __init__(self, profiler, name, args):
+        self.profiler = profiler
+        self.name = name
+        self.args = args
+
+    def __enter__(self):
+        self.profiler._stack().append(0)
+        self.start = time.perf_counter_ns()
+        return self
+
+    def __exit__(self, exc_type, exc, tb):
+        end = time.perf_counter_ns()
+        if exc_type is not None:
+            self.args["error"] = exc_type.__name__
+        self.profiler._close(self.name, self.start, end, self.args)
+        return False
+
+    def set(self, **args):
+        """
+        Adds arguments known only once the work is done (sizes, outcomes).
+        """
+        self.args.update(args)
+
+
+class Profiler:
+    """
+    Collects complete spans per thread and global counters. Nesting comes
+    from each thread's stack of open spans, which also gives self time.
+    """
+    def __init__(self):
+        self.origin = time.perf_counter_ns()
+        self.wall_origin = time.time()
+        self.pid = os.getpid()
+        self.events = []
+        self.counters = {}
+        self.summary_rows = {}
+        self._lock = threading.Lock()
+        self._local = threading.local()
+        self._threads = {}
+
+    def _stack(self):
+        stack = getattr(self._local, "stack", None)
+        if stack is None:
+            stack = self._local.stack = []
+        return stack
+
+    def _close(self, name, start, end, args):
+        stack = self._stack()
+        children = stack.pop()
+        duration = end - start
+        if stack:
+            stack[-1] += duration
+        ident = threading.get_ident()
+        with self._lock:
+            tid = self._threads.setdefault(ident, len(self._threads) + 1)
+            self.events.append({
+                "name": name, "ph": "X", "pid": self.pid, "tid": tid,
+                "ts": (start - self.origin) / 1000, "dur": duration / 1000, "args": args,
+            })
+            row = self.summary_rows.setdefault(name, [0, 0, 0, 0])
+            row[0] += 1
+            row[1] += duration
+            row[2] += duration - children
+            row[3] = max(row[3], duration)
+
+    def count(self, name, value=1):
+        with self._lock:
+            self.counters[name] = self.counters.get(name, 0) + value
+
+    def chrome_trace(self):
+        """
+        The spans as a Chrome trace-event document; counters become one
+        "C" event each at the end of the trace plus `otherData`.
+        """
+        end = (time.perf_counter_ns() - self.origin) / 1000
+        with self._lock:
+            events = list(self.events)
+            counters = dict(self.counters)
+            threads = dict(self._threads)
+        events.append({"name": "process_name", "ph": "M", "pid": self.pid, "args": {"name": "ai_automation_script_gen"}})
+        for ident, tid in threads.items():
+            label = "main" if ident == threading.main_thread().ident else f"thread {tid}"
+            events.append({"name": "thread_name", "ph": "M", "pid": self.pid, "tid": tid, "args": {"name": label}})
+        for name, value in counters.items():
+            events.append({"name": name, "ph": "C", "pid": self.pid, "ts": end, "args": {name: value}})
+        return {"traceEvents": events, "displayTimeUnit": "ms",
+                "otherData": {"started": self.wall_origin, "counters": counters}}
+
+    def export_chrome_trace(self, path):
+        with open(path, "w") as f:
+            json.dump(self.chrome_trace(), f)
+        return path
+
+    def summary(self):
+        """
+        [{"name", "count", "total_ms", "self_ms", "mean_ms", "max_ms"}], slowest total first.
+        """
+        with self._lock:
+            rows = [(name, list(row)) for name, row in self.summary_rows.items()]
+        out = [{
+            "name": name,
+            "count": count,
+            "total_ms": round(total / 1e6, 3),
+            "self_ms": round(own / 1e6, 3),
+            "mean_ms": round(total / count / 1e6, 3),
+            "max_ms": round(longest / 1e6, 3),
+        } for name, (count, total, own, longest) in rows]
+        out.sort(key=lambda row: -row["total_ms"])
+        return out
+
+    def format_summary(self):
+        lines = [f"{'span':<32} {'count':>7} {'total ms':>11} {'self ms':>11} {'mean ms':>10} {'max ms':>10}"]
+        for row in self.summary():
+            lines.append(f"{row['name'][:32]:<32} {row['count']:>7} {row['total_ms']:>11.2f} {row['self_ms']:>11.2f} "
+                         f"{row['mean_ms']:>10.3f} {row['max_ms']:>10.3f}")
+        with self._lock:
+            counters = sorted(self.counters.items())
+        if counters:
+            lines.append("")
+            lines.append(f"{'counter':<32} {'value':>14}")
+            for name, value in counters:
+                lines.append(f"{name[:32]:<32} {round(value, 3):>14}")
+        return "\n".join(lines)
+
+
+def enable():
+    """
+    Starts recording in this process and returns the Profiler.
+    """
+    global _profiler
+    if _profiler is None:
+        _profiler = Profiler()
+    return _profiler
+
+
+def disable():
+    """
+    Stops recording; returns the Profiler that was active, if any.
+    """
+    global _profiler
+    profiler, _profiler = _profiler, None
+    return profiler
+
+
+def active():
+    return _profiler
+
+
+def span(name, **args):
+    profiler = _profiler
+    if profiler is None:
+        return _NULL_SPAN
+    return _Span(profiler, name, args)
+
+
+def count(name, value=1):
+    profiler = _profiler
+    if profiler is not None:
+        profiler.count(name, value)
+
+
+def profiled(name=None):
+    """
+    Decorator form of span() for whole functions.
+    """
+    def decorate(func):
+        label = name or func.__qualname__
+
+        @functools.wraps(func)
+        def wrapper(*args, **kwargs):
+            if _profiler is None:
+                return func(*args, **kwargs)
+            with _Span(_profiler, label, {}):
+                return func(*args, **kwargs)
+        return wrapper
+    return decorate
@@ -0,0 +1,219 @@
+import atexit
+import itertools
+import json
+import logging
+import os
+import queue
+import shutil
+import subprocess
+import sys
+import threading
+from contextlib import contextmanager
+from lib.profiling import count, span
+
+WORKER_SCRIPT = os.path.join(os.path.dirname(__file__), "ui_worker.ps1")
+STUB_WORKER_SCRIPT = os.path.join(os.path.dirname(__file__), "ui_worker_stub.py")
+
+STARTUP_TIMEOUT = 30.0
+REQUEST_TIMEOUT = 15.0
+# How long acquire() waits for a busy pool; a leaked session then fails loudly instead of hanging
+ACQUIRE_TIMEOUT = 60.0
+DEFAULT_POOL_SIZE = 2
+
+
+class SessionError(Exception):
+    pass
+
+
+class SessionTimeout(SessionError):
+    pass
+
+
+def default_worker_command():
+    """
+    The UI Automation worker on Windows; elsewhere (or when
+    AI_SCRIPT_GEN_UI_WORKER=stub) a Python stand-in speaking the same protocol.
+    """
+    override = os.environ.get("AI_SCRIPT_GEN_UI_WORKER")
+    powershell = shutil.which("powershell") or shutil.which("pwsh")
+    if override == "stub" or (override is None and (powershell is None or sys.platform != "win32")):
+        return [sys.executable, "-u", STUB_WORKER_SCRIPT]
+    if override:
+        return override.split()
+    return [powershell, "-NoProfile", "-NonInteractive", "-ExecutionPolicy", "Bypass", "-File", WORKER_SCRIPT]
+
+
+class WorkerSession:
+    """
+    One long-running worker process driven over line-delimited JSON.
+
+    Each request is one line {"id", "op", ...params} on stdin; the worker
+    answers with one line {"id", "ok", "result"|"error"} on stdout. Lines
+    that are not JSON (stray host output) are ignored. A worker that crashes
+    or stops answering is killed and started again on the next request.
+    """
+    def __init__(self, command=None, request_timeout=REQUEST_TIMEOUT, startup_timeout=STARTUP_TIMEOUT,
+                 name="UI worker"):
+        self.command = command or default_worker_command()
+        self.name = name
+        self.request_timeout = request_timeout
+        self.startup_timeout = startup_timeout
+        self.proc = None
+        self.restarts = 0
+        self._ids = itertools.count(1)
+        self._lines = None
+        self._lock = threading.Lock()
+
+    def start(self):
+        try:
+            self.proc = subprocess.Popen(
+                self.command, stdin=subprocess.PIPE, stdout=subprocess.PIPE, stderr=subprocess.DEVNULL,
+                text=True, encoding="utf-8", bufsize=1
+            )
+        except OSError as e:
+            # e.g. powershell/pwsh not installed
+            self.proc = None
+            raise SessionError(f"Could not start {self.name} ({self.command[0]}): {e}")
+        # A reader thread turns blocking readline() into a queue we can wait on
+        self._lines = queue.Queue()
+        threading.Thread(target=self._read, args=(self.proc.stdout, self._lines), daemon=True).start()
+        # The worker announces itself once its assemblies are loaded
+        self._exchange({"id": 0, "op": "ping"}, self.startup_timeout)
+
+    @staticmethod
+    def _read(stream, lines):
+        for line in stream:
+            lines.put(line)
+        lines.put(None)
+
+    def alive(self):
+        return self.proc is not None and self.proc.poll() is None
+
+    def request(self, op, timeout=None, **params):
+        """
+        Sends one request and returns its result. Raises SessionTimeout if no
+        answer arrives in time and SessionError if the worker reports an error
+        or dies; either way the next request gets a fresh worker.
+        """
+        with self._lock:
+            if not self.alive():
+                if self.proc is not None:
+                    self.restarts += 1
+                    count("worker.restarts")
+                    logging.warning(f"{self.name} exited; restarting")
+                with span("worker.start", worker=self.name):
+                    self.start()
+            with span("worker.request", worker=self.name, op=op):
+                return self._exchange({"id": next(self._ids), "op": op, **params}, timeout or self.request_timeout)
+
+    def _exchange(self, message, timeout):
+        try:
+            self.proc.stdin.write(json.dumps(message) + "\n")
+            self.proc.stdin.flush()
+        except (BrokenPipeError, OSError) as e:
+            self._kill()
+            raise SessionError(f"{self.name} is not accepting requests: {e}")
+
+        while True:
+            try:
+                line = self._lines.get(timeout=timeout)
+            except queue.Empty:
+                self._kill()
+                raise SessionTimeout(f"{self.name} did not answer '{message['op']}' within {timeout}s")
+            if line is None:
+                self._kill()
+                raise SessionError(f"{self.name} exited during '{message['op']}'")
+            try:
+                response = json.loads(line)
+            except json.JSONDecodeError:
+                continue
+            if not isinstance(response, dict) or response.get("id") != message["id"]:
+                # Answer to an earlier request (e.g. the startup ping)
+                continue
+            if not response.get("ok"):
+                raise SessionError(response.get("error", "unknown worker error"))
+            return response.get("result")
+
+    def _kill(self):
+        if self.proc is not None and self.proc.poll() is None:
+            self.proc.kill()
+            self.proc.wait()
+
+    def close(self):
+        if self.alive():
+            try:
+                self._exchange({"id": next(self._ids), "op": "shutdown"}, 5.0)
+                self.proc.wait(timeout=5.0)
+            except (SessionError, subprocess.TimeoutExpired):
+                pass
+        self._kill()
+
+
+class SessionPool:
+    """
+    A fixed set of worker sessions for parallel inspections. Sessions start
+    on first use and are reused, so each caller pays process startup once.
+    """
+    def __init__(self, size=DEFAULT_POOL_SIZE, command=None, request_timeout=REQUEST_TIMEOUT):
+        self.size = size
+        self.command = command
+        self.request_timeout = request_timeout
+        self._idle = queue.LifoQueue()
+        self._created = 0
+        self._lock = threading.Lock()
+        self._closed = False
+
+    def acquire(self, timeout=ACQUIRE_TIMEOUT):
+        try:
+            return self._idle.get_nowait()
+        except queue.Empty:
+            pass
+        with self._lock:
+            if self._closed:
+                raise SessionError("Session pool is closed")
+            if self._created < self.size:
+                self._created += 1
+                return WorkerSession(self.command, request_timeout=self.request_timeout)
+        try:
+            return self._idle.get(timeout=timeout)
+        except queue.Empty:
+            raise SessionTimeout("No UI worker session became free")
+
+    def release(self, session):
+        if self._closed:
+            session.close()
+        else:
+            self._idle.put(session)
+
+    @contextmanager
+    def session(self, timeout=ACQUIRE_TIMEOUT):
+        session = self.acquire(timeout)
+        try:
+            yield session
+        finally:
+            self.release(session)
+
+    def close(self):
+        self._closed = True
+        while True:
+            try:
+                self._idle.get_nowait().close()
+            except queue.Empty:
+                break
+
+
+_default_pool = None
+_default_pool_lock = threading.Lock()
+
+
+def default_pool():
+    """
+    The process-wide pool used by GuiAutomator. Size comes from
+    AI_SCRIPT_GEN_UI_WORKERS.
+    """
+    global _default_pool
+    with _default_pool_lock:
+        if _default_pool is None:
+            _default_pool = SessionPool(int(os.environ.get("AI_SCRIPT_GEN_UI_WORKERS", DEFAULT_POOL_SIZE)))
+            atexit.register(_default_pool.close)
+        return _default_pool
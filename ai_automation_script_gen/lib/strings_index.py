@@ -0,0 +1,246 @@
+import logging
+import mmap
+import os
+import re
+import sqlite3
+import sys
+from lib.cache import DEFAULT_CACHE_DIR, DEFAULT_CACHE_FILE, file_digest, open_cache
+from lib.introspect import ENTROPY_MIN_FILE_SIZE, low_entropy_regions
+from lib.profiling import count, profiled
+
+DEFAULT_INDEX_FILE = "strings_index.sqlite"
+MIN_STRING_LENGTH = 4
+# Longer runs are truncated; they are almost always padding or junk
+MAX_STRING_LENGTH = 1024
+# Rows written per transaction while extracting
+INSERT_BATCH = 5000
+
+_ASCII_RUN = re.compile(rb"[\x20-\x7e]{%d,}" % MIN_STRING_LENGTH)
+_UTF16_RUN = re.compile(rb"(?:[\x20-\x7e]\x00){%d,}" % MIN_STRING_LENGTH)
+
+
+def extract_strings(buf, regions=None):
+    """
+    Yields (offset, encoding, text) for every printable ASCII and UTF-16LE run
+    in a bytes-like object (typically an mmap), optionally only within the
+    given [start, end) regions. Nothing is materialized.
+    """
+    for start, end in regions or [(0, len(buf))]:
+        for match in _ASCII_RUN.finditer(buf, start, end):
+            yield match.start(), "ascii", match.group()[:MAX_STRING_LENGTH].decode("ascii")
+        for match in _UTF16_RUN.finditer(buf, start, end):
+            yield match.start(), "utf-16le", match.group()[:MAX_STRING_LENGTH * 2].decode("utf-16le")
+
+
+class StringsIndex:
+    """
+    On-disk index of the printable strings of every installer seen, keyed by
+    content hash. Each binary is read once; substring and regex queries are
+    then answered from the index without touching the original files.
+
+    Substring queries use an FTS5 trigram table when SQLite provides one.
+    With an AnalysisCache as `hash_cache`, its (size, mtime) index saves
+    re-hashing files it has seen; without one every file is hashed.
+    """
+    def __init__(self, db_path=None, hash_cache=None):
+        if db_path is None:
+            db_path = os.path.join(DEFAULT_CACHE_DIR, DEFAULT_INDEX_FILE)
+        os.makedirs(os.path.dirname(os.path.abspath(db_path)), exist_ok=True)
+        self.db_path = db_path
+        self.hash_cache = hash_cache
+
+        self.conn = sqlite3.connect(db_path, timeout=30)
+        self.conn.execute("PRAGMA journal_mode=WAL")
+        self.conn.create_function("REGEXP", 2, _regexp, deterministic=True)
+        self.conn.executescript("""
+            CREATE TABLE IF NOT EXISTS files (
+                id INTEGER PRIMARY KEY,
+                digest TEXT UNIQUE NOT NULL,
+                path TEXT NOT NULL,
+                size INTEGER NOT NULL
+            );
+            CREATE TABLE IF NOT EXISTS strings (
+                id INTEGER PRIMARY KEY,
+                file_id INTEGER NOT NULL,
+                offset INTEGER NOT NULL,
+                encoding TEXT NOT NULL,
+                text TEXT NOT NULL
+            );
+            CREATE INDEX IF NOT EXISTS strings_file ON strings(file_id);
+        """)
+        self.fts = self._init_fts()
+
+    def _init_fts(self):
+        try:
+            self.conn.execute(
+                "CREATE VIRTUAL TABLE IF NOT EXISTS strings_fts USING fts5("
+                "text, content='strings', content_rowid='id', tokenize='trigram')"
+            )
+            return True
+        except sqlite3.OperationalError:
+            # SQLite before 3.34 has no trigram tokenizer; fall back to scans
+            return False
+
+    def close(self):
+        self.conn.close()
+
+    def _digest(self, file_path):
+        if self.hash_cache is not None:
+            return self.hash_cache.content_hash(file_path)
+        return file_digest(file_path)
+
+    @profiled("strings_index.index_file")
+    def index_file(self, file_path):
+        """
+        Extracts and stores the strings of one installer unless its content is
+        already indexed. Returns the number of strings added.
+        """
+        file_path = os.path.abspath(file_path)
+        digest = self._digest(file_path)
+        size = os.path.getsize(file_path)
+
+        row = self.conn.execute("SELECT id FROM files WHERE digest = ?", (digest,)).fetchone()
+        if row:
+            with self.conn:
+                self.conn.execute("UPDATE files SET path = ? WHERE id = ?", (file_path, row[0]))
+            return 0
+
+        added = 0
+        with self.conn:
+            file_id = self.conn.execute(
+                "INSERT INTO files (digest, path, size) VALUES (?, ?, ?)", (digest, file_path, size)
+            ).lastrowid
+            if size:
+                with open(file_path, 'rb') as f, mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ) as mm:
+                    # Compressed payload only yields junk runs; skip it like the flag scan does
+                    regions = low_entropy_regions(mm, margin=MAX_STRING_LENGTH * 2) if size >= ENTROPY_MIN_FILE_SIZE else None
+                    batch = []
+                    for offset, encoding, text in extract_strings(mm, regions):
+                        batch.append((file_id, offset, encoding, text))
+                        if len(batch) >= INSERT_BATCH:
+                            added += self._insert(batch)
+                            batch = []
+                    added += self._insert(batch)
+        count("strings_index.strings_added", added)
+        return added
+
+    def _insert(self, rows):
+        if not rows:
+            return 0
+        first = self.conn.execute("SELECT COALESCE(MAX(id), 0) FROM strings").fetchone()[0] + 1
+        self.conn.executemany(
+            "INSERT INTO strings (file_id, offset, encoding, text) VALUES (?, ?, ?, ?)", rows
+        )
+        if self.fts:
+            self.conn.execute(
+                "INSERT INTO strings_fts (rowid, text) SELECT id, text FROM strings WHERE id >= ?", (first,)
+            )
+        return len(rows)
+
+    def index_directory(self, directory, extensions=(".exe", ".msi")):
+        total = 0
+        with os.scandir(directory) as entries:
+            for entry in entries:
+                if entry.is_file() and entry.name.lower().endswith(extensions):
+                    try:
+                        total += self.index_file(entry.path)
+                    except OSError as e:
+                        logging.error(f"Failed to index {entry.path}: {e}")
+        return total
+
+    def is_indexed(self, file_path):
+        digest = self._digest(file_path)
+        return self.conn.execute("SELECT 1 FROM files WHERE digest = ?", (digest,)).fetchone() is not None
+
+    def query(self, pattern, regex=False, file_path=None, limit=1000):
+        """
+        Finds strings containing `pattern` (or matching it as a regex) across the
+        whole corpus, or within one installer if `file_path` is given.
+        Returns dicts with path, offset, encoding and text.
+        """
+        clauses, params = [], []
+        if regex:
+            clauses.append("s.text REGEXP ?")
+            params.append(pattern)
+        elif self.fts and len(pattern) >= 3:
+            # Trigram FTS narrows candidates; instr() keeps matching case-sensitive
+            clauses.append("s.id IN (SELECT rowid FROM strings_fts WHERE strings_fts MATCH ?)")
+            params.append('"' + pattern.replace('"', '""') + '"')
+            clauses.append("instr(s.text, ?) > 0")
+            params.append(pattern)
+        else:
+            clauses.append("instr(s.text, ?) > 0")
+            params.append(pattern)
+
+        if file_path is not None:
+            clauses.append("f.digest = ?")
+            params.append(self._digest(file_path))
+
+        sql = (
+            "SELECT f.path, s.offset, s.encoding, s.text FROM strings s "
+            "JOIN files f ON f.id = s.file_id WHERE " + " AND ".join(clauses) +
+            " ORDER BY f.path, s.offset LIMIT ?"
+        )
+        params.append(limit)
+        return [
+            {"path": path, "offset": offset, "encoding": encoding, "text": text}
+            for path, offset, encoding, text in self.conn.execute(sql, params)
+        ]
+
+    def stats(self):
+        files, size = self.conn.execute("SELECT COUNT(*), COALESCE(SUM(size), 0) FROM files").fetchone()
+        strings = self.conn.execute("SELECT COUNT(*) FROM strings").fetchone()[0]
+        return {"files": files, "bytes_indexed": size, "strings": strings, "fts": self.fts}
+
+
+_regex_cache = {}
+
+
+def _regexp(pattern, text):
+    compiled = _regex_cache.get(pattern)
+    if compiled is None:
+        compiled = _regex_cache[pattern] = re.compile(pattern)
+    return compiled.search(text) is not None
+
+
+def main(argv):
+    usage = (
+        "Usage:\n"
+        "  python -m lib.strings_index index <file_or_dir> [--db <path>]\n"
+        "  python -m lib.strings_index query <text> [--regex] [--file <installer>] [--limit N] [--db <path>]\n"
+        "  python -m lib.strings_index stats [--db <path>]\n"
+        "Options: --cache-dir <dir> (index and analysis cache location), --no-cache (hash every file)"
+    )
+    if len(argv) < 1:
+        print(usage)
+        return 1
+
+    def option(name, default=None):
+        if name in argv:
+            idx = argv.index(name)
+            if idx + 1 < len(argv):
+                return argv[idx + 1]
+        return default
+
+    cache_dir = option("--cache-dir", DEFAULT_CACHE_DIR)
+    hash_cache = None if "--no-cache" in argv else open_cache(os.path.join(cache_dir, DEFAULT_CACHE_FILE))
+    index = StringsIndex(option("--db", os.path.join(cache_dir, DEFAULT_INDEX_FILE)), hash_cache)
+    command = argv[0]
+    if command == "index" and len(argv) >= 2:
+        target = argv[1]
+        added = index.index_directory(target) if os.path.isdir(target) else index.index_file(target)
+        print(f"Indexed {added} new strings. {index.stats()}")
+    elif command == "query" and len(argv) >= 2:
+        for hit in index.query(argv[1], regex="--regex" in argv, file_path=option("--file"),
+                               limit=int(option("--limit", 1000))):
+            print(f"{hit['path']}:{hit['offset']}:{hit['encoding']}: {hit['text']}")
+    elif command == "stats":
+        print(index.stats())
+    else:
+        print(usage)
+        return 1
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main(sys.argv[1:]))
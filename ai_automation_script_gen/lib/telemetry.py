@@ -0,0 +1,348 @@
+import json
+import logging
+import math
+import os
+import re
+import sqlite3
+import sys
+import time
+from datetime import datetime
+from lib.cache import DEFAULT_CACHE_DIR
+from lib.profiling import span
+
+DEFAULT_TELEMETRY_FILE = "telemetry.sqlite"
+# Generated scripts print each record on a line starting with this
+TELEMETRY_PREFIX = "TELEMETRY "
+# Where generated scripts append records unless AI_SCRIPT_GEN_TELEMETRY says otherwise
+SCRIPT_TELEMETRY_FILE = "ai_script_gen_telemetry.jsonl"
+
+# Recent samples kept per (product, phase); older ones are dropped on ingest
+MAX_SAMPLES = 500
+# Fewer successful samples than this and the caller's default timeout stands
+MIN_SAMPLES = 5
+# A suggested timeout is this multiple of the observed p99
+TIMEOUT_MARGIN = 2.0
+MIN_TIMEOUT = 5
+PERCENTILES = (50, 95, 99)
+
+# PowerShell's round-trip format carries 7 fractional digits; Python reads 6
+_FRACTION = re.compile(r"(\.\d{6})\d+")
+
+# PowerShell side of the feedback loop, shared by every generated script.
+# $TelemetryProduct is set by the script before any phase is recorded.
+TELEMETRY_FUNCTION = '''
+$TelemetryRun = [guid]::NewGuid().ToString()
+# Numbers the records of a run, so a phase recorded twice (two "Next" steps) keeps both
+$TelemetrySeq = 0
+$TelemetryPath = if ($env:AI_SCRIPT_GEN_TELEMETRY) { $env:AI_SCRIPT_GEN_TELEMETRY } else { Join-Path $env:TEMP "''' + SCRIPT_TELEMETRY_FILE + '''" }
+
+function Write-Telemetry([string]$Phase, [double]$Milliseconds, [bool]$Ok, $ExitCode = $null, $Product = $TelemetryProduct) {
+    $script:TelemetrySeq++
+    $record = [ordered]@{
+        v = 1; run = $TelemetryRun; seq = $script:TelemetrySeq; product = $Product; phase = $Phase
+        duration_ms = [long]$Milliseconds; ok = $Ok; exit_code = $ExitCode
+        ts = (Get-Date).ToUniversalTime().ToString("o")
+    }
+    $line = $record | ConvertTo-Json -Compress
+    Write-Host "''' + TELEMETRY_PREFIX + '''$line"
+    try { Add-Content -Path $TelemetryPath -Value $line -Encoding UTF8 } catch { }
+}
+'''
+
+
+def product_key(product_name, path=""):
+    """
+    Name telemetry is grouped under: the product name, or the installer's
+    file name when the analysis found none.
+    """
+    if product_name and product_name != "Unknown App":
+        return product_name
+    return re.split(r"[\\/]", path or "")[-1] or "Unknown App"
+
+
+def parse_records(lines):
+    """
+    Yields telemetry records from script output or a telemetry JSONL file.
+    Anything else on the lines is skipped.
+    """
+    for line in lines:
+        line = line.strip().lstrip("\ufeff")
+        if line.startswith(TELEMETRY_PREFIX):
+            line = line[len(TELEMETRY_PREFIX):]
+        if not line.startswith("{"):
+            continue
+        try:
+            record = json.loads(line)
+        except json.JSONDecodeError:
+            continue
+        if isinstance(record, dict) and record.get("product") and record.get("phase") \
+                and isinstance(record.get("duration_ms"), (int, float)):
+            yield record
+
+
+def _timestamp(value):
+    try:
+        return datetime.fromisoformat(_FRACTION.sub(r"\1", str(value)).replace("Z", "+00:00")).timestamp()
+    except ValueError:
+        return time.time()
+
+
+def percentile(sorted_values, p):
+    """
+    Nearest-rank percentile of an ascending list.
+    """
+    if not sorted_values:
+        return None
+    rank = max(1, math.ceil(p / 100 * len(sorted_values)))
+    return sorted_values[rank - 1]
+
+
+def summarize(durations, failures):
+    """
+    Percentiles over successful durations (ms), failure rate over all runs.
+    """
+    durations = sorted(durations)
+    runs = len(durations) + failures
+    summary = {"runs": runs, "successes": len(durations),
+               "failure_rate": round(failures / runs, 4) if runs else 0.0}
+    for p in PERCENTILES:
+        summary[f"p{p}_ms"] = percentile(durations, p)
+    return summary
+
+
+class TelemetryStore:
+    """
+    Per-product, per-phase install durations collected from generated
+    scripts, used to size their timeouts.
+
+    Each sample is one row keyed by (product, phase, run, seq), where seq
+    numbers the records of a run, so a phase recorded several times in one
+    run keeps every sample while ingesting the same file twice adds nothing.
+    Only the MAX_SAMPLES most recent samples per product and phase are kept.
+    """
+    def __init__(self, db_path=None, max_samples=MAX_SAMPLES):
+        if db_path is None:
+            db_path = os.path.join(DEFAULT_CACHE_DIR, DEFAULT_TELEMETRY_FILE)
+        self.db_path = db_path
+        self.max_samples = max_samples
+        # Opened on first use; lookups against a store never written to create nothing
+        self._conn = None
+
+    def _connect(self, create=True):
+        """
+        The connection, or None when `create` is False and nothing was ever stored.
+        """
+        if self._conn is None:
+            if not create and not os.path.exists(self.db_path):
+                return None
+            os.makedirs(os.path.dirname(os.path.abspath(self.db_path)), exist_ok=True)
+            conn = sqlite3.connect(self.db_path, timeout=30, isolation_level=None)
+            conn.execute("PRAGMA journal_mode=WAL")
+            conn.execute("PRAGMA synchronous=NORMAL")
+            conn.executescript("""
+                CREATE TABLE IF NOT EXISTS samples (
+                    product TEXT NOT NULL,
+                    phase TEXT NOT NULL,
+                    run TEXT NOT NULL,
+                    seq INTEGER NOT NULL,
+                    ts REAL NOT NULL,
+                    duration_ms INTEGER NOT NULL,
+                    ok INTEGER NOT NULL,
+                    exit_code INTEGER,
+                    PRIMARY KEY (product, phase, run, seq)
+                ) WITHOUT ROWID;
+            """)
+            self._conn = conn
+        return self._conn
+
+    def _query(self, sql, params=()):
+        conn = self._connect(create=False)
+        return conn.execute(sql, params) if conn is not None else iter(())
+
+    def close(self):
+        if self._conn is not None:
+            self._conn.close()
+            self._conn = None
+
+    def add(self, records):
+        """
+        Stores records as parsed by parse_records(). Returns how many samples
+        were added, net of old ones dropped to stay within max_samples.
+        """
+        rows = []
+        # Records without a seq are numbered in the order they appear per phase
+        occurrences = {}
+        for record in records:
+            code = record.get("exit_code")
+            product, phase = str(record["product"]), str(record["phase"])
+            run = str(record.get("run") or f"{record.get('ts')}:{len(rows)}")
+            seq = occurrences[product, phase, run] = occurrences.get((product, phase, run), 0) + 1
+            if isinstance(record.get("seq"), int):
+                seq = record["seq"]
+            rows.append((
+                product, phase, run, seq,
+                _timestamp(record.get("ts")), int(record["duration_ms"]), 1 if record.get("ok") else 0,
+                code if isinstance(code, int) else None,
+            ))
+        if not rows:
+            return 0
+        conn = self._connect()
+        try:
+            conn.execute("BEGIN")
+            before = conn.total_changes
+            conn.executemany(
+                "INSERT OR IGNORE INTO samples (product, phase, run, seq, ts, duration_ms, ok, exit_code) "
+                "VALUES (?, ?, ?, ?, ?, ?, ?, ?)", rows)
+            added = conn.total_changes - before
+            for product, phase in {(row[0], row[1]) for row in rows}:
+                added -= self._trim(product, phase)
+            conn.execute("COMMIT")
+        except sqlite3.Error as e:
+            conn.execute("ROLLBACK")
+            logging.error(f"Telemetry store update failed: {e}")
+            return 0
+        return added
+
+    def ingest(self, path):
+        """
+        Reads a telemetry JSONL file or captured script output.
+        """
+        with span("telemetry.ingest", path=os.path.basename(path)), \
+                open(path, "r", encoding="utf-8", errors="replace") as f:
+            return self.add(parse_records(f))
+
+    def _trim(self, product, phase):
+        return self._conn.execute(
+            "DELETE FROM samples WHERE product = ? AND phase = ? AND ts < ("
+            "SELECT ts FROM samples WHERE product = ? AND phase = ? ORDER BY ts DESC LIMIT 1 OFFSET ?)",
+            (product, phase, product, phase, self.max_samples - 1)).rowcount
+
+    def phase_stats(self, product, phase):
+        """
+        {"runs", "successes", "failure_rate", "p50_ms", "p95_ms", "p99_ms"}
+        for one phase.
+        """
+        durations, failures = [], 0
+        for duration, ok in self._query(
+                "SELECT duration_ms, ok FROM samples WHERE product = ? AND phase = ?", (product, phase)):
+            if ok:
+                durations.append(duration)
+            else:
+                failures += 1
+        return summarize(durations, failures)
+
+    def suggest_timeout(self, product, phase, default, margin=TIMEOUT_MARGIN, minimum=MIN_TIMEOUT):
+        """
+        Timeout in seconds for a phase: the observed p99 times `margin`, or
+        `default` until there are MIN_SAMPLES successful runs.
+        """
+        stats = self.phase_stats(product, phase)
+        if stats["successes"] < MIN_SAMPLES:
+            return default
+        return max(minimum, math.ceil(stats["p99_ms"] * margin / 1000))
+
+    def report(self, limit=10):
+        """
+        The slowest products (by p95 of a whole run, all phases summed) and
+        the slowest phases, with failure rates.
+        """
+        phases = {}
+        runs = {}
+        for product, phase, run, duration, ok in self._query(
+                "SELECT product, phase, run, duration_ms, ok FROM samples"):
+            durations, failures = phases.setdefault((product, phase), ([], [0]))
+            if ok:
+                durations.append(duration)
+            else:
+                failures[0] += 1
+            total = runs.setdefault((product, run), [0, True])
+            total[0] += duration
+            total[1] = total[1] and bool(ok)
+
+        products = {}
+        for (product, _), (duration, ok) in runs.items():
+            durations, failures = products.setdefault(product, ([], [0]))
+            if ok:
+                durations.append(duration)
+            else:
+                failures[0] += 1
+
+        def ranked(groups, key_names):
+            rows = []
+            for key, (durations, failures) in groups.items():
+                row = dict(zip(key_names, key if isinstance(key, tuple) else (key,)))
+                row.update(summarize(durations, failures[0]))
+                rows.append(row)
+            rows.sort(key=lambda row: (row["p95_ms"] is None, -(row["p95_ms"] or 0)))
+            return rows[:limit]
+
+        return {
+            "products": ranked(products, ("product",)),
+            "phases": ranked(phases, ("product", "phase")),
+        }
+
+    def stats(self):
+        row = next(self._query(
+            "SELECT COUNT(*), COUNT(DISTINCT product), COALESCE(SUM(1 - ok), 0) FROM samples"), None)
+        samples, products, failures = row or (0, 0, 0)
+        return {
+            "samples": samples,
+            "products": products,
+            "failure_rate": round(failures / samples, 4) if samples else 0.0
+        }
+
+
+def format_report(report):
+    def ms(value):
+        return "-" if value is None else f"{value / 1000:.1f}s"
+
+    lines = ["Slowest products (whole run):",
+             f"  {'product':<40} {'runs':>5} {'p50':>8} {'p95':>8} {'p99':>8} {'fail':>6}"]
+    for row in report["products"]:
+        lines.append(f"  {row['product'][:40]:<40} {row['runs']:>5} {ms(row['p50_ms']):>8} "
+                     f"{ms(row['p95_ms']):>8} {ms(row['p99_ms']):>8} {row['failure_rate']:>6.1%}")
+    lines += ["", "Slowest phases:",
+              f"  {'product':<30} {'phase':<20} {'runs':>5} {'p50':>8} {'p95':>8} {'p99':>8} {'fail':>6}"]
+    for row in report["phases"]:
+        lines.append(f"  {row['product'][:30]:<30} {row['phase'][:20]:<20} {row['runs']:>5} {ms(row['p50_ms']):>8} "
+                     f"{ms(row['p95_ms']):>8} {ms(row['p99_ms']):>8} {row['failure_rate']:>6.1%}")
+    return "\n".join(lines)
+
+
+def main(argv):
+    usage = (
+        "Usage:\n"
+        "  python -m lib.telemetry ingest <telemetry.jsonl or script output>... [--db <path>]\n"
+        "  python -m lib.telemetry report [--limit N] [--json] [--db <path>]\n"
+        "  python -m lib.telemetry stats [--db <path>]"
+    )
+    if len(argv) < 1:
+        print(usage)
+        return 1
+
+    def option(name, default=None):
+        if name in argv:
+            idx = argv.index(name)
+            if idx + 1 < len(argv):
+                return argv[idx + 1]
+        return default
+
+    store = TelemetryStore(option("--db"))
+    command = argv[0]
+    if command == "ingest" and len(argv) >= 2:
+        paths = [arg for i, arg in enumerate(argv[1:], 1) if arg != "--db" and argv[i - 1] != "--db"]
+        added = sum(store.ingest(path) for path in paths)
+        print(f"Ingested {added} new samples. {store.stats()}")
+    elif command == "report":
+        report = store.report(int(option("--limit", 10)))
+        print(json.dumps(report, indent=2) if "--json" in argv else format_report(report))
+    elif command == "stats":
+        print(store.stats())
+    else:
+        print(usage)
+        return 1
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main(sys.argv[1:]))
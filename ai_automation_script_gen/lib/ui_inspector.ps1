@@ -1,28 +1,26 @@
-
 param(
     [string]$ProcessPath
 )
 
+# One-shot inspection, used when no worker session is available.
+# Prints a single full snapshot in the ui_worker.ps1 format (see lib/ui_tree.py).
+
 Add-Type -AssemblyName UIAutomationClient
 Add-Type -AssemblyName UIAutomationTypes
 
-function Get-UIHierarchy {
-    param($element, $indent)
-    
-    try {
-        $automationElement = [System.Windows.Automation.AutomationElement]$element
-        if ($null -eq $automationElement) { return }
-
-        $name = $automationElement.Current.Name
-        $controlType = $automationElement.Current.ControlType.ProgrammaticName
-        $isEnabled = $automationElement.Current.IsEnabled
+$walker = [System.Windows.Automation.TreeWalker]::ControlViewWalker
 
-        # Output basic JSON-like structure
-        Write-Output "{ ""title"": ""$name"", ""control_type"": ""$controlType"", ""enabled"": $isEnabled }"
-
-        $children = $automationElement.FindAll([System.Windows.Automation.TreeScope]::Children, [System.Windows.Automation.Condition]::TrueCondition)
-        foreach ($child in $children) {
-            Get-UIHierarchy -element $child -indent ($indent + 1)
+function Get-Rows($element, $parentId, $pos, $rows) {
+    try {
+        $id = ($element.GetRuntimeId() -join ".")
+        $current = $element.Current
+        $rows.Add(@($id, $parentId, $pos, $current.Name, $current.ControlType.ProgrammaticName, $current.IsEnabled))
+        $index = 0
+        $child = $walker.GetFirstChild($element)
+        while ($child) {
+            Get-Rows $child $id $index $rows
+            $index++
+            $child = $walker.GetNextSibling($child)
         }
     } catch {
         # Ignore access errors
@@ -30,18 +28,22 @@ function Get-UIHierarchy {
 }
 
 if ($ProcessPath -ne $null -and $ProcessPath -ne "") {
-    # Launch process
+    # Launch process and wait for its main window
     $process = Start-Process -FilePath $ProcessPath -PassThru
-    Start-Sleep -Seconds 3
-    
-    # Try to find the window handle
-    # This is a simplification; robust logic needs to find the window by PID
+    $deadline = (Get-Date).AddSeconds(10)
+    while ((Get-Date) -lt $deadline) {
+        $process.Refresh()
+        if ($process.HasExited -or $process.MainWindowHandle -ne [IntPtr]::Zero) { break }
+        Start-Sleep -Milliseconds 100
+    }
+
     try {
         $root = [System.Windows.Automation.AutomationElement]::FromHandle($process.MainWindowHandle)
         if ($root) {
-            Write-Output "["
-            Get-UIHierarchy -element $root -indent 0
-            Write-Output "]"
+            $rows = New-Object System.Collections.Generic.List[object]
+            Get-Rows $root $null 0 $rows
+            # ConvertTo-Json escapes titles, unlike hand-built strings
+            Write-Output (@{ version = 1; full = $true; nodes = $rows.ToArray() } | ConvertTo-Json -Compress -Depth 5)
         }
     } catch {
         Write-Error "Could not attach to window."
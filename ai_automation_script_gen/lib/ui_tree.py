@@ -0,0 +1,138 @@
+"""
+Client-side model of an installer's UI tree, kept current from worker
+snapshots (see ui_worker.ps1).
+
+Nodes travel as compact rows in NODE_FIELDS order. The first snapshot of a
+window is full ({"version", "full": true, "nodes": [...]}); later ones carry
+only what changed since the version the client already has
+({"version", "base", "added", "changed", "removed"}).
+"""
+
+NODE_FIELDS = ("id", "parent", "pos", "title", "control_type", "enabled")
+
+
+class StaleSnapshotError(Exception):
+    pass
+
+
+def normalize_title(title):
+    return (title or "").strip().lower()
+
+
+class UITree:
+    """
+    Applies full and delta snapshots in place and keeps indexes by normalized
+    title, control type and enabled state, so lookups do not walk the tree.
+    """
+    def __init__(self):
+        self.version = None
+        self.nodes = {}
+        self._children = {}
+        self._by_title = {}
+        self._by_type = {}
+        self._by_enabled = {True: {}, False: {}}
+        self._order = None
+        self._position = None
+
+    def __len__(self):
+        return len(self.nodes)
+
+    def apply(self, snapshot):
+        """
+        Updates the tree from a worker snapshot. Raises StaleSnapshotError if a
+        delta was computed against a version this tree does not have.
+        """
+        if snapshot.get("full"):
+            self.clear()
+            for row in snapshot["nodes"]:
+                self._add(row)
+            self._order = self._position = None
+        else:
+            if snapshot.get("base") != self.version:
+                raise StaleSnapshotError(f"Delta against version {snapshot.get('base')}, tree has {self.version}")
+            for node_id in snapshot.get("removed", []):
+                self._remove(node_id)
+            for row in snapshot.get("changed", []):
+                self._remove(row[0])
+                self._add(row)
+            for row in snapshot.get("added", []):
+                self._add(row)
+            if snapshot.get("removed") or snapshot.get("changed") or snapshot.get("added"):
+                self._order = self._position = None
+        self.version = snapshot["version"]
+        return self
+
+    def clear(self):
+        self.__init__()
+
+    def _add(self, row):
+        node = dict(zip(NODE_FIELDS, row))
+        node_id = node["id"]
+        self.nodes[node_id] = node
+        self._children.setdefault(node["parent"], {})[node_id] = node
+        self._by_title.setdefault(normalize_title(node["title"]), {})[node_id] = node
+        self._by_type.setdefault(node["control_type"], {})[node_id] = node
+        self._by_enabled[bool(node["enabled"])][node_id] = node
+
+    def _remove(self, node_id):
+        node = self.nodes.pop(node_id, None)
+        if node is None:
+            return
+        for index, key in ((self._children, node["parent"]),
+                           (self._by_title, normalize_title(node["title"])),
+                           (self._by_type, node["control_type"])):
+            bucket = index.get(key)
+            if bucket is not None:
+                bucket.pop(node_id, None)
+                if not bucket:
+                    del index[key]
+        self._by_enabled[bool(node["enabled"])].pop(node_id, None)
+
+    def find(self, title=None, control_type=None, enabled=None):
+        """
+        Returns the nodes matching every given criterion, in tree order.
+        Titles are compared normalized (stripped, case-insensitive).
+        """
+        buckets = []
+        if title is not None:
+            buckets.append(self._by_title.get(normalize_title(title), {}))
+        if control_type is not None:
+            buckets.append(self._by_type.get(control_type, {}))
+        if enabled is not None:
+            buckets.append(self._by_enabled[bool(enabled)])
+        if not buckets:
+            return self.elements()
+        smallest = min(buckets, key=len)
+        matches = [node for node_id, node in smallest.items() if all(node_id in b for b in buckets)]
+        if len(matches) > 1:
+            self.elements()
+            matches.sort(key=lambda node: self._position[node["id"]])
+        return matches
+
+    def first(self, title=None, control_type=None, enabled=None):
+        matches = self.find(title, control_type, enabled)
+        return matches[0] if matches else None
+
+    def children(self, node_id):
+        return sorted(self._children.get(node_id, {}).values(), key=lambda node: node["pos"])
+
+    def parent(self, node_id):
+        node = self.nodes.get(node_id)
+        return self.nodes.get(node["parent"]) if node else None
+
+    def elements(self):
+        """
+        All nodes in depth-first (on-screen) order. The node dicts are the
+        tree's own; treat them as read-only.
+        """
+        if self._order is None:
+            roots = [node for node in self.nodes.values() if node["parent"] not in self.nodes]
+            order = []
+            stack = sorted(roots, key=lambda node: node["pos"], reverse=True)
+            while stack:
+                node = stack.pop()
+                order.append(node)
+                stack.extend(reversed(self.children(node["id"])))
+            self._order = order
+            self._position = {node["id"]: i for i, node in enumerate(order)}
+        return self._order
@@ -0,0 +1,141 @@
+# Long-running UI Automation worker for lib/ps_session.py.
+# Reads one JSON request per line on stdin and writes one JSON response per
+# line on stdout, so assemblies are loaded once per session instead of once
+# per inspection.
+
+Add-Type -AssemblyName UIAutomationClient
+Add-Type -AssemblyName UIAutomationTypes
+
+$ErrorActionPreference = "Stop"
+[Console]::OutputEncoding = [System.Text.Encoding]::UTF8
+$processes = @{}
+
+function Send-Response($id, $ok, $payload) {
+    $response = @{ id = $id; ok = $ok }
+    if ($ok) { $response.result = $payload } else { $response.error = "$payload" }
+    [Console]::Out.WriteLine(($response | ConvertTo-Json -Compress -Depth 20))
+    [Console]::Out.Flush()
+}
+
+function Get-Root($processId) {
+    $proc = $processes[[int]$processId]
+    if (-not $proc) { $proc = Get-Process -Id $processId }
+    $proc.Refresh()
+    if ($proc.MainWindowHandle -eq [IntPtr]::Zero) { throw "Process $processId has no window" }
+    return [System.Windows.Automation.AutomationElement]::FromHandle($proc.MainWindowHandle)
+}
+
+$walker = [System.Windows.Automation.TreeWalker]::ControlViewWalker
+# Last rows sent per process, to answer later snapshots with a delta
+$snapshots = @{}
+
+# Rows are (id, parent, pos, title, control_type, enabled), see lib/ui_tree.py.
+# RuntimeId is stable for the lifetime of an element.
+function Get-Rows($element, $parentId, $pos, $rows) {
+    try {
+        $id = ($element.GetRuntimeId() -join ".")
+        $current = $element.Current
+        $rows.Add(@($id, $parentId, $pos, $current.Name, $current.ControlType.ProgrammaticName, $current.IsEnabled))
+        $index = 0
+        $child = $walker.GetFirstChild($element)
+        while ($child) {
+            Get-Rows $child $id $index $rows
+            $index++
+            $child = $walker.GetNextSibling($child)
+        }
+    } catch {
+        # Elements can vanish while the tree is walked
+    }
+}
+
+function Invoke-Launch($request) {
+    $proc = Start-Process -FilePath $request.path -PassThru
+    $processes[$proc.Id] = $proc
+    # Poll for the main window instead of sleeping a fixed time
+    $deadline = (Get-Date).AddSeconds($(if ($request.wait) { $request.wait } else { 10 }))
+    while ((Get-Date) -lt $deadline) {
+        $proc.Refresh()
+        if ($proc.HasExited -or $proc.MainWindowHandle -ne [IntPtr]::Zero) { break }
+        Start-Sleep -Milliseconds 100
+    }
+    return @{ pid = $proc.Id; window = ($proc.MainWindowHandle -ne [IntPtr]::Zero) }
+}
+
+function Invoke-Snapshot($request) {
+    $rows = New-Object System.Collections.Generic.List[object]
+    Get-Rows (Get-Root $request.pid) $null 0 $rows
+    $current = [ordered]@{}
+    foreach ($row in $rows) { $current[$row[0]] = $row }
+
+    $key = [int]$request.pid
+    $previous = $snapshots[$key]
+    $base = if ($previous) { $previous.version } else { 0 }
+    $snapshots[$key] = @{ version = $base + 1; rows = $current }
+    if (-not $previous -or $request.since -ne $base) {
+        return @{ version = $base + 1; full = $true; nodes = $rows.ToArray() }
+    }
+
+    # Only what changed since the version the client holds
+    $sep = [string][char]1
+    $added = New-Object System.Collections.Generic.List[object]
+    $changed = New-Object System.Collections.Generic.List[object]
+    foreach ($id in $current.Keys) {
+        $row = $current[$id]
+        if (-not $previous.rows.Contains($id)) { $added.Add($row) }
+        elseif (($previous.rows[$id] -join $sep) -ne ($row -join $sep)) { $changed.Add($row) }
+    }
+    $removed = @($previous.rows.Keys | Where-Object { -not $current.Contains($_) })
+    return @{ version = $base + 1; base = $base; added = $added.ToArray(); changed = $changed.ToArray(); removed = $removed }
+}
+
+function Invoke-Element($element) {
+    $pattern = $null
+    if ($element.TryGetCurrentPattern([System.Windows.Automation.InvokePattern]::Pattern, [ref]$pattern)) {
+        $pattern.Invoke()
+    } elseif ($element.TryGetCurrentPattern([System.Windows.Automation.TogglePattern]::Pattern, [ref]$pattern)) {
+        $pattern.Toggle()
+    } elseif ($element.TryGetCurrentPattern([System.Windows.Automation.SelectionItemPattern]::Pattern, [ref]$pattern)) {
+        $pattern.Select()
+    } else {
+        throw "'$($element.Current.Name)' cannot be clicked"
+    }
+}
+
+function Invoke-Click($request) {
+    $root = Get-Root $request.pid
+    $cond = New-Object System.Windows.Automation.PropertyCondition([System.Windows.Automation.AutomationElement]::NameProperty, $request.title)
+    # "Next" the button and "Next" the link text are different elements;
+    # control_type may be "ControlType.Button" or just "Button"
+    $wanted = if ($request.control_type) { ([string]$request.control_type).Split(".")[-1] } else { $null }
+    $element = $null
+    foreach ($candidate in $root.FindAll([System.Windows.Automation.TreeScope]::Descendants, $cond)) {
+        $current = $candidate.Current
+        if ($wanted -and $current.ControlType.ProgrammaticName.Split(".")[-1] -ne $wanted) { continue }
+        if ($current.IsEnabled -and -not $current.IsOffscreen) { $element = $candidate; break }
+        if (-not $element) { $element = $candidate }
+    }
+    if (-not $element) { throw "No $(if ($wanted) { $wanted } else { 'element' }) named '$($request.title)'" }
+    Invoke-Element $element
+    return @{ clicked = $request.title }
+}
+
+while ($true) {
+    $line = [Console]::In.ReadLine()
+    if ($null -eq $line) { break }
+    if ($line.Trim() -eq "") { continue }
+    $id = $null
+    try {
+        $request = $line | ConvertFrom-Json
+        $id = $request.id
+        switch ($request.op) {
+            "ping" { Send-Response $id $true @{ pid = $PID } }
+            "launch" { Send-Response $id $true (Invoke-Launch $request) }
+            "snapshot" { Send-Response $id $true (Invoke-Snapshot $request) }
+            "click" { Send-Response $id $true (Invoke-Click $request) }
+            "shutdown" { Send-Response $id $true $null; exit 0 }
+            default { Send-Response $id $false "Unknown op '$($request.op)'" }
+        }
+    } catch {
+        Send-Response $id $false $_.Exception.Message
+    }
+}
@@ -0,0 +1,122 @@
+"""
+Stand-in for ui_worker.ps1 on machines without Windows UI Automation.
+
+Speaks the same line-delimited JSON protocol. Launched "installers" are a
+scripted four-page wizard whose buttons can be clicked, so sessions, pooling
+and GuiAutomator can be exercised on any OS.
+"""
+import itertools
+import json
+import os
+import sys
+import time
+
+WIZARD_PAGES = [
+    ("Welcome", ["Next", "Cancel"]),
+    ("License Agreement", ["I Agree", "Back", "Cancel"]),
+    ("Ready to Install", ["Install", "Back", "Cancel"]),
+    ("Completed", ["Finish"]),
+]
+
+_pids = itertools.count(10000)
+_apps = {}
+
+
+def _rows(app):
+    """
+    The current window as rows of (id, parent, pos, title, control_type, enabled).
+    Filler controls (`controls` at launch) keep their ids across pages.
+    """
+    page = app["page"]
+    title, buttons = WIZARD_PAGES[page]
+    rows = [
+        ["w", None, 0, f"{app['name']} Setup", "ControlType.Window", True],
+        [f"p{page}", "w", 0, title, "ControlType.Text", True],
+    ]
+    rows += [[f"p{page}.{b}", "w", 1 + i, b, "ControlType.Button", True] for i, b in enumerate(buttons)]
+    if app["controls"]:
+        rows.append(["list", "w", 1 + len(buttons), "Components", "ControlType.Tree", True])
+        rows += [[f"item{i}", "list", i, f"Component {i}", "ControlType.TreeItem", page < 2]
+                 for i in range(app["controls"])]
+    return {row[0]: row for row in rows}
+
+
+def _snapshot(app, since):
+    """
+    Full tree on first call or when the client's version is not the last one
+    sent; otherwise only added, changed and removed rows (see lib/ui_tree.py).
+    """
+    current = _rows(app)
+    previous = app["sent"]
+    base = app["version"]
+    app["version"] += 1
+    app["sent"] = current
+    if previous is None or since != base:
+        return {"version": app["version"], "full": True, "nodes": list(current.values())}
+    return {
+        "version": app["version"],
+        "base": base,
+        "added": [row for key, row in current.items() if key not in previous],
+        "changed": [row for key, row in current.items() if key in previous and previous[key] != row],
+        "removed": [key for key in previous if key not in current],
+    }
+
+
+def _app(request):
+    app = _apps.get(request.get("pid"))
+    if app is None or app["exited"]:
+        raise ValueError(f"Process {request.get('pid')} has no window")
+    return app
+
+
+def handle(request):
+    op = request.get("op")
+    if op == "ping":
+        time.sleep(request.get("delay", 0))
+        return {"pid": os.getpid()}
+    if op == "launch":
+        pid = next(_pids)
+        name = os.path.splitext(os.path.basename(request.get("path", "app")))[0]
+        _apps[pid] = {"name": name, "page": 0, "exited": False, "controls": request.get("controls", 0),
+                      "version": 0, "sent": None}
+        return {"pid": pid, "window": True}
+    if op == "snapshot":
+        return _snapshot(_app(request), request.get("since"))
+    if op == "click":
+        app = _app(request)
+        title = request.get("title")
+        _, buttons = WIZARD_PAGES[app["page"]]
+        wanted = (request.get("control_type") or "Button").rsplit(".", 1)[-1]
+        if title not in buttons or wanted != "Button":
+            raise ValueError(f"No {wanted if request.get('control_type') else 'element'} named '{title}'")
+        if title == "Back":
+            app["page"] = max(0, app["page"] - 1)
+        elif title in ("Cancel", "Finish"):
+            app["exited"] = True
+        else:
+            app["page"] += 1
+        return {"clicked": title}
+    if op == "shutdown":
+        return None
+    raise ValueError(f"Unknown op '{op}'")
+
+
+def main():
+    for line in sys.stdin:
+        if not line.strip():
+            continue
+        request, request_id = {}, None
+        try:
+            request = json.loads(line)
+            request_id = request.get("id")
+            response = {"id": request_id, "ok": True, "result": handle(request)}
+        except Exception as e:
+            response = {"id": request_id, "ok": False, "error": str(e)}
+        sys.stdout.write(json.dumps(response) + "\n")
+        sys.stdout.flush()
+        if request.get("op") == "shutdown":
+            break
+
+
+if __name__ == "__main__":
+    main()
@@ -1,40 +1,286 @@
-
+import asyncio
+import codecs
+import locale
+import os
+import re
+import signal
 import subprocess
 import sys
-import os
+import threading
+import time
+from collections import deque
+
+if not __package__:
+    # Run as `python lib/verifier.py`: make the `lib` package importable
+    sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from lib.profiling import count, span
+
+VERIFY_TIMEOUT = 600
+
+# Lines that settle the outcome before the script exits
+FAILURE_SIGNATURES = (
+    r"^FAIL:",
+    r"^VERIFICATION FAILED",
+    r"Installation (?:failed|aborted)",
+)
+SUCCESS_SIGNATURES = (
+    r"^PASS:",
+    r"^VERIFICATION PASSED",
+)
+# After a signature matches, how long the script may keep running (and
+# printing context for the healer) before its process tree is killed
+SETTLE_TIME = 1.0
+
+# Output kept per stream: the last RING_LINES lines, each cut to MAX_LINE_LENGTH
+RING_LINES = 200
+MAX_LINE_LENGTH = 4096
+READ_CHUNK = 65536
 
-def verify_script(script_path):
+
+class OutputRing:
     """
-    Runs the generated script in a subprocess to verify it works.
-    In a real scenario, this would run inside a Sandbox.
+    The last `max_lines` lines of a stream, read incrementally. Overlong
+    lines are truncated, so memory stays bounded however chatty the script.
+    """
+    def __init__(self, max_lines=RING_LINES, max_line_length=MAX_LINE_LENGTH):
+        self.lines = deque(maxlen=max_lines)
+        self.max_line_length = max_line_length
+        self.partial = ""
+        self.total_lines = 0
+        # Multi-byte characters may straddle reads
+        self.decoder = codecs.getincrementaldecoder(locale.getpreferredencoding(False))(errors="replace")
+
+    def feed(self, data):
+        """
+        Adds raw output; returns the lines it completed.
+        """
+        parts = (self.partial + self.decoder.decode(data)).split("\n")
+        self.partial = parts.pop()[:self.max_line_length]
+        completed = [line.rstrip("\r")[:self.max_line_length] for line in parts]
+        self.lines.extend(completed)
+        self.total_lines += len(completed)
+        return completed
+
+    def flush(self):
+        self.partial += self.decoder.decode(b"", final=True)
+        if not self.partial:
+            return []
+        return self.feed(b"\n")
+
+    @property
+    def dropped(self):
+        return self.total_lines - len(self.lines)
+
+    def text(self):
+        body = "\n".join(self.lines)
+        if self.dropped:
+            body = f"[... {self.dropped} earlier lines dropped ...]\n{body}"
+        return body
+
+
+def kill_process_tree(pid):
+    """
+    Kills a process and everything it started. On POSIX the verifier runs
+    scripts in their own process group.
     """
-    if not os.path.exists(script_path):
-        return False, "Script file not found"
-        
-    print(f"Verifying script: {script_path}")
     try:
-        # We run it with python
-        result = subprocess.run([sys.executable, script_path], capture_output=True, text=True, timeout=600)
-        
-        if result.returncode == 0:
-            return True, result.stdout
+        if os.name == "nt":
+            subprocess.run(["taskkill", "/T", "/F", "/PID", str(pid)], capture_output=True)
         else:
-            return False, f"Output: {result.stdout}\nError: {result.stderr}"
-            
-    except Exception as e:
-        return False, str(e)
+            os.killpg(pid, signal.SIGKILL)
+    except (OSError, subprocess.SubprocessError):
+        pass
 
-if __name__ == "__main__":
-    if len(sys.argv) < 2:
-        print("Usage: python verifier.py <generated_script_path>")
-        sys.exit(1)
-        
-    success, output = verify_script(sys.argv[1])
+
+def match_verdict(lines, failure_signatures, success_signatures):
+    """
+    (False|True, line) for the first line matching a failure or success
+    signature (compiled patterns), else None.
+    """
+    for line in lines:
+        for verdict, signatures in ((False, failure_signatures), (True, success_signatures)):
+            if any(p.search(line) for p in signatures):
+                return verdict, line
+    return None
+
+
+def verdict_result(verdict, killed, returncode, stdout, stderr):
+    """
+    (success, output) of a finished run. A signature decides unless the
+    script then exited by itself, in which case its exit code does; a
+    failure signature always fails.
+    """
+    if verdict and (not verdict[0] or killed):
+        success = verdict[0]
+    else:
+        success = returncode == 0
     if success:
-        print("VERIFICATION PASSED")
-        print(output)
-        sys.exit(0)
+        return True, stdout.text()
     else:
-        print("VERIFICATION FAILED")
-        print(output)
-        sys.exit(1)
+        return False, f"Output: {stdout.text()}\nError: {stderr.text()}"
+
+
+class Verification:
+    """
+    One run of a generated script. Output is streamed and matched against
+    failure/success signatures line by line, so the outcome is known as
+    soon as the script announces it. Another thread may cancel the run,
+    killing the process tree. Used by SelfHealer to race patched variants.
+    """
+    def __init__(self, script_path, timeout=VERIFY_TIMEOUT, failure_signatures=FAILURE_SIGNATURES,
+                 success_signatures=SUCCESS_SIGNATURES, settle_time=SETTLE_TIME, max_lines=RING_LINES):
+        self.script_path = script_path
+        self.timeout = timeout
+        self.failure_signatures = [re.compile(p) for p in failure_signatures]
+        self.success_signatures = [re.compile(p) for p in success_signatures]
+        self.settle_time = settle_time
+        self.stdout = OutputRing(max_lines)
+        self.stderr = OutputRing(max_lines)
+        self.process = None
+        self.cancelled = False
+        # (True/False, matched line) once a signature settles the outcome
+        self.verdict = None
+        self.timed_out = False
+        self._decided = None
+        self._lock = threading.Lock()
+
+    def run(self):
+        """
+        Returns (success, output) like verify_script.
+        """
+        if not os.path.exists(self.script_path):
+            return False, "Script file not found"
+
+        print(f"Verifying script: {self.script_path}")
+        started = time.perf_counter()
+        with span("verify", script=os.path.basename(self.script_path)) as s:
+            try:
+                success, output = asyncio.run(self._run())
+            except Exception as e:
+                success, output = False, str(e)
+            s.set(success=success, timed_out=self.timed_out)
+        count("verify.runs")
+        count("subprocess.wall_s", time.perf_counter() - started)
+        return success, output
+
+    async def _run(self):
+        self._decided = asyncio.Event()
+        with self._lock:
+            if self.cancelled:
+                return False, "Verification cancelled"
+            # We run it with python, in its own process group so the whole
+            # tree can be killed
+            self.process = await asyncio.create_subprocess_exec(
+                sys.executable, self.script_path, stdout=subprocess.PIPE, stderr=subprocess.PIPE,
+                **({"creationflags": subprocess.CREATE_NEW_PROCESS_GROUP} if os.name == "nt"
+                   else {"start_new_session": True}))
+
+        readers = asyncio.gather(self._pump(self.process.stdout, self.stdout),
+                                 self._pump(self.process.stderr, self.stderr))
+        exited = asyncio.ensure_future(self.process.wait())
+        decided = asyncio.ensure_future(self._decided.wait())
+        timed_out = killed = False
+        try:
+            done, _ = await asyncio.wait({exited, decided}, timeout=self.timeout,
+                                         return_when=asyncio.FIRST_COMPLETED)
+            if not done:
+                timed_out = self.timed_out = True
+            elif exited not in done:
+                # Outcome known; give the script a moment to finish on its own
+                await asyncio.wait({exited}, timeout=self.settle_time)
+        finally:
+            decided.cancel()
+            if not exited.done():
+                killed = True
+                kill_process_tree(self.process.pid)
+            await exited
+            # Orphaned grandchildren may still hold the pipes open
+            try:
+                await asyncio.wait_for(readers, self.settle_time)
+            except asyncio.TimeoutError:
+                pass
+
+        if self.cancelled:
+            return False, "Verification cancelled"
+        if timed_out:
+            return False, (f"Command '{self.script_path}' timed out after {self.timeout} seconds\n"
+                           f"Output: {self.stdout.text()}\nError: {self.stderr.text()}")
+        return verdict_result(self.verdict, killed, self.process.returncode, self.stdout, self.stderr)
+
+    async def _pump(self, stream, ring):
+        while True:
+            chunk = await stream.read(READ_CHUNK)
+            lines = ring.feed(chunk) if chunk else ring.flush()
+            if self.verdict is None:
+                self.verdict = match_verdict(lines, self.failure_signatures, self.success_signatures)
+                if self.verdict:
+                    self._decided.set()
+            if not chunk:
+                return
+
+    def cancel(self):
+        with self._lock:
+            self.cancelled = True
+            if self.process is not None and self.process.returncode is None:
+                kill_process_tree(self.process.pid)
+
+
+def verify_script(script_path, timeout=VERIFY_TIMEOUT, **options):
+    """
+    Runs the generated script in a subprocess to verify it works.
+    In a real scenario, this would run inside a Sandbox.
+    `options` are passed to Verification (signatures, settle_time, max_lines).
+    """
+    return Verification(script_path, timeout, **options).run()
+
+def main(argv):
+    """
+    python -m lib.verifier <script.py>          (or python lib/verifier.py <script.py>)
+    python -m lib.verifier --workers N [--timeout S] [--output results.jsonl] <script.py>...
+
+    With several scripts or --workers, verifies them on a pre-started
+    worker pool (lib/verify_pool.py) and writes one JSON result per line.
+    """
+    import json
+
+    options, paths = {}, []
+    args = iter(argv)
+    for arg in args:
+        if arg in ("--workers", "--timeout", "--output"):
+            options[arg] = next(args, None)
+        else:
+            paths.append(arg)
+    if not paths:
+        print("Usage: python -m lib.verifier [--workers N] [--timeout S] [--output FILE] <script.py>...")
+        return 1
+
+    if len(paths) == 1 and "--workers" not in options:
+        success, output = verify_script(paths[0], float(options.get("--timeout") or VERIFY_TIMEOUT))
+        if success:
+            print("VERIFICATION PASSED")
+            print(output)
+            return 0
+        else:
+            print("VERIFICATION FAILED")
+            print(output)
+            return 1
+
+    from lib.verify_pool import verify_scripts
+    output_path = options.get("--output") or "-"
+    results, summary = verify_scripts(
+        paths, workers=int(options["--workers"]) if options.get("--workers") else None,
+        timeout=float(options.get("--timeout") or VERIFY_TIMEOUT))
+    out = sys.stdout if output_path == "-" else open(output_path, "w")
+    try:
+        for result in results:
+            out.write(json.dumps(result) + "\n")
+    finally:
+        if out is not sys.stdout:
+            out.close()
+    # Keep stdout clean when it carries the JSONL stream
+    print(f"Verification complete: {json.dumps(summary)}", file=sys.stderr if output_path == "-" else sys.stdout)
+    return 0 if summary["failed"] == 0 and summary["crashed"] == 0 else 1
+
+if __name__ == "__main__":
+    sys.exit(main(sys.argv[1:]))
@@ -0,0 +1,143 @@
+import logging
+import os
+import queue
+import sys
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor, FIRST_COMPLETED, wait
+from lib.profiling import count, span
+from lib.ps_session import SessionError, WorkerSession
+from lib.verifier import VERIFY_TIMEOUT
+
+WORKER_SCRIPT = os.path.join(os.path.dirname(__file__), "verify_worker.py")
+
+# Workers are replaced after this many scripts, in case a script leaks
+# state into the worker (environment, open handles)
+DEFAULT_MAX_RUNS = 50
+# Extra time a worker gets to report on a script that hit its own timeout
+WORKER_GRACE = 15.0
+IN_FLIGHT_PER_WORKER = 2
+
+
+class VerifyPool:
+    """
+    Batch verification of generated scripts on pre-started workers
+    (lib/verify_worker.py). Each worker forks a child per script (POSIX),
+    so scripts skip interpreter startup but stay isolated from each other.
+    Workers are recycled after `max_runs` scripts or when they crash.
+    """
+    def __init__(self, workers=None, max_runs=DEFAULT_MAX_RUNS, timeout=VERIFY_TIMEOUT, **options):
+        self.workers = workers or os.cpu_count() or 1
+        self.max_runs = max_runs
+        self.timeout = timeout
+        # Passed through to the worker: settle_time, max_lines, *_signatures
+        self.options = options
+        self.counters = {"runs": 0, "passed": 0, "failed": 0, "crashed": 0, "recycled": 0}
+        self._lock = threading.Lock()
+        self._idle = queue.Queue()
+        # Start every worker up front, in parallel. If any fails to start, the
+        # ones that did are shut down before the error is raised.
+        with ThreadPoolExecutor(self.workers) as executor:
+            futures = [executor.submit(self._spawn) for _ in range(self.workers)]
+        errors = [future.exception() for future in futures if future.exception() is not None]
+        for future in futures:
+            if future.exception() is None:
+                self._idle.put((future.result(), 0))
+        if errors:
+            self.close()
+            raise errors[0]
+
+    def _spawn(self):
+        session = WorkerSession([sys.executable, "-u", WORKER_SCRIPT], request_timeout=self.timeout + WORKER_GRACE,
+                                name="Verify worker")
+        session.start()
+        return session
+
+    def verify(self, script_path, timeout=None):
+        """
+        Runs one script on the next free worker. Returns a result dict:
+        script, success, output, returncode, timed_out, verdict (the line
+        that settled the outcome), elapsed_s and error if the worker failed.
+        """
+        timeout = timeout or self.timeout
+        script_path = os.path.abspath(script_path)
+        with span("verify_pool.wait_worker"):
+            session, runs = self._idle.get()
+        crashed = False
+        try:
+            with span("verify_pool.verify", script=os.path.basename(script_path)):
+                result = session.request("run", timeout=timeout + WORKER_GRACE, path=script_path, cwd=os.getcwd(),
+                                         script_timeout=timeout, **self.options)
+            count("subprocess.wall_s", result.get("elapsed_s") or 0)
+        except SessionError as e:
+            crashed = True
+            result = {"success": False, "output": str(e), "returncode": None, "timed_out": False,
+                      "verdict": None, "elapsed_s": None, "error": str(e)}
+        finally:
+            runs += 1
+            if crashed or runs >= self.max_runs:
+                session, runs = self._recycle(session, crashed), 0
+            self._idle.put((session, runs))
+
+        with self._lock:
+            self.counters["runs"] += 1
+            self.counters["crashed" if crashed else "passed" if result["success"] else "failed"] += 1
+        return {"script": script_path, **result}
+
+    def _recycle(self, session, crashed):
+        with self._lock:
+            self.counters["recycled"] += 1
+        session.close()
+        try:
+            return self._spawn()
+        except SessionError as e:
+            # The next request on this session retries the start
+            logging.error(f"Failed to restart verify worker: {e}")
+            return WorkerSession(session.command, request_timeout=session.request_timeout, name=session.name)
+
+    def verify_many(self, script_paths, timeout=None):
+        """
+        Yields one result per script as they finish, keeping every worker
+        busy without queueing the whole list up front.
+        """
+        with ThreadPoolExecutor(self.workers) as executor:
+            paths = iter(script_paths)
+            pending = set()
+            max_in_flight = self.workers * IN_FLIGHT_PER_WORKER
+            while True:
+                for path in paths:
+                    pending.add(executor.submit(self.verify, path, timeout))
+                    if len(pending) >= max_in_flight:
+                        break
+                if not pending:
+                    return
+                done, pending = wait(pending, return_when=FIRST_COMPLETED)
+                for future in done:
+                    yield future.result()
+
+    def close(self):
+        while True:
+            try:
+                session, _ = self._idle.get_nowait()
+            except queue.Empty:
+                break
+            session.close()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
+
+
+def verify_scripts(script_paths, workers=None, timeout=VERIFY_TIMEOUT, **options):
+    """
+    Verifies many scripts on a temporary pool. Returns (results, summary).
+    """
+    start = time.perf_counter()
+    with VerifyPool(workers, timeout=timeout, **options) as pool:
+        results = list(pool.verify_many(script_paths))
+        summary = dict(pool.counters)
+    summary["elapsed_s"] = round(time.perf_counter() - start, 4)
+    summary["scripts_per_s"] = round(len(results) / summary["elapsed_s"], 2) if summary["elapsed_s"] else 0.0
+    return results, summary
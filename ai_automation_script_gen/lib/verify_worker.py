@@ -0,0 +1,206 @@
+"""
+Pre-started verification worker for lib/verify_pool.py.
+
+Speaks the line-delimited JSON protocol of lib/ps_session.py. The modules
+generated scripts use are imported once at startup. On POSIX each script
+then runs in a forked child in its own session, so it starts in
+milliseconds, shares nothing with other scripts and can be killed as a
+process tree. Without fork, scripts run through the cold verifier.
+"""
+import atexit
+import json
+import os
+import re
+import runpy
+import selectors
+import signal
+import sys
+import threading
+import time
+import traceback
+
+_base_path = sys.path[1:]
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+# Warm imports shared by every forked script
+import logging
+import subprocess
+from lib.verifier import (FAILURE_SIGNATURES, SUCCESS_SIGNATURES, SETTLE_TIME, RING_LINES, READ_CHUNK,
+                          VERIFY_TIMEOUT, OutputRing, Verification, match_verdict, verdict_result)
+
+CAN_FORK = hasattr(os, "fork")
+POLL_INTERVAL = 0.05
+
+
+def _exec_child(path, cwd, out_w, err_w):
+    """
+    Runs `path` as __main__ in the forked child, as `python path` would.
+    Never returns.
+    """
+    code = 1
+    try:
+        os.setsid()
+        devnull = os.open(os.devnull, os.O_RDONLY)
+        os.dup2(devnull, 0)
+        os.dup2(out_w, 1)
+        os.dup2(err_w, 2)
+        for fd in (devnull, out_w, err_w):
+            os.close(fd)
+        # The inherited stdin may hold buffered protocol lines
+        sys.stdin = open(os.devnull)
+        sys.stdout = open(1, "w", buffering=1, closefd=False)
+        sys.stderr = open(2, "w", buffering=1, closefd=False)
+        signal.signal(signal.SIGINT, signal.default_int_handler)
+        if cwd:
+            os.chdir(cwd)
+        sys.argv = [path]
+        sys.path[:] = [os.path.dirname(os.path.abspath(path))] + _base_path
+        try:
+            runpy.run_path(path, run_name="__main__")
+            code = 0
+        except SystemExit as e:
+            if e.code is None or isinstance(e.code, int):
+                code = e.code or 0
+            else:
+                print(e.code, file=sys.stderr)
+                code = 1
+        except BaseException:
+            traceback.print_exc()
+        # Interpreter shutdown: wait for threads, run exit handlers
+        for thread in threading.enumerate():
+            if thread is not threading.main_thread() and not thread.daemon:
+                thread.join()
+        atexit._run_exitfuncs()
+        sys.stdout.flush()
+        sys.stderr.flush()
+    finally:
+        os._exit(code)
+
+
+def run_forked(path, cwd, timeout, settle_time, max_lines, failure_signatures, success_signatures):
+    out_r, out_w = os.pipe()
+    err_r, err_w = os.pipe()
+    pid = os.fork()
+    if pid == 0:
+        os.close(out_r)
+        os.close(err_r)
+        _exec_child(path, cwd, out_w, err_w)
+    os.close(out_w)
+    os.close(err_w)
+
+    rings = {out_r: OutputRing(max_lines), err_r: OutputRing(max_lines)}
+    selector = selectors.DefaultSelector()
+    for fd in rings:
+        selector.register(fd, selectors.EVENT_READ)
+
+    start = time.monotonic()
+    deadline = start + timeout
+    settle_deadline = None
+    verdict = status = None
+    timed_out = killed = False
+    while True:
+        now = time.monotonic()
+        if status is None:
+            waited, waited_status = os.waitpid(pid, os.WNOHANG)
+            if waited:
+                status = waited_status
+                # Orphaned grandchildren may still hold the pipes open
+                settle_deadline = now + settle_time
+        if status is not None and (not selector.get_map() or now >= settle_deadline):
+            break
+        if status is None and (now >= deadline or (settle_deadline is not None and now >= settle_deadline)):
+            timed_out = now >= deadline and verdict is None
+            killed = True
+            break
+        for key, _ in selector.select(POLL_INTERVAL):
+            data = os.read(key.fd, READ_CHUNK)
+            ring = rings[key.fd]
+            if data:
+                lines = ring.feed(data)
+            else:
+                lines = ring.flush()
+                selector.unregister(key.fd)
+            if verdict is None:
+                verdict = match_verdict(lines, failure_signatures, success_signatures)
+                if verdict and settle_deadline is None:
+                    # Outcome known; give the script a moment to finish on its own
+                    settle_deadline = time.monotonic() + settle_time
+
+    if killed or selector.get_map():
+        try:
+            os.killpg(pid, signal.SIGKILL)
+        except OSError:
+            pass
+    if status is None:
+        _, status = os.waitpid(pid, 0)
+    for fd in list(selector.get_map()):
+        rings[fd].flush()
+        selector.unregister(fd)
+    selector.close()
+    for fd in rings:
+        os.close(fd)
+
+    returncode = os.waitstatus_to_exitcode(status)
+    stdout, stderr = rings[out_r], rings[err_r]
+    if timed_out:
+        success, output = False, (f"Command '{path}' timed out after {timeout} seconds\n"
+                                  f"Output: {stdout.text()}\nError: {stderr.text()}")
+    else:
+        success, output = verdict_result(verdict, killed, returncode, stdout, stderr)
+    return {"success": success, "output": output, "returncode": returncode, "timed_out": timed_out,
+            "verdict": verdict[1] if verdict else None, "elapsed_s": round(time.monotonic() - start, 4)}
+
+
+def run_spawned(path, cwd, timeout, settle_time, max_lines, failure_signatures, success_signatures):
+    start = time.monotonic()
+    if cwd:
+        os.chdir(cwd)
+    verification = Verification(path, timeout, failure_signatures, success_signatures, settle_time, max_lines)
+    success, output = verification.run()
+    process = verification.process
+    return {"success": success, "output": output, "returncode": process.returncode if process else None,
+            "timed_out": verification.timed_out,
+            "verdict": verification.verdict[1] if verification.verdict else None,
+            "elapsed_s": round(time.monotonic() - start, 4)}
+
+
+def handle(request):
+    op = request.get("op")
+    if op == "ping":
+        return {"pid": os.getpid(), "fork": CAN_FORK}
+    if op == "run":
+        path = request["path"]
+        if not os.path.exists(path):
+            return {"success": False, "output": "Script file not found", "returncode": None,
+                    "timed_out": False, "verdict": None, "elapsed_s": 0.0}
+        runner = run_forked if CAN_FORK else run_spawned
+        return runner(
+            path, request.get("cwd"), request.get("script_timeout", VERIFY_TIMEOUT),
+            request.get("settle_time", SETTLE_TIME), request.get("max_lines", RING_LINES),
+            [re.compile(p) for p in request.get("failure_signatures", FAILURE_SIGNATURES)],
+            [re.compile(p) for p in request.get("success_signatures", SUCCESS_SIGNATURES)],
+        )
+    if op == "shutdown":
+        return None
+    raise ValueError(f"Unknown op '{op}'")
+
+
+def main():
+    for line in sys.stdin:
+        if not line.strip():
+            continue
+        request, request_id = {}, None
+        try:
+            request = json.loads(line)
+            request_id = request.get("id")
+            response = {"id": request_id, "ok": True, "result": handle(request)}
+        except Exception as e:
+            response = {"id": request_id, "ok": False, "error": str(e)}
+        sys.stdout.write(json.dumps(response) + "\n")
+        sys.stdout.flush()
+        if request.get("op") == "shutdown":
+            break
+
+
+if __name__ == "__main__":
+    main()
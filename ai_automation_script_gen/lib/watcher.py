@@ -0,0 +1,392 @@
+"""
+Watch mode: keeps the generated scripts in step with a setups folder.
+
+    python main.py --watch [setups] [--out-dir DIR] [--workers N] [--settle 2] [--poll 5]
+
+Changes come from inotify where libc has it (Linux) and from a periodic
+size/mtime scan elsewhere. A file is only picked up once it has stopped
+changing for `settle` seconds, so half-copied installers are not analyzed.
+Settled files whose size or mtime differ from the last run are hashed; only
+new content is analyzed and regenerated, on a process pool shared by the
+whole burst. Scripts of deleted installers are removed. What was generated
+from what is kept in `.watch_state.json` next to the scripts, so restarts
+only process what changed meanwhile.
+"""
+import ctypes
+import ctypes.util
+import json
+import logging
+import os
+import select
+import signal
+import struct
+import threading
+import time
+from concurrent.futures import ProcessPoolExecutor, as_completed
+from concurrent.futures.process import BrokenProcessPool
+from lib.batch import INSTALLER_EXTENSIONS, process_installer
+from lib.cache import file_digest, open_cache
+from lib.introspect import DEFAULT_SCAN_WINDOW
+from lib.profiling import count, span
+
+DEFAULT_SETTLE = 2.0
+DEFAULT_POLL_INTERVAL = 5.0
+STATE_FILE = ".watch_state.json"
+
+# <sys/inotify.h>
+IN_MODIFY = 0x00000002
+IN_ATTRIB = 0x00000004
+IN_CLOSE_WRITE = 0x00000008
+IN_MOVED_FROM = 0x00000040
+IN_MOVED_TO = 0x00000080
+IN_CREATE = 0x00000100
+IN_DELETE = 0x00000200
+IN_DELETE_SELF = 0x00000400
+IN_MOVE_SELF = 0x00000800
+IN_Q_OVERFLOW = 0x00004000
+IN_IGNORED = 0x00008000
+IN_NONBLOCK = 0o4000
+IN_CLOEXEC = 0o2000000
+WATCH_MASK = (IN_MODIFY | IN_ATTRIB | IN_CLOSE_WRITE | IN_MOVED_FROM | IN_MOVED_TO | IN_CREATE | IN_DELETE
+              | IN_DELETE_SELF | IN_MOVE_SELF)
+EVENT_HEADER = struct.Struct("iIII")
+READ_SIZE = 64 * 1024
+
+
+def is_installer(name):
+    return name.lower().endswith(INSTALLER_EXTENSIONS)
+
+
+def scan_installers(setups_dir):
+    """
+    {path: (size, mtime_ns)} for every installer directly in `setups_dir`.
+    """
+    found = {}
+    with os.scandir(setups_dir) as entries:
+        for entry in entries:
+            if is_installer(entry.name):
+                try:
+                    if entry.is_file():
+                        st = entry.stat()
+                        found[entry.path] = (st.st_size, st.st_mtime_ns)
+                except OSError:
+                    pass
+    return found
+
+
+def process_change(file_path, output_dir, known_digest=None, scan_window=DEFAULT_SCAN_WINDOW, cache_path=None):
+    """
+    Runs inside a pool worker. Files whose content hash is still
+    `known_digest` (touched or copied over with the same bytes) are not
+    analyzed again.
+    """
+    try:
+        # Through the analysis cache the digest is recorded, so analyze() won't hash again
+        digest = open_cache(cache_path).content_hash(file_path) if cache_path else file_digest(file_path)
+    except OSError as e:
+        return {"installer": file_path, "status": "error", "error": f"{type(e).__name__}: {e}", "elapsed_s": 0.0}
+    if known_digest and digest == known_digest:
+        return {"installer": file_path, "status": "unchanged", "digest": digest, "elapsed_s": 0.0}
+    record = process_installer(file_path, output_dir, scan_window, cache_path)
+    record["digest"] = digest
+    return record
+
+
+class InotifySource:
+    """
+    Directory events from the kernel. `fileno()` becomes readable when
+    something happened; read() returns the names touched, or None when the
+    queue overflowed and the caller has to rescan.
+    """
+    def __init__(self, directory):
+        libc_name = ctypes.util.find_library("c")
+        libc = ctypes.CDLL(libc_name, use_errno=True)
+        if not hasattr(libc, "inotify_init1"):
+            raise OSError("inotify is not available")
+        self.fd = libc.inotify_init1(IN_NONBLOCK | IN_CLOEXEC)
+        if self.fd < 0:
+            raise OSError(ctypes.get_errno(), "inotify_init1 failed")
+        if libc.inotify_add_watch(self.fd, os.fsencode(directory), WATCH_MASK) < 0:
+            errno = ctypes.get_errno()
+            os.close(self.fd)
+            raise OSError(errno, f"inotify_add_watch failed for {directory}")
+        self.closed = False
+
+    def fileno(self):
+        return self.fd
+
+    def read(self):
+        names = set()
+        while True:
+            try:
+                data = os.read(self.fd, READ_SIZE)
+            except BlockingIOError:
+                return names
+            offset = 0
+            while offset < len(data):
+                _, mask, _, length = EVENT_HEADER.unpack_from(data, offset)
+                offset += EVENT_HEADER.size
+                name = data[offset:offset + length].rstrip(b"\0")
+                offset += length
+                if mask & IN_Q_OVERFLOW:
+                    return None
+                if mask & (IN_DELETE_SELF | IN_MOVE_SELF | IN_IGNORED):
+                    self.closed = True
+                    continue
+                if name:
+                    names.add(os.fsdecode(name))
+
+    def close(self):
+        os.close(self.fd)
+
+
+class SetupsWatcher:
+    """
+    Watches `setups_dir` and regenerates scripts into `output_dir` until
+    stop() is called (from a signal handler or another thread).
+    `on_record(record)` sees every outcome: ok, error, unchanged, deleted.
+    """
+    def __init__(self, setups_dir, output_dir=None, workers=None, settle=DEFAULT_SETTLE,
+                 poll_interval=DEFAULT_POLL_INTERVAL, use_inotify=True, scan_window=DEFAULT_SCAN_WINDOW,
+                 cache_path=None, on_record=None):
+        self.setups_dir = os.path.abspath(setups_dir)
+        self.output_dir = os.path.abspath(output_dir or os.getcwd())
+        os.makedirs(self.output_dir, exist_ok=True)
+        self.workers = workers or os.cpu_count() or 1
+        self.settle = settle
+        self.poll_interval = poll_interval
+        self.scan_window = scan_window
+        self.cache_path = cache_path
+        self.on_record = on_record or (lambda record: None)
+        self.state_path = os.path.join(self.output_dir, STATE_FILE)
+        self.state = self._load_state()
+        self.counters = {"ok": 0, "errors": 0, "unchanged": 0, "deleted": 0}
+
+        self.source = None
+        if use_inotify:
+            try:
+                self.source = InotifySource(self.setups_dir)
+            except (OSError, AttributeError, TypeError) as e:
+                logging.info(f"inotify unavailable ({e}); polling every {poll_interval}s")
+        # Last directory scan; polling diffs against it
+        self.snapshot = {}
+        # path -> [(size, mtime_ns), deadline]
+        self.pending = {}
+        self._wake_r, self._wake_w = os.pipe()
+        self._stopping = False
+        self._executor = None
+
+    @property
+    def mode(self):
+        return "inotify" if self.source else "polling"
+
+    def _load_state(self):
+        try:
+            with open(self.state_path, "r", encoding="utf-8") as f:
+                return json.load(f)
+        except FileNotFoundError:
+            return {}
+        except (OSError, ValueError) as e:
+            logging.error(f"Ignoring unreadable watch state {self.state_path}: {e}")
+            return {}
+
+    def _save_state(self):
+        tmp = self.state_path + ".tmp"
+        with open(tmp, "w", encoding="utf-8") as f:
+            json.dump(self.state, f, indent=1, sort_keys=True)
+        os.replace(tmp, self.state_path)
+
+    def stop(self):
+        """
+        Safe from signal handlers and other threads: wakes the loop up.
+        """
+        self._stopping = True
+        os.write(self._wake_w, b"x")
+
+    def _note(self, path, stat, now):
+        """
+        Records a sighting of `path`; its settle clock restarts whenever it changes.
+        """
+        entry = self.pending.get(path)
+        if entry is None or entry[0] != stat:
+            self.pending[path] = [stat, now + self.settle]
+
+    def _changed(self, paths, now):
+        deleted = []
+        for path in paths:
+            try:
+                st = os.stat(path)
+            except FileNotFoundError:
+                self.pending.pop(path, None)
+                deleted.append(path)
+                continue
+            except OSError:
+                continue
+            self._note(path, (st.st_size, st.st_mtime_ns), now)
+        if deleted:
+            self._remove(deleted)
+
+    def _remove(self, paths):
+        removed = False
+        for path in paths:
+            entry = self.state.pop(path, None)
+            if entry is None:
+                continue
+            removed = True
+            script_path = entry.get("script_path")
+            if script_path:
+                try:
+                    os.remove(script_path)
+                except FileNotFoundError:
+                    pass
+                except OSError as e:
+                    logging.error(f"Could not remove {script_path}: {e}")
+            self.counters["deleted"] += 1
+            count("watch.deleted")
+            self.on_record({"installer": path, "status": "deleted", "script_path": script_path})
+        if removed:
+            self._save_state()
+
+    def _due(self, now):
+        """
+        Pops the pending files that have been quiet for `settle` seconds and
+        differ from what was last generated.
+        """
+        due = []
+        for path, (stat, deadline) in list(self.pending.items()):
+            if deadline > now:
+                continue
+            try:
+                st = os.stat(path)
+            except FileNotFoundError:
+                del self.pending[path]
+                self._remove([path])
+                continue
+            current = (st.st_size, st.st_mtime_ns)
+            if current != stat:
+                # Still being written
+                self.pending[path] = [current, now + self.settle]
+                continue
+            del self.pending[path]
+            known = self.state.get(path)
+            if known and (known["size"], known["mtime_ns"]) == current and os.path.exists(known["script_path"]):
+                continue
+            due.append((path, current))
+        return due
+
+    def _process(self, due):
+        with span("watch.batch", files=len(due)):
+            futures = {}
+            for path, stat in due:
+                known = self.state.get(path)
+                known_digest = known["digest"] if known and os.path.exists(known["script_path"]) else None
+                future = self._executor.submit(process_change, path, self.output_dir, known_digest,
+                                               self.scan_window, self.cache_path)
+                futures[future] = (path, stat)
+            broken = False
+            for future in as_completed(futures):
+                path, stat = futures[future]
+                try:
+                    record = future.result()
+                except BrokenProcessPool as e:
+                    broken = True
+                    record = {"installer": path, "status": "error", "error": f"worker crashed: {e}"}
+                self._record(path, stat, record)
+            if broken:
+                self._executor.shutdown(wait=False, cancel_futures=True)
+                self._executor = ProcessPoolExecutor(max_workers=self.workers)
+            self._save_state()
+
+    def _record(self, path, stat, record):
+        status = record["status"]
+        if status == "error":
+            # Left out of the state, so the next change or restart retries it
+            self.counters["errors"] += 1
+        else:
+            entry = self.state.get(path, {})
+            entry.update({"size": stat[0], "mtime_ns": stat[1], "digest": record["digest"]})
+            if status == "ok":
+                entry["script_path"] = record["script_path"]
+                entry["generated_at"] = time.time()
+            self.state[path] = entry
+            self.counters["ok" if status == "ok" else "unchanged"] += 1
+        count(f"watch.{status}")
+        self.on_record(record)
+
+    def _reconcile(self, now):
+        """
+        Startup: installers removed while we were not running lose their
+        scripts; everything else goes through the settle check.
+        """
+        self.snapshot = scan_installers(self.setups_dir)
+        self._remove([path for path in self.state if path not in self.snapshot])
+        for path, stat in self.snapshot.items():
+            self._note(path, stat, now)
+
+    def _poll(self):
+        current = scan_installers(self.setups_dir)
+        changed = [path for path, stat in current.items() if self.snapshot.get(path) != stat]
+        changed += [path for path in self.snapshot if path not in current]
+        self.snapshot = current
+        return changed
+
+    def run(self):
+        """
+        Blocks until stop(). Returns the counters.
+        """
+        self._executor = ProcessPoolExecutor(max_workers=self.workers)
+        try:
+            self._reconcile(time.monotonic())
+            while not self._stopping:
+                now = time.monotonic()
+                due = self._due(now)
+                if due:
+                    self._process(due)
+                    continue
+
+                # With nothing pending and inotify, sleep in select() until an event
+                timeout = None
+                if self.pending:
+                    timeout = max(0.0, min(deadline for _, deadline in self.pending.values()) - now)
+                if not self.source:
+                    timeout = self.poll_interval if timeout is None else min(timeout, self.poll_interval)
+                readable = [self._wake_r] + ([self.source] if self.source else [])
+                ready, _, _ = select.select(readable, [], [], timeout)
+                if self._wake_r in ready:
+                    break
+
+                now = time.monotonic()
+                if self.source:
+                    if self.source in ready:
+                        names = self.source.read()
+                        if self.source.closed:
+                            logging.error(f"Watched directory {self.setups_dir} went away")
+                            break
+                        if names is None:
+                            # Kernel queue overflowed: recheck everything
+                            current = scan_installers(self.setups_dir)
+                            self._changed(list(current) + [path for path in self.state if path not in current], now)
+                        else:
+                            self._changed([os.path.join(self.setups_dir, name) for name in names
+                                           if is_installer(name)], now)
+                else:
+                    self._changed(self._poll(), now)
+        finally:
+            self._executor.shutdown(wait=True, cancel_futures=True)
+            if self.source:
+                self.source.close()
+            os.close(self._wake_r)
+            os.close(self._wake_w)
+        return dict(self.counters)
+
+
+def watch(setups_dir, log=print, **options):
+    """
+    Runs a SetupsWatcher until SIGTERM or Ctrl+C and returns its counters.
+    """
+    watcher = SetupsWatcher(setups_dir, **options)
+    if threading.current_thread() is threading.main_thread():
+        signal.signal(signal.SIGTERM, lambda signum, frame: watcher.stop())
+        signal.signal(signal.SIGINT, lambda signum, frame: watcher.stop())
+    log(f"Watching {watcher.setups_dir} ({watcher.mode}, {watcher.workers} workers); scripts go to {watcher.output_dir}")
+    return watcher.run()
@@ -0,0 +1,222 @@
+"""
+Offline installer-wizard simulator with GuiAutomator's interface
+(launch, get_ui_hierarchy, perform_action, close), so the GUI decision loop
+(lib/agent_loop.py) can run and be benchmarked on any OS.
+
+A wizard is a list of screens:
+
+    {"name": "License",
+     "controls": [["I agree to the license terms", "CheckBox"], ["Next", "Button"], ["Cancel", "Button"]],
+     "requires": {"Next": ["I agree to the license terms"]},   # disabled until ticked
+     "next": {"Next": "Ready", "Cancel": "cancelled"},          # "installed"/"cancelled" close the window
+     "busy": [2.0, 5.0],                                        # optional: controls disabled this long...
+     "auto": "Completed"}                                       # ...then the wizard moves on by itself
+
+Each page change takes a random `delay` during which the new page's
+controls are still disabled, and may raise a modal pop-up that hides the
+wizard until it is dismissed. All durations are multiplied by `time_scale`.
+"""
+import itertools
+import json
+import random
+import threading
+import time
+
+TERMINAL = ("installed", "cancelled")
+
+DEFAULT_WIZARD = [
+    {"name": "Welcome",
+     "controls": [["Welcome to the Setup Wizard", "Text"], ["Next", "Button"], ["Cancel", "Button"]],
+     "next": {"Next": "License", "Cancel": "cancelled"}},
+    {"name": "License",
+     "controls": [["License Agreement", "Text"], ["I agree to the license terms", "CheckBox"],
+                  ["Back", "Button"], ["Next", "Button"], ["Cancel", "Button"]],
+     "requires": {"Next": ["I agree to the license terms"]},
+     "next": {"Back": "Welcome", "Next": "Options", "Cancel": "cancelled"}},
+    {"name": "Options",
+     "controls": [["Select components", "Text"], ["Desktop shortcut", "CheckBox"], ["Start menu entry", "CheckBox"],
+                  ["Back", "Button"], ["Next", "Button"], ["Cancel", "Button"]],
+     "next": {"Back": "License", "Next": "Ready", "Cancel": "cancelled"}},
+    {"name": "Ready",
+     "controls": [["Ready to Install", "Text"], ["Back", "Button"], ["Install", "Button"], ["Cancel", "Button"]],
+     "next": {"Back": "Options", "Install": "Installing", "Cancel": "cancelled"}},
+    {"name": "Installing",
+     "controls": [["Installing...", "Text"], ["ProgressBar", "ProgressBar"], ["Next", "Button"],
+                  ["Cancel", "Button"]],
+     "busy": [1.0, 3.0],
+     "auto": "Completed"},
+    {"name": "Completed",
+     "controls": [["Setup has finished installing", "Text"], ["Launch application", "CheckBox"],
+                  ["Finish", "Button"]],
+     "next": {"Finish": "installed"}},
+]
+
+# (message, dismiss button); the button must be one the decision heuristic knows
+DEFAULT_POPUPS = [
+    ("A newer version of the runtime is already installed.", "Close"),
+    ("Setup will create the installation folder.", "Close"),
+]
+
+_pids = itertools.count(20000)
+_pid_lock = threading.Lock()
+
+
+def load_wizard(path):
+    with open(path, "r", encoding="utf-8") as f:
+        return validate_wizard(json.load(f))
+
+
+def validate_wizard(wizard):
+    """
+    Raises ValueError for transitions to screens that do not exist.
+    """
+    names = {screen["name"] for screen in wizard}
+    for screen in wizard:
+        targets = list(screen.get("next", {}).values()) + ([screen["auto"]] if "auto" in screen else [])
+        for target in targets:
+            if target not in names and target not in TERMINAL:
+                raise ValueError(f"Screen '{screen['name']}' leads to unknown screen '{target}'")
+        titles = {title for title, _ in screen["controls"]}
+        for button, boxes in screen.get("requires", {}).items():
+            missing = [t for t in [button] + list(boxes) if t not in titles]
+            if missing:
+                raise ValueError(f"Screen '{screen['name']}' requires unknown controls {missing}")
+    return wizard
+
+
+class WizardSimulator:
+    """
+    One simulated installer run. Drop-in for GuiAutomator where only the
+    hierarchy and clicks matter; time is read from `clock`, nothing sleeps.
+    """
+    def __init__(self, exe_path="SimulatedSetup.exe", wizard=None, seed=None, delay=(0.05, 0.3),
+                 popup_rate=0.0, popups=None, time_scale=1.0, clock=time.monotonic):
+        self.exe_path = exe_path
+        self.wizard = validate_wizard(wizard or DEFAULT_WIZARD)
+        self.screens = {screen["name"]: screen for screen in self.wizard}
+        self.random = random.Random(seed)
+        self.delay = delay
+        self.popup_rate = popup_rate
+        self.popups = popups or DEFAULT_POPUPS
+        self.time_scale = time_scale
+        self.clock = clock
+        self.pid = None
+        self.screen = None
+        self.outcome = None
+        self.popup = None
+        self.toggles = {}
+        self.ready_at = self.busy_until = 0.0
+        self.visited = []
+        self.clicks = self.rejected_clicks = self.popups_shown = 0
+
+    @property
+    def installed(self):
+        return self.outcome == "installed"
+
+    def _duration(self, bounds):
+        low, high = bounds
+        return self.random.uniform(low, high) * self.time_scale
+
+    def _enter(self, name, now):
+        if name in TERMINAL:
+            self.outcome, self.screen, self.popup = name, None, None
+            return
+        screen = self.screens[name]
+        self.screen = name
+        self.visited.append(name)
+        self.toggles = {title: False for title, control_type in screen["controls"] if control_type == "CheckBox"}
+        self.ready_at = now + self._duration(self.delay)
+        self.busy_until = self.ready_at + self._duration(screen["busy"]) if "busy" in screen else 0.0
+        if self.popup_rate and self.random.random() < self.popup_rate:
+            self.popup = self.random.choice(self.popups)
+            self.popups_shown += 1
+
+    def _tick(self, now):
+        # Busy pages (progress) move on by themselves
+        screen = self.screens.get(self.screen)
+        if screen and "auto" in screen and self.busy_until and now >= self.busy_until:
+            self._enter(screen["auto"], now)
+
+    def _enabled(self, screen, title, now):
+        if now < self.ready_at or (self.busy_until and now < self.busy_until):
+            return False
+        return all(self.toggles.get(box) for box in screen.get("requires", {}).get(title, ()))
+
+    def launch(self, **options):
+        with _pid_lock:
+            self.pid = next(_pids)
+        self.outcome = None
+        self.visited = []
+        self._enter(self.wizard[0]["name"], self.clock())
+        return {"pid": self.pid, "window": True}
+
+    def get_ui_hierarchy(self):
+        """
+        The visible window as {id, parent, pos, title, control_type, enabled}
+        dicts (plus toggle_state for check boxes), like GuiAutomator's.
+        """
+        if self.pid is None:
+            self.launch()
+        now = self.clock()
+        self._tick(now)
+        if self.screen is None:
+            return []
+        if self.popup:
+            message, button = self.popup
+            return [
+                {"id": "popup", "parent": None, "pos": 0, "title": "Setup", "control_type": "ControlType.Window",
+                 "enabled": True},
+                {"id": "popup.0", "parent": "popup", "pos": 0, "title": message, "control_type": "ControlType.Text",
+                 "enabled": True},
+                {"id": "popup.1", "parent": "popup", "pos": 1, "title": button,
+                 "control_type": "ControlType.Button", "enabled": True},
+            ]
+        screen = self.screens[self.screen]
+        elements = [{"id": "w", "parent": None, "pos": 0, "title": f"{screen['name']} - Setup",
+                     "control_type": "ControlType.Window", "enabled": True}]
+        for pos, (title, control_type) in enumerate(screen["controls"]):
+            element = {"id": f"{self.screen}.{pos}", "parent": "w", "pos": pos, "title": title,
+                       "control_type": f"ControlType.{control_type}",
+                       "enabled": control_type == "Text" or self._enabled(screen, title, now)}
+            if control_type == "CheckBox":
+                element["toggle_state"] = "on" if self.toggles[title] else "off"
+            elements.append(element)
+        return elements
+
+    def perform_action(self, action_type, selector):
+        """
+        Clicks the named control. False if it is missing, disabled or hidden
+        behind a pop-up, as a real click would fail.
+        """
+        if action_type != "click" or self.screen is None:
+            return False
+        now = self.clock()
+        self._tick(now)
+        title = (selector.get("title") or "").strip()
+        if self.popup:
+            if title == self.popup[1]:
+                self.popup = None
+                self.clicks += 1
+                return True
+            self.rejected_clicks += 1
+            return False
+        screen = self.screens[self.screen]
+        control_type = next((ct for t, ct in screen["controls"] if t == title), None)
+        if control_type is None or control_type == "Text" or not self._enabled(screen, title, now):
+            self.rejected_clicks += 1
+            return False
+        self.clicks += 1
+        if control_type == "CheckBox":
+            self.toggles[title] = not self.toggles[title]
+        elif title in screen.get("next", {}):
+            self._enter(screen["next"][title], now)
+        return True
+
+    def close(self):
+        self.pid = None
+        self.screen = None
+        self.popup = None
+
+    def stats(self):
+        return {"outcome": self.outcome, "screens": len(self.visited), "clicks": self.clicks,
+                "rejected_clicks": self.rejected_clicks, "popups": self.popups_shown}
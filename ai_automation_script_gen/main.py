@@ -1,12 +1,15 @@
 import sys
 import json
 import os
-from lib.introspect import StaticAnalyzer
+import atexit
+# Only what the single-installer path needs; other modes import theirs when selected
+from lib.introspect import StaticAnalyzer, DEFAULT_SCAN_WINDOW
 from lib.generator import ScriptGenerator
-from lib.healer import SelfHealer
-from lib.llm_client import LLMClient
+from lib.cache import AnalysisCache, DEFAULT_CACHE_DIR, DEFAULT_CACHE_FILE
+from lib.telemetry import TelemetryStore, DEFAULT_TELEMETRY_FILE, format_report
+from lib import profiling
 
-def select_from_setups():
+def find_setups_dir():
     # Helper to find setups relative to this script or CWD
     candidates = [
         "setups",
@@ -18,7 +21,10 @@ def select_from_setups():
         if os.path.exists(c) and os.path.isdir(c):
             setups_dir = c
             break
-            
+    return setups_dir
+
+def select_from_setups():
+    setups_dir = find_setups_dir()
     if not setups_dir:
         print("No 'setups' folder found.")
         return None
@@ -45,10 +51,39 @@ def select_from_setups():
         except ValueError:
             print("Please enter a number.")
 
+def get_option(name, default=None):
+    """
+    Returns the value that follows `name` on the command line, or default.
+    """
+    if name in sys.argv:
+        idx = sys.argv.index(name)
+        if idx + 1 < len(sys.argv):
+            return sys.argv[idx + 1]
+    return default
+
+def start_profiling():
+    """
+    --profile [trace.json]: records timing spans for this run. On exit they
+    are written as Chrome trace-event JSON and summarized on stderr.
+    """
+    trace_path = get_option("--profile")
+    if not trace_path or trace_path.startswith("--"):
+        trace_path = "profile_trace.json"
+    profiler = profiling.enable()
+
+    def report():
+        profiler.export_chrome_trace(trace_path)
+        print(f"\n{profiler.format_summary()}\nTrace written to {trace_path} (open in chrome://tracing or Perfetto)",
+              file=sys.stderr)
+    atexit.register(report)
+
 def main():
     file_path = None
     enable_healing = False
 
+    if "--profile" in sys.argv:
+        start_profiling()
+
     # Check args
     if len(sys.argv) >= 2 and not sys.argv[1].startswith("--"):
         file_path = sys.argv[1]
@@ -56,6 +91,125 @@ def main():
     if "--heal" in sys.argv:
         enable_healing = True
 
+    # Scan window in MB: how much of the installer is mapped in at once
+    scan_window = int(float(get_option("--scan-window", DEFAULT_SCAN_WINDOW / (1024 * 1024))) * 1024 * 1024)
+
+    # Persistent analysis cache, keyed by installer content hash
+    cache_path = None
+    if "--no-cache" not in sys.argv:
+        cache_path = os.path.join(get_option("--cache-dir", DEFAULT_CACHE_DIR), DEFAULT_CACHE_FILE)
+
+    # Install durations reported by earlier generated scripts; they size the timeouts
+    telemetry = None
+    if "--no-telemetry" not in sys.argv:
+        telemetry = TelemetryStore(os.path.join(get_option("--cache-dir", DEFAULT_CACHE_DIR), DEFAULT_TELEMETRY_FILE))
+        telemetry_input = get_option("--ingest-telemetry")
+        if telemetry_input:
+            if not os.path.isfile(telemetry_input):
+                print(f"Error: Telemetry file '{telemetry_input}' not found.")
+                sys.exit(1)
+            print(f"Ingested {telemetry.ingest(telemetry_input)} new telemetry samples.")
+            if not file_path and "--telemetry-report" not in sys.argv:
+                sys.exit(0)
+        if "--telemetry-report" in sys.argv:
+            print(format_report(telemetry.report(int(get_option("--limit", 10)))))
+            sys.exit(0)
+
+    # Daemon mode: stay resident and answer analysis/generation requests over HTTP
+    if "--serve" in sys.argv:
+        from lib.daemon import serve, DEFAULT_HOST, DEFAULT_PORT, DEFAULT_MAX_QUEUE
+        workers = get_option("--workers")
+        serve(
+            host=get_option("--host", DEFAULT_HOST),
+            port=int(get_option("--port", DEFAULT_PORT)),
+            socket_path=get_option("--socket"),
+            workers=int(workers) if workers else None,
+            max_queue=int(get_option("--max-queue", DEFAULT_MAX_QUEUE)),
+            cache_path=cache_path,
+            telemetry_path=telemetry.db_path if telemetry else None,
+            scan_window=scan_window
+        )
+        sys.exit(0)
+
+    # Watch mode: regenerate scripts as installers land in (or leave) the setups folder
+    if "--watch" in sys.argv:
+        from lib.watcher import watch, DEFAULT_SETTLE, DEFAULT_POLL_INTERVAL
+        watch_dir = get_option("--watch")
+        if not watch_dir or watch_dir.startswith("--"):
+            watch_dir = find_setups_dir()
+        if not watch_dir or not os.path.isdir(watch_dir):
+            print(f"Error: Directory '{watch_dir or 'setups'}' not found.")
+            sys.exit(1)
+
+        def report(record):
+            if record["status"] == "ok":
+                print(f"[watch] {record['installer']} -> {record['script_path']} ({record['elapsed_s']}s)")
+            elif record["status"] == "error":
+                print(f"[watch] FAILED {record['installer']}: {record['error']}")
+            elif record["status"] == "deleted":
+                print(f"[watch] {record['installer']} removed; deleted {record['script_path']}")
+            sys.stdout.flush()
+
+        workers = get_option("--workers")
+        counters = watch(
+            watch_dir,
+            output_dir=get_option("--out-dir"),
+            workers=int(workers) if workers else None,
+            settle=float(get_option("--settle", DEFAULT_SETTLE)),
+            poll_interval=float(get_option("--poll", DEFAULT_POLL_INTERVAL)),
+            use_inotify="--poll" not in sys.argv,
+            scan_window=scan_window,
+            cache_path=cache_path,
+            on_record=report
+        )
+        print(f"Watch stopped: {json.dumps(counters)}")
+        sys.exit(0)
+
+    # Batch mode: analyze a whole directory, no prompts
+    batch_dir = get_option("--batch")
+    if batch_dir:
+        if not os.path.isdir(batch_dir):
+            print(f"Error: Directory '{batch_dir}' not found.")
+            sys.exit(1)
+        from lib.batch import run_batch
+        workers = get_option("--workers")
+        output_path = get_option("--output", "batch_results.jsonl")
+        summary = run_batch(
+            batch_dir,
+            output_path=output_path,
+            workers=int(workers) if workers else None,
+            output_dir=get_option("--out-dir"),
+            scan_window=scan_window,
+            cache_path=cache_path
+        )
+        # Keep stdout clean when it carries the JSONL stream
+        print(f"Batch complete: {json.dumps(summary)}", file=sys.stderr if output_path == "-" else sys.stdout)
+        sys.exit(0 if summary["errors"] == 0 else 2)
+
+    # Fleet mode: one orchestrating script for every installer in batch results
+    fleet_input = get_option("--fleet")
+    if fleet_input:
+        if not os.path.isfile(fleet_input):
+            print(f"Error: Batch results '{fleet_input}' not found.")
+            sys.exit(1)
+        from lib.fleet import FleetGenerator, PlanError, DEFAULT_PARALLEL, load_analyses
+        dependencies = None
+        deps_path = get_option("--deps")
+        if deps_path:
+            with open(deps_path, "r", encoding="utf-8") as f:
+                dependencies = json.load(f)
+        try:
+            generator = FleetGenerator(load_analyses(fleet_input), dependencies,
+                                       parallel=int(get_option("--parallel", DEFAULT_PARALLEL)), telemetry=telemetry)
+        except PlanError as e:
+            print(f"Error: {e}")
+            sys.exit(1)
+        output_path = get_option("--fleet-out", "install_fleet.ps1")
+        with open(output_path, "w") as f:
+            f.write(generator.generate_script())
+        print(f"SUCCESS: Fleet script for {len(generator.plan['entries'])} installers generated at: {output_path}")
+        sys.exit(0)
+
     # Interactive mode if no file provided
     if not file_path:
         print("No installer path provided.")
@@ -68,19 +222,23 @@ def main():
         sys.exit(1)
 
     print(f"\nAnalyzing {file_path}...")
-    analyzer = StaticAnalyzer(file_path)
+    cache = AnalysisCache(cache_path) if cache_path else None
+    analyzer = StaticAnalyzer(file_path, scan_window=scan_window, cache=cache)
     results = analyzer.analyze()
+    if cache:
+        stats = cache.stats()
+        print(f"Cache: {stats['hits']} hits, {stats['misses']} misses, {stats['bytes_saved']} bytes saved")
 
     print(json.dumps(results, indent=2))
 
     print("Generating PowerShell script...")
-    generator = ScriptGenerator(results)
+    generator = ScriptGenerator(results, telemetry=telemetry)
     script_code = generator.generate_script()
     
     output_filename = f"install_{os.path.basename(file_path)}.ps1"
     output_path = os.path.join(os.getcwd(), output_filename)
     
-    with open(output_path, "w") as f:
+    with profiling.span("write_script", path=output_filename), open(output_path, "w") as f:
         f.write(script_code)
     
     print(f"SUCCESS: PowerShell Script generated at: {output_path}")
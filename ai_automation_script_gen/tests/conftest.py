@@ -0,0 +1,23 @@
+import os
+import sys
+
+import pytest
+
+ROOT = os.path.join(os.path.dirname(os.path.abspath(__file__)), "..")
+sys.path.insert(0, ROOT)
+
+from benchmarks.corpus import write_installer
+
+
+@pytest.fixture
+def make_installer(tmp_path):
+    """
+    Writes a small synthetic installer (benchmarks/corpus.py kinds) and returns its path.
+    """
+    def make(kind="nsis", name=None, size=256 * 1024, directory=None, seed=1):
+        directory = directory or tmp_path
+        os.makedirs(directory, exist_ok=True)
+        path = os.path.join(directory, name or f"{kind}.{'msi' if kind == 'msi' else 'exe'}")
+        write_installer(path, kind, size, seed)
+        return path
+    return make
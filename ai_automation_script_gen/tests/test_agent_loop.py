@@ -0,0 +1,28 @@
+from lib.agent_loop import AgentLoop
+from lib.llm_client import LLMClient
+from lib.wizard_sim import WizardSimulator
+
+
+class RecordingLLM(LLMClient):
+    def __init__(self):
+        super().__init__()
+        self.histories = []
+
+    def decide_next_action(self, ui_context, history):
+        self.histories.append(list(history))
+        return super().decide_next_action(ui_context, history)
+
+
+def test_loop_installs_the_simulated_wizard_and_scripts_it(capsys):
+    simulator = WizardSimulator("C:\\Setups\\Sim.exe", seed=3, popup_rate=0.5, time_scale=0)
+    llm = RecordingLLM()
+    result = AgentLoop(simulator, llm, analysis={"path": simulator.exe_path, "type": "exe"},
+                       sleep=lambda seconds: None).run()
+
+    assert simulator.installed and result["status"] == "finished"
+    titles = [event["selector"]["title"] for event in result["events"]]
+    assert titles[-1] == "Finish" and "I agree to the license terms" in titles
+    assert result["steps"] == len(result["events"]) == len(result["step_code"])
+    # The model sees exactly the clicks made so far (the Finish click closed the window)
+    assert llm.histories[-1] == result["events"][:-1]
+    assert "Invoke-Step -Name 'Finish'" in result["script"]
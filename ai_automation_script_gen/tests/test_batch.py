@@ -0,0 +1,66 @@
+import json
+import multiprocessing
+import os
+
+import pytest
+
+import lib.batch
+from lib.batch import iter_installers, process_installer, run_batch
+
+
+def test_iter_installers_only_yields_installers(tmp_path, make_installer):
+    make_installer("nsis", directory=tmp_path)
+    make_installer("msi", directory=tmp_path)
+    (tmp_path / "notes.txt").write_text("not an installer")
+    (tmp_path / "sub.exe").mkdir()
+
+    names = sorted(os.path.basename(path) for path in iter_installers(str(tmp_path)))
+    assert names == ["msi.msi", "nsis.exe"]
+
+
+def test_process_installer_reports_errors_instead_of_raising(tmp_path, make_installer):
+    path = make_installer("nsis", directory=tmp_path)
+    record = process_installer(path, str(tmp_path / "no" / "such" / "dir"))
+    assert record["status"] == "error"
+    assert "FileNotFoundError" in record["error"]
+    assert "elapsed_s" in record
+
+
+def test_run_batch_streams_one_record_per_installer(tmp_path, make_installer):
+    setups = tmp_path / "setups"
+    for kind in ("nsis", "inno", "msi"):
+        make_installer(kind, directory=setups)
+    out_dir = tmp_path / "scripts"
+    results = tmp_path / "results.jsonl"
+
+    summary = run_batch(str(setups), output_path=str(results), workers=2, output_dir=str(out_dir))
+
+    assert summary["total"] == 3 and summary["ok"] == 3 and summary["errors"] == 0
+    records = [json.loads(line) for line in results.read_text().splitlines()]
+    assert sorted(os.path.basename(r["installer"]) for r in records) == ["inno.exe", "msi.msi", "nsis.exe"]
+    for record in records:
+        assert record["status"] == "ok"
+        assert os.path.exists(record["script_path"])
+        assert os.path.dirname(record["script_path"]) == str(out_dir)
+    by_name = {os.path.basename(r["installer"]): r for r in records}
+    assert "/S" in by_name["nsis.exe"]["analysis"]["silent_flags"]
+    assert by_name["msi.msi"]["analysis"]["type"] == "msi"
+
+
+def crash_worker(file_path, *args):
+    # Kills the pool worker the way a native crash would
+    os._exit(1)
+
+
+@pytest.mark.skipif(multiprocessing.get_start_method() != "fork", reason="workers must inherit the patch")
+def test_installer_that_crashes_its_worker_twice_is_reported(tmp_path, make_installer, monkeypatch):
+    setups = tmp_path / "setups"
+    make_installer("nsis", directory=setups)
+    results = tmp_path / "results.jsonl"
+    monkeypatch.setattr(lib.batch, "process_installer", crash_worker)
+
+    summary = run_batch(str(setups), output_path=str(results), workers=1, output_dir=str(tmp_path / "scripts"))
+
+    assert summary["total"] == 1 and summary["errors"] == 1
+    record = json.loads(results.read_text())
+    assert record["status"] == "error" and "worker crashed" in record["error"]
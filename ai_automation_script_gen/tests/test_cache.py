@@ -0,0 +1,78 @@
+import os
+import shutil
+
+from lib import cache as cache_module
+from lib.cache import AnalysisCache, file_digest
+from lib.introspect import StaticAnalyzer
+
+
+def test_get_or_compute_hits_after_first_store(tmp_path, make_installer):
+    path = make_installer("nsis")
+    cache = AnalysisCache(str(tmp_path / "cache.sqlite"))
+    calls = []
+
+    def compute():
+        calls.append(1)
+        return {"path": path, "type": "exe"}
+
+    assert cache.get_or_compute(path, "v1", compute) == {"path": path, "type": "exe"}
+    assert cache.get_or_compute(path, "v1", compute) == {"path": path, "type": "exe"}
+    assert len(calls) == 1
+    stats = cache.stats()
+    assert stats["hits"] == 1 and stats["misses"] == 1 and stats["entries"] == 1
+
+
+def test_changed_content_or_version_misses(tmp_path, make_installer):
+    path = make_installer("nsis")
+    cache = AnalysisCache(str(tmp_path / "cache.sqlite"))
+    cache.put(path, "v1", {"path": path, "n": 1})
+
+    assert cache.get(path, "v2") is None
+    with open(path, "ab") as f:
+        f.write(b"changed")
+    assert cache.get(path, "v1") is None
+
+
+def test_unchanged_files_are_not_rehashed(tmp_path, make_installer, monkeypatch):
+    path = make_installer("nsis")
+    cache = AnalysisCache(str(tmp_path / "cache.sqlite"))
+    digest = cache.content_hash(path)
+    assert digest == file_digest(path)
+
+    monkeypatch.setattr(cache_module, "file_digest", lambda p: (_ for _ in ()).throw(AssertionError("rehashed")))
+    assert cache.content_hash(path) == digest
+
+
+def test_same_content_at_another_path_is_rebased(tmp_path, make_installer):
+    path = make_installer("nsis")
+    copy = str(tmp_path / "copy.exe")
+    shutil.copy(path, copy)
+    cache = AnalysisCache(str(tmp_path / "cache.sqlite"))
+    cache.put(path, "v1", {"path": path, "install_cmd": f'"{path}" /S'})
+
+    assert cache.get(copy, "v1") == {"path": copy, "install_cmd": f'"{copy}" /S'}
+
+
+def test_eviction_keeps_total_size_bounded(tmp_path, make_installer):
+    paths = [make_installer("nsis", name=f"app{i}.exe", seed=i + 1) for i in range(4)]
+    cache = AnalysisCache(str(tmp_path / "cache.sqlite"), max_bytes=2500)
+    for path in paths:
+        cache.put(path, "v1", {"path": path, "blob": "x" * 1000})
+
+    stats = cache.stats()
+    assert stats["size_bytes"] <= 2500
+    assert stats["evictions"] >= 2
+    # Least recently used go first
+    assert cache.get(paths[0], "v1") is None
+    assert cache.get(paths[-1], "v1") is not None
+
+
+def test_analyzer_uses_cache(tmp_path, make_installer):
+    path = make_installer("inno")
+    cache = AnalysisCache(str(tmp_path / "cache.sqlite"))
+    first = StaticAnalyzer(path, cache=cache).analyze()
+    second = StaticAnalyzer(path, cache=cache).analyze()
+
+    assert first == second
+    assert cache.stats()["hits"] == 1
+    assert os.path.exists(tmp_path / "cache.sqlite")
@@ -0,0 +1,62 @@
+import os
+import threading
+import time
+
+import pytest
+
+from lib import daemon
+from lib.daemon import AnalysisService, make_server
+from lib.daemon_client import DaemonClient, DaemonRequestError
+
+
+@pytest.fixture
+def running(tmp_path):
+    """
+    A daemon on an ephemeral port, served from a thread; yields (server, client).
+    """
+    service = AnalysisService(workers=1, cache_path=str(tmp_path / "cache.sqlite"),
+                              telemetry_path=str(tmp_path / "telemetry.sqlite"))
+    server = make_server(service, port=0)
+    thread = threading.Thread(target=server.serve_forever)
+    thread.start()
+    client = DaemonClient(f"http://127.0.0.1:{server.server_address[1]}", timeout=10)
+    yield server, client
+    client.close()
+    if thread.is_alive():
+        server.shutdown()
+    thread.join()
+    server.server_close()
+    service.close()
+
+
+def test_repeat_analysis_is_answered_from_memory(running, make_installer):
+    _, client = running
+    path = make_installer("nsis")
+    first = client.analyze(path)
+    second = client.analyze(path)
+    assert first["cached"] is False and second["cached"] == "memory"
+    assert second["analysis"]["framework"]["name"] == "nsis"
+    with pytest.raises(DaemonRequestError) as error:
+        client.analyze(os.path.join(os.path.dirname(path), "missing.exe"))
+    assert error.value.status == 404
+
+
+def test_shutdown_does_not_wait_for_idle_keep_alive_connections(running):
+    server, client = running
+    idle = DaemonClient(client.url, timeout=10)
+    idle.health()
+    try:
+        started = time.perf_counter()
+        assert client.shutdown()["status"] == "shutting down"
+        server.server_close()
+        assert time.perf_counter() - started < 2
+    finally:
+        idle.close()
+
+
+def test_idle_connections_time_out_and_clients_reconnect(running, monkeypatch):
+    monkeypatch.setattr(daemon.RequestHandler, "timeout", 0.2)
+    _, client = running
+    client.health()
+    time.sleep(0.5)
+    assert client.health()["status"] == "ok"
@@ -0,0 +1,77 @@
+import json
+
+from lib import decisions
+from lib.decisions import DecisionCache, ScreenIndex, decide, screen_fingerprint
+from lib.llm_client import LLMClient
+
+
+def element(title, control_type="ControlType.Button", **extra):
+    return {"title": title, "control_type": control_type, **extra}
+
+
+WELCOME = [element("Welcome", "ControlType.Text"), element("Next"), element("Cancel")]
+LICENSE = [element("I agree to the terms", "ControlType.CheckBox", toggle_state="off"), element("Next")]
+
+
+def test_fingerprint_ignores_order_but_not_toggle_state():
+    assert screen_fingerprint(WELCOME) == screen_fingerprint(list(reversed(WELCOME)))
+    ticked = [dict(LICENSE[0], toggle_state="on"), LICENSE[1]]
+    assert screen_fingerprint(ticked) != screen_fingerprint(LICENSE)
+
+
+def test_heuristic_ticks_agree_box_before_navigating():
+    decision, ambiguous = decide(ScreenIndex(LICENSE))
+    assert decision["selector"]["title"] == "I agree to the terms" and not ambiguous
+    decision, _ = decide(ScreenIndex([dict(LICENSE[0], toggle_state="on"), LICENSE[1]]))
+    assert decision["selector"]["title"] == "Next"
+
+
+def test_repeated_screen_is_served_from_the_cache(monkeypatch):
+    llm = LLMClient()
+    first = llm.decide_next_action(WELCOME, [])
+    calls = []
+    monkeypatch.setattr("lib.llm_client.decide", lambda index: calls.append(index) or (None, False))
+    second = llm.decide_next_action(list(reversed(WELCOME)), [])
+    assert second == first and calls == []
+    assert llm.decision_stats()["hits"] == 1
+    # Callers get their own copy; mutating it does not poison the cache
+    second["selector"]["title"] = "Cancel"
+    assert llm.decide_next_action(WELCOME, [])["selector"]["title"] == "Next"
+
+
+def test_nothing_to_click_is_cached_too():
+    llm = LLMClient()
+    screen = [element("Installing...", "ControlType.Text")]
+    assert llm.decide_next_action(screen, []) is None
+    assert llm.decide_next_action(screen, []) is None
+    assert llm.decision_stats()["hits"] == 1
+
+
+def test_ambiguous_screens_are_not_cached():
+    llm = LLMClient()
+    screen = [element("Next"), element("Next", "ControlType.Hyperlink")]
+    llm.decide_next_action(screen, [])
+    llm.decide_next_action(screen, [])
+    stats = llm.decision_stats()
+    assert stats["hits"] == 0 and stats["uncacheable"] == 2 and stats["entries"] == 0
+
+
+def test_lru_evicts_the_least_recently_used():
+    cache = DecisionCache(max_entries=2)
+    cache.put("a", 1)
+    cache.put("b", 2)
+    cache.get("a")
+    cache.put("c", 3)
+    assert list(cache.entries) == ["a", "c"]
+
+
+def test_persisted_entries_reload_only_for_the_same_engine_version(tmp_path, monkeypatch):
+    path = tmp_path / "decisions.json"
+    cache = DecisionCache(str(path))
+    cache.put(screen_fingerprint(WELCOME), {"action": "click", "selector": {"title": "Next"}})
+    cache.save()
+    assert DecisionCache(str(path)).get(screen_fingerprint(WELCOME))[0]
+
+    monkeypatch.setattr(decisions, "ENGINE_VERSION", "older")
+    assert json.loads(path.read_text())["version"] != decisions.ENGINE_VERSION
+    assert DecisionCache(str(path)).entries == {}
@@ -0,0 +1,48 @@
+import io
+import zipfile
+
+import pytest
+
+from benchmarks.corpus import build_pe_stub
+from lib.introspect import StaticAnalyzer
+
+
+def squirrel_setup(path, package, as_resource=False):
+    bundle = io.BytesIO()
+    with zipfile.ZipFile(bundle, "w") as archive:
+        archive.writestr(package, b"nupkg")
+        archive.writestr("RELEASES", b"")
+    with open(path, "wb") as f:
+        if as_resource:
+            f.write(build_pe_stub([(b".text", b"\x90" * 4096)], resource=("DATA", bundle.getvalue())))
+        else:
+            f.write(build_pe_stub([(b".text", b"\x90" * 4096)]))
+            f.write(bundle.getvalue())
+    return str(path)
+
+
+@pytest.mark.parametrize("package, product, version", [
+    ("MyApp-1.2.3-full.nupkg", "MyApp", "1.2.3"),
+    ("my-app-1.2.3-full.nupkg", "my-app", "1.2.3"),
+    ("lib/net45/my-cool-app-2.0.0-beta1-full.nupkg", "my-cool-app", "2.0.0-beta1"),
+    ("my-app-4.5-delta.nupkg", "my-app", "4.5"),
+])
+def test_squirrel_package_names(tmp_path, package, product, version):
+    result = StaticAnalyzer(squirrel_setup(tmp_path / "Setup.exe", package)).analyze()
+
+    assert result["framework"]["name"] == "squirrel"
+    assert result["properties"]["ProductName"] == product
+    assert result["properties"]["ProductVersion"] == version
+
+
+def test_squirrel_package_in_data_resource(tmp_path):
+    result = StaticAnalyzer(squirrel_setup(tmp_path / "Setup.exe", "MyApp-1.2.3-full.nupkg", as_resource=True)).analyze()
+
+    assert result["framework"]["name"] == "squirrel"
+    assert result["properties"]["ProductName"] == "MyApp"
+    assert "DATA resource" in result["framework"]["evidence"][0]
+
+
+def test_magic_bytes_beat_the_extension(tmp_path, make_installer):
+    renamed = make_installer("msi", name="setup.exe")
+    assert StaticAnalyzer(renamed).analyze()["type"] == "msi"
@@ -0,0 +1,36 @@
+import random
+
+import pytest
+
+from lib import introspect
+from lib.introspect import ENTROPY_BLOCK_SIZE, StaticAnalyzer, block_entropies, low_entropy_regions
+
+BLOCK = ENTROPY_BLOCK_SIZE
+
+
+def mixed_buffer(blocks=64):
+    # Even blocks random (compressed-looking), odd blocks text
+    rng = random.Random(1)
+    text = (b"Setup flags: /S /quiet --silent " * BLOCK)[:BLOCK]
+    return bytearray(b"".join(rng.randbytes(BLOCK) if i % 2 == 0 else text for i in range(blocks)))
+
+
+@pytest.mark.parametrize("numpy", [True, False])
+def test_only_low_entropy_blocks_are_kept(monkeypatch, numpy):
+    if not numpy:
+        monkeypatch.setattr(introspect, "_optional_import", lambda name: None)
+    buf = mixed_buffer()
+    entropies = block_entropies(buf)
+    assert len(entropies) == 64
+    assert all(h > 7.2 for h in entropies[::2]) and all(h < 5 for h in entropies[1::2])
+    assert low_entropy_regions(buf)[:2] == [(BLOCK, 2 * BLOCK), (3 * BLOCK, 4 * BLOCK)]
+
+
+def test_large_unknown_installer_skips_payload_but_finds_flags(make_installer):
+    result = StaticAnalyzer(make_installer("generic", size=8 * 1024 * 1024)).analyze()
+    stats = result["scan_stats"]
+    assert 0 < stats["bytes_scanned"] < stats["bytes_total"]
+    assert {"/S", "/quiet", "--silent"} <= set(result["silent_flags"])
+    # The string table in the (dense, random) code section is still searched
+    image_end = result["pe"]["overlay_offset"]
+    assert any(hit["offset"] < image_end for hit in result["flag_offsets"]["/S"])
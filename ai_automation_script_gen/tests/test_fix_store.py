@@ -0,0 +1,66 @@
+import time
+
+import pytest
+
+from lib import fix_store
+from lib.fix_store import FixStore, failure_signature, fix_key
+
+TIMEOUT_FIX = {"type": "add_wait", "seconds": 30, "reason": "Window appeared late"}
+ADMIN_FIX = {"type": "elevate", "reason": "Needs elevation"}
+
+
+@pytest.fixture
+def store(tmp_path):
+    store = FixStore(str(tmp_path / "fixes.sqlite"))
+    yield store
+    store.close()
+
+
+def test_signature_ignores_paths_times_and_numbers():
+    one = ("Output: Starting at 2024-01-02 10:11:12\n"
+           "Error: Timed out waiting for window 'Setup' after 30s in C:\\Temp\\a1\\install.ps1")
+    two = ("Output: Starting at 2025-06-07 08:09:10\n"
+           "Error: Timed out waiting for window 'Setup' after 45s in C:\\Users\\bob\\run.ps1")
+    assert failure_signature(one) == failure_signature(two)
+    assert failure_signature(one) != failure_signature("Error: Access is denied.")
+
+
+def test_recorded_fix_is_found_for_the_same_signature(store):
+    signature = failure_signature("Error: Access is denied.")
+    assert store.lookup(signature) is None
+    store.record(signature, ADMIN_FIX, success=True)
+    assert store.lookup(signature) == ADMIN_FIX
+    assert store.lookup(signature, exclude={fix_key(ADMIN_FIX)}) is None
+    assert store.stats()["hits"] == 1 and store.stats()["misses"] == 2
+
+
+def test_fixes_that_mostly_fail_are_not_offered(store):
+    store.record("sig", TIMEOUT_FIX, success=True)
+    store.record("sig", TIMEOUT_FIX, success=False)
+    store.record("sig", TIMEOUT_FIX, success=False)
+    assert store.lookup("sig") is None
+    store.record("sig", ADMIN_FIX, success=True)
+    assert store.lookup("sig") == ADMIN_FIX
+
+
+def test_entries_persist_across_opens(tmp_path):
+    path = str(tmp_path / "fixes.sqlite")
+    first = FixStore(path)
+    first.record("sig", TIMEOUT_FIX, success=True)
+    first.close()
+    second = FixStore(path)
+    assert second.lookup("sig") == TIMEOUT_FIX
+    second.close()
+
+
+def test_old_evidence_decays_and_is_pruned(store, monkeypatch):
+    store.record("sig", TIMEOUT_FIX, success=True)
+    now = time.time()
+    # Four half-lives on, one success weighs 1/16 and still counts...
+    monkeypatch.setattr(fix_store.time, "time", lambda: now + 4 * store.half_life)
+    assert store.lookup("sig") == TIMEOUT_FIX
+    # ...past the MIN_WEIGHT horizon it is ignored, then deleted
+    monkeypatch.setattr(fix_store.time, "time", lambda: now + 5 * store.half_life)
+    assert store.lookup("sig") is None
+    assert store.prune() == 1
+    assert store.stats()["entries"] == 0
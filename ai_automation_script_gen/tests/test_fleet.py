@@ -0,0 +1,52 @@
+import pytest
+
+from benchmarks.corpus import build_pe_stub, write_msi
+from lib.fleet import FleetGenerator, PlanError, build_plan, parse_plan
+from lib.introspect import StaticAnalyzer
+
+
+@pytest.fixture
+def analyses(make_installer, tmp_path):
+    msi_path = tmp_path / "payload.msi"
+    write_msi(str(msi_path), 64 * 1024)
+    # An unknown wrapper with an MSI appended: installed by carving the MSI out
+    wrapper = tmp_path / "wrapper.exe"
+    wrapper.write_bytes(build_pe_stub([(b".text", b"\x90" * 4096)]) + msi_path.read_bytes())
+    paths = [make_installer("nsis"), make_installer("msi"), make_installer("burn"), str(wrapper)]
+    return [StaticAnalyzer(path).analyze() for path in paths]
+
+
+def test_plan_round_trips_through_the_generated_script(analyses):
+    generator = FleetGenerator(analyses, dependencies={"wrapper.exe": ["Bench MSI App"]}, parallel=3)
+    plan = parse_plan(generator.generate_script())
+    assert plan == generator.plan
+    assert plan["parallel"] == 3
+
+    entries = {entry["id"]: entry for entry in plan["entries"]}
+    assert set(entries) == {"nsis", "msi", "burn", "wrapper"}
+    # MSI, Burn bundles and anything run through msiexec share the Windows Installer lane
+    assert entries["msi"]["lane"] == entries["burn"]["lane"] == entries["wrapper"]["lane"] == "msi"
+    assert entries["nsis"]["lane"] is None
+    assert entries["wrapper"]["depends_on"] == ["msi"]
+    assert entries["wrapper"]["extract"]["name"].endswith(".msi")
+    ids = [entry["id"] for entry in plan["entries"]]
+    assert ids.index("msi") < ids.index("wrapper")
+
+
+def test_script_retries_msi_busy_and_extracts_inside_the_job(analyses):
+    script = FleetGenerator(analyses).generate_script()
+    assert "$MsiBusyCode = 1618" in script
+    assert "$code -eq $MsiBusyCode -and $Retries[$id] -lt $MaxBusyRetries" in script
+    # The scheduling loop only starts the child that extracts and installs
+    loop = script[script.index("function Start-Entry"):]
+    assert "\n            Export-Payload" not in loop
+    assert "-EncodedCommand $encoded" in loop
+
+
+def test_failed_analyses_are_skipped_and_bad_dependencies_rejected(analyses):
+    plan = build_plan(analyses + [{"path": "broken.exe", "error": "unreadable"}])
+    assert len(plan["entries"]) == 4
+    with pytest.raises(PlanError, match="Unknown installer"):
+        build_plan(analyses, dependencies={"nsis": ["missing.exe"]})
+    with pytest.raises(PlanError, match="cycle"):
+        build_plan(analyses, dependencies={"nsis": ["msi"], "msi": ["nsis"]})
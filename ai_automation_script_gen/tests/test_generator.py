@@ -0,0 +1,18 @@
+from lib.generator import ScriptGenerator
+
+EVENTS = [
+    {"action": "click", "selector": {"title": "I agree", "control_type": "ControlType.CheckBox"}},
+    {"action": "click", "selector": {"title": "Next", "control_type": "ControlType.Button"}},
+    {"action": "click", "selector": {"title": "Publisher's Finish", "control_type": "ControlType.Button"}},
+]
+
+
+def test_gui_script_steps_carry_name_and_control_type():
+    script = ScriptGenerator({"path": "C:\\Setups\\App.exe", "type": "exe"}).generate_gui_script(EVENTS)
+    assert "Invoke-Step -Name 'I agree' -ControlType 'ControlType.CheckBox'" in script
+    assert "Invoke-Step -Name 'Publisher''s Finish' -ControlType 'ControlType.Button'" in script
+    # A button and a link sharing a name must not share a cache entry
+    assert '$key = "$ControlType|$Name"' in script
+    assert "$ElementCache[$Name]" not in script
+    # Get-Dialogs unrolls the windows; a wrapped collection would be iterated as one item
+    assert "return ,$windows" not in script
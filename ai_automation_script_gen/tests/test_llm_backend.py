@@ -0,0 +1,235 @@
+import asyncio
+import email.utils
+import time
+
+import pytest
+
+from lib.llm_backend import BackendError, HTTPBackend, ResponseCache, retry_after_seconds
+from lib.llm_stub_server import StubModelServer
+
+SCREEN = {"ui_context": [{"title": "Next", "control_type": "ControlType.Button"}], "history": []}
+
+
+def screen(title):
+    return {"ui_context": [{"title": title, "control_type": "ControlType.Button"}], "history": []}
+
+
+@pytest.fixture
+def server():
+    with StubModelServer(latency=0.02, per_item_latency=0.0) as server:
+        yield server
+
+
+def run(backend, coroutine):
+    async def main():
+        try:
+            return await coroutine
+        finally:
+            await backend.close()
+    return asyncio.run(main())
+
+
+def test_concurrent_requests_share_one_batch(server):
+    backend = HTTPBackend(server.url, batch_window=0.02)
+    titles = ["Next", "Install", "Finish", "I Agree"]
+    outputs = run(backend, backend.complete_many([("decide_next_action", screen(t)) for t in titles]))
+    assert [o["selector"]["title"] for o in outputs] == titles
+    assert backend.counters["batches"] == 1 and server.counters["calls"] == 1
+
+
+def test_cache_hits_skip_the_server_and_return_copies(server):
+    backend = HTTPBackend(server.url, batch_size=1)
+
+    async def twice():
+        first = await backend.complete("decide_next_action", SCREEN)
+        first["selector"]["title"] = "mutated"
+        return await backend.complete("decide_next_action", SCREEN)
+
+    assert run(backend, twice())["selector"]["title"] == "Next"
+    assert server.counters["calls"] == 1
+    assert backend.cache.stats()["hits"] == 1
+
+
+def test_expired_entries_are_fetched_again(server):
+    backend = HTTPBackend(server.url, batch_size=1, cache=ResponseCache(ttl=0.05))
+
+    async def around_expiry():
+        await backend.complete("decide_next_action", SCREEN)
+        await asyncio.sleep(0.1)
+        await backend.complete("decide_next_action", SCREEN)
+
+    run(backend, around_expiry())
+    assert server.counters["calls"] == 2
+    assert backend.cache.stats()["expired"] == 1
+
+
+def test_errors_fail_only_their_own_request(server):
+    backend = HTTPBackend(server.url, batch_window=0.02)
+
+    async def mixed():
+        return await asyncio.gather(backend.complete("decide_next_action", SCREEN),
+                                    backend.complete("no_such_task", {}), return_exceptions=True)
+
+    ok, error = run(backend, mixed())
+    assert ok["selector"]["title"] == "Next"
+    assert isinstance(error, BackendError) and "Unknown task" in str(error)
+    # Errors are not cached
+    assert backend.cache.stats()["entries"] == 1
+
+
+def test_throttled_calls_are_retried(server):
+    server.max_concurrent = 0
+    backend = HTTPBackend(server.url, batch_size=1, retries=2, backoff=0.01)
+    with pytest.raises(BackendError, match="HTTP 429"):
+        run(backend, backend.complete("decide_next_action", SCREEN))
+    assert backend.counters["retries"] == 2 and server.counters["throttled"] == 3
+
+
+def test_short_batch_answer_fails_the_unanswered_requests(server, monkeypatch):
+    backend = HTTPBackend(server.url, batch_window=0.02)
+
+    async def short_post(path, body):
+        return {"responses": [{"output": "first"}]}
+
+    monkeypatch.setattr(backend, "_post", short_post)
+
+    async def three():
+        return await asyncio.wait_for(asyncio.gather(
+            *(backend.complete("decide_next_action", screen(t)) for t in ("a", "b", "c")),
+            return_exceptions=True), 2)
+
+    first, *rest = run(backend, three())
+    assert first == "first"
+    assert all(isinstance(e, BackendError) and "1 of 3" in str(e) for e in rest)
+
+
+def test_https_urls_default_to_443_and_send_auth_headers():
+    backend = HTTPBackend("https://models.example.com/v1", token="secret", headers={"X-Team": "packaging"})
+    assert backend.port == 443 and backend.ssl is not None
+    assert backend.headers["Host"] == "models.example.com"
+    assert backend.headers["Authorization"] == "Bearer secret"
+    assert backend.headers["X-Team"] == "packaging"
+    plain = HTTPBackend("http://127.0.0.1:8765/v1")
+    assert plain.ssl is None and plain.headers["Host"] == "127.0.0.1:8765"
+    with pytest.raises(ValueError):
+        HTTPBackend("ftp://models.example.com")
+
+
+class RawServer:
+    """
+    Answers every request on a connection with the same raw bytes, after
+    `delay` seconds; closes the connection after answering if `close` is set.
+    """
+    def __init__(self, response, delay=0.0, close=False):
+        self.response = response
+        self.delay = delay
+        self.close = close
+        self.requests = 0
+
+    async def __aenter__(self):
+        self.server = await asyncio.start_server(self.handle, "127.0.0.1", 0)
+        self.url = f"http://127.0.0.1:{self.server.sockets[0].getsockname()[1]}"
+        return self
+
+    async def __aexit__(self, *exc):
+        self.server.close()
+
+    async def handle(self, reader, writer):
+        try:
+            while True:
+                length = 0
+                while (line := await reader.readline()) not in (b"\r\n", b""):
+                    if line.lower().startswith(b"content-length:"):
+                        length = int(line.split(b":")[1])
+                if not line:
+                    break
+                await reader.readexactly(length)
+                self.requests += 1
+                await asyncio.sleep(self.delay)
+                writer.write(self.response)
+                await writer.drain()
+                if self.close:
+                    break
+        except ConnectionError:
+            pass
+        writer.close()
+
+
+def complete_twice(response, close=False):
+    async def main():
+        async with RawServer(response, close=close) as server:
+            backend = HTTPBackend(server.url, batch_size=1)
+            try:
+                first = await backend.complete("first", {})
+                second = await backend.complete("second", {})
+            finally:
+                await backend.close()
+            return first, second, backend.counters["connections_opened"]
+    return asyncio.run(main())
+
+
+def test_chunked_responses_are_read_and_the_connection_reused():
+    body = b'{"output": "chunked"}'
+    response = (b"HTTP/1.1 200 OK\r\nTransfer-Encoding: chunked\r\n\r\n"
+                + b"5;ext=1\r\n" + body[:5] + b"\r\n" + f"{len(body) - 5:x}\r\n".encode() + body[5:]
+                + b"\r\n0\r\nX-Trailer: 1\r\n\r\n")
+    assert complete_twice(response) == ("chunked", "chunked", 1)
+
+
+def test_responses_without_length_are_read_to_close():
+    response = b'HTTP/1.1 200 OK\r\n\r\n{"output": "until close"}'
+    assert complete_twice(response, close=True) == ("until close", "until close", 2)
+
+
+def test_retry_after_accepts_seconds_and_http_dates():
+    assert retry_after_seconds("2") == 2.0
+    assert retry_after_seconds("Wed, 21 Oct 2015 07:28:00 GMT") == 0.0
+    later = retry_after_seconds(email.utils.formatdate(time.time() + 30, usegmt=True))
+    assert 25 < later <= 30
+    assert retry_after_seconds("soon") is None
+
+
+def test_http_date_retry_after_is_honored():
+    response = (b"HTTP/1.1 503 Busy\r\nRetry-After: Wed, 21 Oct 2015 07:28:00 GMT\r\n"
+                b"Content-Length: 0\r\n\r\n")
+
+    async def main():
+        async with RawServer(response) as server:
+            backend = HTTPBackend(server.url, batch_size=1, retries=1, backoff=10)
+            try:
+                with pytest.raises(BackendError, match="HTTP 503"):
+                    await asyncio.wait_for(backend.complete("decide_next_action", SCREEN), 2)
+            finally:
+                await backend.close()
+            return server.requests
+
+    assert asyncio.run(main()) == 2
+
+
+def test_cancelling_one_caller_leaves_the_shared_request_running(server):
+    backend = HTTPBackend(server.url, batch_size=1)
+
+    async def cancel_first():
+        first = asyncio.ensure_future(backend.complete("decide_next_action", SCREEN))
+        second = asyncio.ensure_future(backend.complete("decide_next_action", SCREEN))
+        await asyncio.sleep(0.005)
+        first.cancel()
+        return await second
+
+    assert run(backend, cancel_first())["selector"]["title"] == "Next"
+    assert backend.counters["deduplicated"] == 1 and server.counters["calls"] == 1
+
+
+def test_timeouts_raise_backend_error():
+    response = b'HTTP/1.1 200 OK\r\nContent-Length: 15\r\n\r\n{"output": "x"}'
+
+    async def main():
+        async with RawServer(response, delay=1.0) as server:
+            backend = HTTPBackend(server.url, batch_size=1, timeout=0.05)
+            try:
+                with pytest.raises(BackendError, match="No answer"):
+                    await backend.complete("decide_next_action", SCREEN)
+            finally:
+                await backend.close()
+
+    asyncio.run(main())
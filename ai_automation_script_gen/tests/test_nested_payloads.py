@@ -0,0 +1,54 @@
+import struct
+import uuid
+
+from benchmarks.corpus import build_pe_stub, write_msi
+from lib.introspect import StaticAnalyzer
+
+UX_SIZE = 4096
+
+
+def burn_bundle(path, attached):
+    """
+    A Burn bundle: .wixburn header, a cabinet UX container, then `attached` as is.
+    """
+    def stub(header):
+        return build_pe_stub([(b".text", b"\x90" * 4096), (b".wixburn", header)])
+
+    placeholder = stub(b"\0" * 56)
+    header = struct.pack("<II", 0x00F14300, 2) + uuid.UUID(int=7).bytes_le + \
+        struct.pack("<IIIIIIII", len(placeholder), 0, 0, 0, 0, 2, UX_SIZE, len(attached))
+    with open(path, "wb") as f:
+        f.write(stub(header))
+        f.write(b"MSCF" + b"\0" * (UX_SIZE - 4))
+        f.write(attached)
+    return str(path)
+
+
+def test_msi_attached_to_a_burn_bundle_is_analyzed(tmp_path):
+    msi_path = tmp_path / "payload.msi"
+    write_msi(str(msi_path), 64 * 1024)
+    bundle = burn_bundle(tmp_path / "bundle.exe", msi_path.read_bytes())
+
+    result = StaticAnalyzer(bundle).analyze()
+
+    assert result["framework"]["name"] == "wix_burn"
+    ux, attached = result["children"]
+    assert ux["type"] == "cab" and ux["compressed"] and ux["analysis"] is None
+    assert attached["type"] == "msi" and "compressed" not in attached
+    assert attached["analysis"]["type"] == "msi"
+    assert attached["analysis"]["properties"]["ProductName"]
+    # The overlay scan finds the same compound file; it is not listed twice
+    assert len(result["children"]) == 2
+
+
+def test_exe_overlay_is_analyzed_in_place(tmp_path, make_installer):
+    inner = make_installer("nsis", name="inner.exe", size=128 * 1024)
+    outer = tmp_path / "outer.exe"
+    with open(outer, "wb") as f:
+        f.write(build_pe_stub([(b".text", b"\x90" * 4096)]))
+        with open(inner, "rb") as src:
+            f.write(src.read())
+
+    child = StaticAnalyzer(str(outer)).analyze()["children"][0]
+    assert child["type"] == "exe" and child["container"] == "overlay"
+    assert child["analysis"]["framework"]["name"] == "nsis"
@@ -0,0 +1,85 @@
+import sys
+
+import pytest
+
+from lib.gui_automator import GuiAutomator
+from lib.ps_session import STUB_WORKER_SCRIPT, SessionError, SessionPool, SessionTimeout, WorkerSession
+
+STUB = [sys.executable, "-u", STUB_WORKER_SCRIPT]
+
+
+@pytest.fixture
+def session():
+    session = WorkerSession(STUB, request_timeout=5.0)
+    yield session
+    session.close()
+
+
+def test_requests_share_one_worker_process(session):
+    first = session.request("ping")["pid"]
+    assert session.request("ping")["pid"] == first
+    assert session.restarts == 0
+
+
+def test_worker_errors_are_raised_and_the_session_stays_usable(session):
+    with pytest.raises(SessionError, match="Unknown op"):
+        session.request("explode")
+    assert session.request("ping")["pid"]
+
+
+def test_timeout_kills_the_worker_and_the_next_request_restarts_it(session):
+    pid = session.request("ping")["pid"]
+    with pytest.raises(SessionTimeout):
+        session.request("ping", timeout=0.2, delay=2)
+    assert session.request("ping")["pid"] != pid
+    assert session.restarts == 1
+
+
+def test_crashed_worker_is_restarted(session):
+    pid = session.request("ping")["pid"]
+    session.proc.kill()
+    session.proc.wait()
+    assert session.request("ping")["pid"] != pid
+    assert session.restarts == 1
+
+
+def test_missing_executable_raises_session_error():
+    session = WorkerSession(["/nonexistent/pwsh"])
+    with pytest.raises(SessionError, match="Could not start"):
+        session.request("ping")
+
+
+def test_pool_acquire_times_out_instead_of_blocking():
+    pool = SessionPool(size=1, command=STUB)
+    held = pool.acquire()
+    try:
+        with pytest.raises(SessionTimeout):
+            pool.acquire(timeout=0.1)
+    finally:
+        pool.release(held)
+        pool.close()
+
+
+def test_gui_automator_walks_the_stub_wizard_and_releases_its_session():
+    pool = SessionPool(size=1, command=STUB)
+    try:
+        with GuiAutomator("C:\\Setups\\Demo.exe", pool=pool) as automator:
+            titles = [e["title"] for e in automator.get_ui_hierarchy()]
+            assert "Welcome" in titles and "Next" in titles
+            for button in ("Next", "I Agree", "Install"):
+                assert automator.perform_action("click", {"title": button})
+                automator.get_ui_hierarchy()
+            assert automator.tree.first(title="Finish") is not None
+            assert not automator.perform_action("click", {"title": "Nope"})
+        # Released on exit: the single session is free again
+        with pool.session(timeout=0.1) as session:
+            assert session.request("ping")["pid"]
+    finally:
+        pool.close()
+
+
+def test_click_matches_the_control_type(session):
+    pid = session.request("launch", path="Demo.exe")["pid"]
+    with pytest.raises(SessionError, match="No Hyperlink named 'Next'"):
+        session.request("click", pid=pid, title="Next", control_type="ControlType.Hyperlink")
+    assert session.request("click", pid=pid, title="Next", control_type="ControlType.Button") == {"clicked": "Next"}
@@ -0,0 +1,35 @@
+import os
+
+from lib.cache import AnalysisCache, file_digest
+from lib.strings_index import StringsIndex, main
+
+
+def test_index_without_a_cache_hashes_files_itself(make_installer, tmp_path, monkeypatch):
+    # Nothing may be created outside the index's own path
+    monkeypatch.setattr("lib.cache.DEFAULT_CACHE_DIR", str(tmp_path / "home-cache"))
+    path = make_installer("nsis")
+    index = StringsIndex(str(tmp_path / "strings.sqlite"))
+    assert index.index_file(path) > 0
+    assert index.is_indexed(path)
+    assert index.query("Nullsoft", file_path=path)
+    assert index.index_file(path) == 0
+    index.close()
+    assert not os.path.exists(tmp_path / "home-cache")
+
+
+def test_index_reuses_a_given_cache(make_installer, tmp_path):
+    path = make_installer("inno")
+    cache = AnalysisCache(str(tmp_path / "cache.sqlite"))
+    index = StringsIndex(str(tmp_path / "strings.sqlite"), hash_cache=cache)
+    index.index_file(path)
+    assert cache.content_hash(path) == file_digest(path)
+    index.close()
+
+
+def test_cli_honours_cache_dir_and_no_cache(make_installer, tmp_path, capsys):
+    path = make_installer("nsis")
+    cache_dir = tmp_path / "cache"
+    assert main(["index", path, "--cache-dir", str(cache_dir), "--no-cache"]) == 0
+    assert not any(name.startswith("analysis_cache") for name in os.listdir(cache_dir))
+    assert main(["index", path, "--cache-dir", str(cache_dir)]) == 0
+    assert any(name.startswith("analysis_cache") for name in os.listdir(cache_dir))
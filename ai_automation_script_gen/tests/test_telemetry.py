@@ -0,0 +1,80 @@
+import json
+import os
+
+import pytest
+
+from lib.telemetry import TelemetryStore, parse_records, percentile
+
+
+def record(run, duration_ms, ok=True, product="App", phase="install", ts="2024-05-01T10:00:00.1234567Z"):
+    return {"run": run, "product": product, "phase": phase, "duration_ms": duration_ms, "ok": ok,
+            "exit_code": 0 if ok else 1603, "ts": ts}
+
+
+@pytest.fixture
+def store(tmp_path):
+    store = TelemetryStore(str(tmp_path / "telemetry.sqlite"))
+    yield store
+    store.close()
+
+
+def test_records_are_parsed_from_script_output():
+    lines = ["Installing...", "TELEMETRY " + json.dumps(record("r1", 1200)), "﻿" + json.dumps(record("r2", 900)),
+             "TELEMETRY {not json", json.dumps({"product": "App", "phase": "install"})]
+    assert [r["run"] for r in parse_records(lines)] == ["r1", "r2"]
+
+
+def test_reads_do_not_create_the_database(store):
+    assert store.suggest_timeout("App", "install", 3600) == 3600
+    assert store.stats()["samples"] == 0 and store.report()["products"] == []
+    assert not os.path.exists(store.db_path)
+
+
+def test_ingesting_the_same_file_twice_adds_nothing(store, tmp_path):
+    path = tmp_path / "ai_script_gen_telemetry.jsonl"
+    path.write_text("\n".join(json.dumps(record(f"r{i}", 1000 + i)) for i in range(3)) + "\n")
+    assert store.ingest(str(path)) == 3
+    assert store.ingest(str(path)) == 0
+    assert store.stats()["samples"] == 3
+
+
+def test_repeated_phases_in_one_run_are_all_kept(store, tmp_path):
+    path = tmp_path / "ai_script_gen_telemetry.jsonl"
+    path.write_text("\n".join(json.dumps(record("r1", ms, phase="step:Next")) for ms in (800, 1200)) + "\n")
+    assert store.ingest(str(path)) == 2
+    assert store.ingest(str(path)) == 0
+    numbered = [{**record("r2", ms, phase="step:Next"), "seq": seq} for seq, ms in ((3, 500), (7, 500))]
+    assert store.add(numbered) == 2
+    assert store.add(numbered) == 0
+    assert store.phase_stats("App", "step:Next")["runs"] == 4
+
+
+def test_timeout_follows_p99_once_there_are_enough_runs(store):
+    store.add([record(f"r{i}", 10_000) for i in range(4)])
+    assert store.suggest_timeout("App", "install", 3600) == 3600
+    store.add([record("r4", 20_000), record("r5", 999_999, ok=False)])
+    # Failed runs are not durations: p99 of 10 s x4 and 20 s, doubled
+    assert store.suggest_timeout("App", "install", 3600) == 40
+    stats = store.phase_stats("App", "install")
+    assert stats["successes"] == 5 and stats["failure_rate"] == round(1 / 6, 4)
+
+
+def test_only_the_most_recent_samples_are_kept(tmp_path):
+    store = TelemetryStore(str(tmp_path / "telemetry.sqlite"), max_samples=3)
+    rows = [record(f"r{i}", 100 * (i + 1), ts=f"2024-05-01T10:00:0{i}Z") for i in range(5)]
+    assert store.add(rows) == 3
+    assert store.phase_stats("App", "install")["p50_ms"] == 400
+    store.close()
+
+
+def test_report_ranks_products_by_whole_run_p95(store):
+    store.add([record("a", 5000, product="Slow"), record("a", 5000, product="Slow", phase="extract"),
+               record("b", 1000, product="Fast")])
+    report = store.report()
+    assert [row["product"] for row in report["products"]] == ["Slow", "Fast"]
+    assert report["products"][0]["p95_ms"] == 10_000
+
+
+def test_percentile_is_nearest_rank():
+    assert percentile([1, 2, 3, 4], 50) == 2 and percentile([1, 2, 3, 4], 99) == 4
+    assert percentile([], 50) is None
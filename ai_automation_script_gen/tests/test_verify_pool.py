@@ -0,0 +1,74 @@
+import itertools
+import os
+
+import pytest
+
+from lib.ps_session import SessionError
+from lib.verify_pool import VerifyPool, verify_scripts
+
+
+def script(tmp_path, name, body):
+    path = tmp_path / name
+    path.write_text(body)
+    return str(path)
+
+
+@pytest.fixture
+def pool():
+    with VerifyPool(workers=1, timeout=5, settle_time=0.2) as pool:
+        yield pool
+
+
+def test_passing_and_failing_scripts(pool, tmp_path):
+    ok = pool.verify(script(tmp_path, "ok.py", "print('Installation successful')\n"))
+    bad = pool.verify(script(tmp_path, "bad.py", "raise SystemExit('Installation failed')\n"))
+    assert ok["success"] and ok["returncode"] == 0
+    assert not bad["success"] and "Installation failed" in bad["output"]
+    assert pool.counters["passed"] == 1 and pool.counters["failed"] == 1
+
+
+def test_hanging_script_times_out_and_the_worker_carries_on(pool, tmp_path):
+    hang = pool.verify(script(tmp_path, "hang.py", "import time\ntime.sleep(60)\n"), timeout=0.5)
+    assert hang["timed_out"] and not hang["success"]
+    assert pool.counters["crashed"] == 0
+    assert pool.verify(script(tmp_path, "ok.py", "print('done')\n"))["success"]
+
+
+def test_crashed_worker_is_replaced(pool, tmp_path):
+    # The script's parent is the worker process
+    crash = pool.verify(script(tmp_path, "crash.py", "import os, signal\nos.kill(os.getppid(), signal.SIGKILL)\n"))
+    assert not crash["success"] and crash["error"]
+    assert pool.counters["crashed"] == 1 and pool.counters["recycled"] == 1
+    assert pool.verify(script(tmp_path, "ok.py", "print('done')\n"))["success"]
+
+
+def test_workers_are_recycled_after_max_runs(tmp_path):
+    path = script(tmp_path, "ok.py", "import os\nprint(os.getppid())\n")
+    with VerifyPool(workers=1, max_runs=2, timeout=5, settle_time=0.2) as pool:
+        parents = [pool.verify(path)["output"].split()[-1] for _ in range(3)]
+        assert parents[0] == parents[1] != parents[2]
+        assert pool.counters["recycled"] == 1
+
+
+def test_verify_scripts_returns_one_result_per_script(tmp_path):
+    paths = [script(tmp_path, f"s{i}.py", f"print({i})\n") for i in range(5)]
+    results, summary = verify_scripts(paths, workers=2, timeout=5, settle_time=0.2)
+    assert sorted(r["script"] for r in results) == sorted(os.path.abspath(p) for p in paths)
+    assert summary["runs"] == 5 and summary["passed"] == 5
+
+
+def test_failed_start_shuts_down_the_workers_already_started(monkeypatch):
+    started, calls = [], itertools.count()
+    spawn = VerifyPool._spawn
+
+    def flaky_spawn(self):
+        if next(calls) == 1:
+            raise SessionError("Verify worker failed to start")
+        started.append(spawn(self))
+        return started[-1]
+
+    monkeypatch.setattr(VerifyPool, "_spawn", flaky_spawn)
+    with pytest.raises(SessionError, match="failed to start"):
+        VerifyPool(workers=3)
+    assert len(started) == 2
+    assert not any(session.alive() for session in started)
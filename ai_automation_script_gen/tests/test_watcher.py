@@ -0,0 +1,98 @@
+import os
+import queue
+import threading
+
+import pytest
+
+from lib.cache import file_digest
+from lib.watcher import STATE_FILE, SetupsWatcher, process_change
+
+SETTLE = 2.0
+
+
+@pytest.fixture
+def folders(tmp_path):
+    setups, scripts = tmp_path / "setups", tmp_path / "scripts"
+    setups.mkdir()
+    return str(setups), str(scripts)
+
+
+@pytest.fixture
+def watcher(folders):
+    records = []
+    watcher = SetupsWatcher(*folders, workers=1, settle=SETTLE, use_inotify=False, on_record=records.append)
+    watcher.records = records
+    yield watcher
+    os.close(watcher._wake_r)
+    os.close(watcher._wake_w)
+
+
+def grow(path, data=b"MZ" + b"\0" * 1022):
+    with open(path, "ab") as f:
+        f.write(data)
+
+
+def test_file_is_due_only_after_it_stops_changing(watcher, folders):
+    path = os.path.join(folders[0], "app.exe")
+    grow(path)
+    watcher._changed([path], now=0.0)
+    assert watcher._due(SETTLE - 0.1) == []
+
+    # Still being copied: the settle clock restarts
+    grow(path)
+    assert watcher._due(SETTLE) == []
+    assert watcher._due(2 * SETTLE - 0.1) == []
+    due = watcher._due(2 * SETTLE)
+    assert [p for p, _ in due] == [path] and watcher.pending == {}
+
+
+def test_repeated_events_do_not_restart_the_settle_clock(watcher, folders):
+    path = os.path.join(folders[0], "app.msi")
+    grow(path)
+    watcher._changed([path], now=0.0)
+    watcher._changed([path], now=1.5)
+    assert len(watcher._due(SETTLE)) == 1
+
+
+def test_deleted_installer_loses_its_script(watcher, folders):
+    path = os.path.join(folders[0], "gone.exe")
+    script = os.path.join(folders[1], "install_gone.ps1")
+    with open(script, "w") as f:
+        f.write("# generated")
+    watcher.state[path] = {"size": 1, "mtime_ns": 1, "digest": "x", "script_path": script}
+
+    watcher._changed([path], now=0.0)
+
+    assert not os.path.exists(script) and path not in watcher.state
+    assert watcher.records == [{"installer": path, "status": "deleted", "script_path": script}]
+    with open(os.path.join(folders[1], STATE_FILE)) as f:
+        assert f.read().strip() == "{}"
+
+
+def test_same_content_is_not_analyzed_again(make_installer, tmp_path):
+    path = make_installer("nsis")
+    record = process_change(path, str(tmp_path), known_digest=file_digest(path))
+    assert record["status"] == "unchanged"
+
+
+@pytest.mark.parametrize("use_inotify", [True, False])
+def test_watch_generates_and_cleans_up_scripts(folders, make_installer, use_inotify):
+    records = queue.Queue()
+    watcher = SetupsWatcher(*folders, workers=1, settle=0.1, poll_interval=0.05, use_inotify=use_inotify,
+                            on_record=records.put)
+    if use_inotify and watcher.mode != "inotify":
+        pytest.skip("inotify unavailable")
+    thread = threading.Thread(target=watcher.run)
+    thread.start()
+    try:
+        path = make_installer("nsis", directory=folders[0])
+        record = records.get(timeout=30)
+        assert record["status"] == "ok" and os.path.exists(record["script_path"])
+
+        os.remove(path)
+        deleted = records.get(timeout=10)
+        assert deleted["status"] == "deleted" and not os.path.exists(record["script_path"])
+    finally:
+        watcher.stop()
+        thread.join()
+    assert watcher.counters["ok"] == 1 and watcher.counters["deleted"] == 1